@@ -4,10 +4,13 @@ import threading
 import os
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QTextEdit, QPushButton, QLabel, QFrame, QScrollArea, QDialog
+    QTextEdit, QPushButton, QLabel, QFrame, QDialog
 )
 from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont, QPixmap
+from PyQt5.QtGui import QFont
+
+from bot_bridge import BotQueueBridge
+from chat_transcript import ChatBubbleDelegate, ChatMessage, ChatTranscriptView
 
 # Simulated external worker
 userQueue = queue.Queue()
@@ -18,44 +21,13 @@ def start_magentic_flow_worker():
     """Worker thread simulation."""
     def simulate_bot_worker():
         while True:
-            if not userQueue.empty():
-                user_input = userQueue.get()
-                botQueue.put(f"Bot Reply: Echoing '{user_input[1]}'")
+            user_input = userQueue.get()  # block instead of spinning on empty()
+            botQueue.put(f"Bot Reply: Echoing '{user_input[1]}'")
     worker_thread = threading.Thread(target=simulate_bot_worker, daemon=True)
     worker_thread.start()
     return worker_thread
 
 
-# ChatBubble Class
-class ChatBubble(QWidget):
-    def __init__(self, avatar_path: str, message: str, is_bot=False, parent=None):
-        super().__init__(parent)
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(5, 5, 5, 5)
-        layout.setSpacing(8)
-
-        # Avatar
-        avatar_label = QLabel()
-        avatar_label.setFixedSize(30, 30)
-        pix = QPixmap(avatar_path).scaled(30, 30, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        avatar_label.setPixmap(pix)
-        layout.addWidget(avatar_label, alignment=Qt.AlignTop)
-
-        # Message bubble
-        bubble_label = QLabel(message)
-        bubble_label.setWordWrap(True)  # Allow text wrapping
-        bubble_label.setMaximumWidth(500)  # Bubble width limit
-        bubble_label.setSizePolicy(QLabel.Preferred, QLabel.Expanding)  # Expand height dynamically
-        bubble_label.setStyleSheet(f"""
-            QLabel {{
-                background-color: {"#FFCC80" if not is_bot else "#FFF3E0"};
-                border-radius: 12px;
-                padding: 10px;
-            }}
-        """)
-        layout.addWidget(bubble_label, alignment=Qt.AlignLeft)
-
-
 # Loading Dots Animation
 class LoadingDots(QWidget):
     def __init__(self, parent=None):
@@ -92,17 +64,19 @@ class BotWindow(QMainWindow):
         layout = QVBoxLayout(main_widget)
         layout.setContentsMargins(0, 0, 0, 0)
 
-        # Chat Area
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
-        layout.addWidget(self.scroll_area)
+        # Chat Area (virtualized: bubbles are painted by a delegate, not widgets)
+        self.chat_view = ChatTranscriptView(ChatBubbleDelegate(
+            avatar_size=30, margins=(5, 5), spacing=8, padding=10, radius=12,
+            word_wrap=True, max_bubble_width=500,
+            user_color="#FFCC80", bot_color="#FFF3E0"
+        ))
+        self.chat_view.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        layout.addWidget(self.chat_view)
 
-        self.chat_container = QWidget()
-        self.chat_layout = QVBoxLayout(self.chat_container)
-        self.chat_layout.setAlignment(Qt.AlignTop)
-        self.chat_container.setLayout(self.chat_layout)
-        self.scroll_area.setWidget(self.chat_container)
+        # Loading dots sit below the transcript and are shown while waiting for the bot
+        self.loading_widget = LoadingDots()
+        self.loading_widget.hide()
+        layout.addWidget(self.loading_widget)
 
         self.show_welcome_bubble()
 
@@ -118,10 +92,9 @@ class BotWindow(QMainWindow):
 
         layout.addLayout(input_row)
 
-        # Timer for bot queue
-        self.poll_timer = QTimer(self)
-        self.poll_timer.timeout.connect(self.poll_bot_queue)
-        self.poll_timer.start(200)
+        # botQueue output is pushed to the GUI thread, one update per frame
+        self.bot_bridge = BotQueueBridge(botQueue, parent=self)
+        self.bot_bridge.messagesReady.connect(self.show_bot_messages)
 
         # Stylesheet
         self.setStyleSheet("""
@@ -132,12 +105,10 @@ class BotWindow(QMainWindow):
         """)
 
     def show_welcome_bubble(self):
-        bubble = ChatBubble(self.bot_avatar, "👋 Hello! How can I assist you today?", is_bot=True)
-        self.chat_layout.addWidget(bubble)
+        self.chat_view.add_message(self.bot_avatar, "Bot", "👋 Hello! How can I assist you today?", is_bot=True)
 
     def show_loading_dots(self):
-        self.loading_widget = LoadingDots()
-        self.chat_layout.addWidget(self.loading_widget)
+        self.loading_widget.show()
         self.scroll_to_bottom()
 
     def send_message(self):
@@ -145,25 +116,20 @@ class BotWindow(QMainWindow):
         if not user_text:
             return
         # User Bubble
-        bubble = ChatBubble(self.user_avatar, user_text)
-        self.chat_layout.addWidget(bubble)
+        self.chat_view.add_message(self.user_avatar, "You", user_text)
         self.input_field.clear()
 
         # Show loading dots
         self.show_loading_dots()
         userQueue.put(("You", user_text))
 
-    def poll_bot_queue(self):
-        while not botQueue.empty():
-            msg = botQueue.get_nowait()
-            if hasattr(self, 'loading_widget'):
-                self.loading_widget.deleteLater()
-            bubble = ChatBubble(self.bot_avatar, msg, is_bot=True)
-            self.chat_layout.addWidget(bubble)
-            self.scroll_to_bottom()
+    def show_bot_messages(self, messages):
+        self.loading_widget.hide()
+        self.chat_view.add_messages([ChatMessage(self.bot_avatar, "Bot", msg, True) for msg in messages])
+        self.scroll_to_bottom()
 
     def scroll_to_bottom(self):
-        self.scroll_area.verticalScrollBar().setValue(self.scroll_area.verticalScrollBar().maximum())
+        self.chat_view.scrollToBottom()
 
 
 if __name__ == "__main__":
@@ -1,16 +1,41 @@
 import sys
-import json
 import os
+import time
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QWidget, QPushButton,
-    QTextEdit, QLabel, QComboBox, QScrollArea, QFrame, QSpinBox
+    QTextEdit, QLabel, QComboBox, QFrame, QDoubleSpinBox, QSpinBox, QCheckBox
 )
-from PyQt5.QtCore import pyqtSignal, QObject, Qt
-from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import pyqtSignal, QObject, Qt, QSize
 import asyncio
-from playwright.async_api import async_playwright
 from qasync import QEventLoop, asyncSlot
 from datetime import datetime
+from browser_pool import BrowserPool
+from capture_script import ELEMENT_FINGERPRINT_SCRIPT, event_batching_script, event_monotonic_time
+from interaction_log import LOG_FILE, load_interaction_logs
+from network_archive import (
+    NETWORK_MODES, archive_path, network_archive_exists, recording_options, replay_context_options,
+    response_sizes, serve_from_archive
+)
+from page_metrics import find_regressions, format_regressions, install_page_metrics, navigation_metrics
+from replay_checkpoint import (
+    CHECKPOINT_INTERVAL, CheckpointStore, Checkpointer, checkpoint_context_options, checkpoint_name
+)
+from replay_engine import initial_url, replay_log, MIN_SPEED, MAX_SPEED
+from replay_tracing import Tracer, format_histogram, latency_histogram, trace_path, write_chrome_trace
+from resource_profiles import PROFILES, ResourceFilter
+from screenshot_pipeline import ScreenshotPipeline, screenshot_name
+from screenshot_gallery import ScreenshotGallery
+from session_store import SessionEventWriter, SessionStore, session_archive_path
+from trace_normalize import TraceNormalizer, normalize_trace
+
+
+# Replay mode label -> replay_engine wait mode
+REPLAY_MODES = {
+    "Recorded Timing": "recorded",
+    "As Fast As Possible": "fast",
+    "Fixed Delay": "fixed",
+}
+FIXED_DELAY = 2.0  # Seconds between actions in "Fixed Delay" mode at 1x
 
 
 class WorkerSignals(QObject):
@@ -24,14 +49,43 @@ class MainApp(QMainWindow):
         self.initUI()
         self.signals = WorkerSignals()
         self.logs = []  # Interaction logs
+        self.log_writer = None  # Streams self.logs to the session store while capturing
+        self.session_store = SessionStore()  # Every capture is a session; replays pick one by id
+        self.session_id = None  # Session that self.logs belongs to
+        self.keep_intermediate_inputs = False  # Keep every keystroke value on coalesced Input entries
+        self.trace_normalizer = TraceNormalizer(keep_intermediate=self.keep_intermediate_inputs)
+        self.tracer = Tracer("capture")  # Timing spans of the current capture's callbacks
         self.screenshot_dir = "screenshots"  # Directory for screenshots
         self.is_capturing = True  # Flag to control capturing
         self._last_screenshot_time = None  # Track last screenshot timestamp
+        self.screenshot_format = "png"  # "png", "jpeg" or "webp"
+        self.screenshot_quality = 80  # Used for jpeg and webp
+        self.screenshot_dedupe_distance = 4  # Max hash bits changed to count as the same frame; None disables
+        self.screenshot_pipeline = None  # Writes (and transcodes) screenshots off the event loop
+        self.record_network = False  # Opt-in (checkbox): record traffic, response bodies included, to a HAR archive
+        self.collect_perf = False  # Store page performance metrics with each step (see page_metrics)
+        self.checkpoint_every = CHECKPOINT_INTERVAL  # Good steps between replay checkpoints; None disables them
         os.makedirs(self.screenshot_dir, exist_ok=True)
 
+        # Warm Chromium shared by capture and replay; each run gets its own context
+        self.browser_pool = BrowserPool(
+            headless=False,
+            launch_args=[
+                "--disable-gpu",
+                "--disable-extensions",
+                "--disable-background-timer-throttling",
+                "--disable-renderer-backgrounding",
+                "--disable-backgrounding-occluded-windows",
+                "--enable-automation",
+                "--start-maximized",
+            ],
+        )
+        asyncio.ensure_future(self.browser_pool.start())
+
         # Connect signals to GUI update methods
         self.signals.log_signal.connect(self.update_log)
         self.signals.screenshot_signal.connect(self.add_screenshot)
+        self.refresh_sessions()
 
     def initUI(self):
         self.setWindowTitle("Python Playwright Desktop App")
@@ -54,14 +108,50 @@ class MainApp(QMainWindow):
         self.input_prompt.setPlaceholderText("Enter starting URL (e.g., https://example.com)...")
         layout.addWidget(self.input_prompt)
 
-        # Replay Speed Input
-        self.replay_speed_label = QLabel("Replay Speed (seconds):")
+        # Capture option: archive the session's network traffic for offline replays
+        self.record_network_checkbox = QCheckBox("Record network traffic (HAR with response bodies)")
+        self.record_network_checkbox.setChecked(self.record_network)
+        layout.addWidget(self.record_network_checkbox)
+
+        # Replay Mode: recorded pacing, event-driven waits or fixed delays
+        self.replay_mode_selector = QComboBox()
+        self.replay_mode_selector.addItems(list(REPLAY_MODES))
+        layout.addWidget(self.replay_mode_selector)
+
+        # Replay Speed Multiplier (scales recorded pacing and the fixed delay)
+        self.replay_speed_label = QLabel("Replay Speed (x):")
         layout.addWidget(self.replay_speed_label)
-        self.replay_speed_input = QSpinBox()
-        self.replay_speed_input.setRange(1, 10)  # Replay delay range: 1 to 10 seconds
-        self.replay_speed_input.setValue(2)  # Default value
+        self.replay_speed_input = QDoubleSpinBox()
+        self.replay_speed_input.setRange(MIN_SPEED, MAX_SPEED)  # 0.1x to 50x
+        self.replay_speed_input.setSingleStep(0.5)
+        self.replay_speed_input.setDecimals(1)
+        self.replay_speed_input.setSuffix("x")
+        self.replay_speed_input.setValue(1.0)  # Default value
         layout.addWidget(self.replay_speed_input)
 
+        # Network source for replays: the live site or the archive recorded during capture, if one was
+        self.network_mode_selector = QComboBox()
+        self.network_mode_selector.addItems(list(NETWORK_MODES))
+        self.network_mode_selector.setCurrentText("fallthrough")
+        layout.addWidget(self.network_mode_selector)
+
+        # Resource profile for replays: what to block (images, fonts, trackers, third parties)
+        self.resource_profile_selector = QComboBox()
+        self.resource_profile_selector.addItems(list(PROFILES))
+        self.resource_profile_selector.setCurrentText("full")
+        layout.addWidget(self.resource_profile_selector)
+
+        # Session to replay (filled from the session store)
+        self.session_selector = QComboBox()
+        layout.addWidget(self.session_selector)
+
+        # Step to start a replay at; it begins at the latest checkpoint at or before it
+        self.start_step_input = QSpinBox()
+        self.start_step_input.setRange(0, 100000)
+        self.start_step_input.setPrefix("Start at step ")
+        self.start_step_input.setSpecialValueText("Start at the first step")
+        layout.addWidget(self.start_step_input)
+
         # Buttons
         self.start_button = QPushButton("Start")
         self.start_button.clicked.connect(self.handle_start)
@@ -75,18 +165,20 @@ class MainApp(QMainWindow):
         self.replay_button.clicked.connect(self.handle_replay)
         layout.addWidget(self.replay_button)
 
+        self.resume_button = QPushButton("Resume From Last Checkpoint")
+        self.resume_button.clicked.connect(self.handle_resume)
+        layout.addWidget(self.resume_button)
+
         # Log Area
         self.log_area = QTextEdit()
         self.log_area.setReadOnly(True)
         layout.addWidget(self.log_area)
 
-        # Scroll Area for Screenshots
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_content = QWidget()
-        self.scroll_layout = QVBoxLayout(self.scroll_content)
-        self.scroll_area.setWidget(self.scroll_content)
-        layout.addWidget(self.scroll_area)
+        # Virtualized gallery for screenshots; only visible rows are loaded.
+        # Full-page captures are tall, so the thumbnails are portrait
+        self.screenshot_gallery = ScreenshotGallery(QSize(240, 480))
+        self.screenshot_gallery.setFrameStyle(QFrame.Box)  # Add a border for better visibility
+        layout.addWidget(self.screenshot_gallery)
 
         central_widget.setLayout(layout)
 
@@ -101,6 +193,9 @@ class MainApp(QMainWindow):
                 self.update_log("Invalid URL! Make sure it starts with http:// or https://")
                 return
             self.logs = []  # Clear previous logs
+            self.trace_normalizer = TraceNormalizer(keep_intermediate=self.keep_intermediate_inputs)
+            self.tracer = Tracer("capture")
+            self.record_network = self.record_network_checkbox.isChecked()
             self.is_capturing = True
             self.update_log(f"Starting interaction capture on {url}...")
             asyncio.ensure_future(self.async_capture_interactions(url))
@@ -109,107 +204,181 @@ class MainApp(QMainWindow):
         self.is_capturing = False
         self.update_log("Stopped interaction capture.")
 
+    def refresh_sessions(self):
+        """Fill the session selector, newest first."""
+        self.session_selector.clear()
+        self.session_selector.addItem("Latest session", None)
+        for session in self.session_store.list_sessions(limit=100):
+            if session["event_count"]:
+                label = f"#{session['id']}  {session['start_url'] or ''}  ({session['event_count']} events)"
+                self.session_selector.addItem(label, session["id"])
+
     def handle_replay(self):
+        self.start_replay(resume=False)
+
+    def handle_resume(self):
+        self.start_replay(resume=True)
+
+    def start_replay(self, resume):
+        session_id = self.session_selector.currentData()
+        if session_id is None:
+            session_id = self.session_store.latest_session_id()
+        if session_id is not None and session_id != self.session_id:
+            self.logs = normalize_trace(self.session_store.session_events(session_id))
+            self.session_id = session_id
+        if not self.logs:
+            self.logs = normalize_trace(load_interaction_logs())
         if not self.logs:
             self.update_log("No interactions to replay. Capture interactions first.")
             return
         self.update_log("Replaying interactions...")
-        asyncio.ensure_future(self.async_replay_interactions())
+        start_at = self.start_step_input.value() or None
+        asyncio.ensure_future(self.async_replay_interactions(resume, start_at))
 
     def update_log(self, message):
         self.log_area.append(message)
 
     def add_screenshot(self, path):
-        """Add a screenshot to the scroll area."""
-        pixmap = QPixmap(path)
-        screenshot_label = QLabel()
-        screenshot_label.setPixmap(pixmap)
-        screenshot_label.setFrameStyle(QFrame.Box)  # Add a border for better visibility
-        self.scroll_layout.addWidget(screenshot_label)  # Add the screenshot to the layout
-        self.scroll_area.verticalScrollBar().setValue(
-            self.scroll_area.verticalScrollBar().maximum()
-        )  # Auto-scroll to the latest screenshot
+        """Add a screenshot to the gallery."""
+        self.screenshot_gallery.add_screenshot(path)
+        self.screenshot_gallery.scrollToBottom()  # Auto-scroll to the latest screenshot
 
     async def async_capture_interactions(self, start_url):
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=False,
-                args=[
-                    "--disable-gpu",
-                    "--disable-extensions",
-                    "--disable-background-timer-throttling",
-                    "--disable-renderer-backgrounding",
-                    "--disable-backgrounding-occluded-windows",
-                    "--enable-automation",
-                    "--start-maximized",
-                ],
+        self.session_id = self.session_store.create_session(start_url, source="app")
+        # The archive is written when the context closes
+        archive = session_archive_path(self.session_id)
+        context_options = recording_options(archive) if self.record_network else {}
+        # Events are batched into the session's rows; closing the writer ends the session
+        self.log_writer = SessionEventWriter(self.session_store, self.session_id)
+        try:
+            async with self.browser_pool.context(**context_options) as context:
+                page = await context.new_page()
+                self.screenshot_pipeline = ScreenshotPipeline(
+                    directory=self.screenshot_dir,
+                    image_format=self.screenshot_format,
+                    quality=self.screenshot_quality,
+                    dedupe_distance=self.screenshot_dedupe_distance,
+                    on_saved=self.on_screenshot_saved,
+                    on_duplicate=self.on_screenshot_duplicate,
+                    on_error=self.signals.log_signal.emit,
+                )
+                try:
+                    # Attach listeners to the main page
+                    await self.attach_listeners(page)
+
+                    # Capture new tabs
+                    context.on("page", lambda new_page: asyncio.ensure_future(self.attach_listeners(new_page)))
+
+                    # Navigate to the starting URL
+                    try:
+                        await page.goto(start_url)
+                        self.log_interaction("navigate", None, start_url)
+                        self.signals.log_signal.emit(f"Navigated to {start_url}")
+                        await self.take_screenshot(page, "Initial Navigation")
+                    except Exception as e:
+                        self.signals.log_signal.emit(f"Error navigating to {start_url}: {e}")
+
+                    # Wait for user interactions until stopped
+                    while self.is_capturing:
+                        await asyncio.sleep(1)
+                finally:
+                    # Pending screenshots are linked to the session before it is closed
+                    await self.screenshot_pipeline.drain()
+                    self.screenshot_pipeline = None
+        except Exception as e:
+            self.signals.log_signal.emit(f"Capture failed: {e}")
+        finally:
+            self.is_capturing = False
+            # Flush remaining logs to the session store
+            pending = self.trace_normalizer.flush()
+            self.logs.extend(pending)
+            self.log_writer.extend(pending)
+            self.log_writer.close()
+            self.log_writer = None
+            self.signals.log_signal.emit(f"Logs saved as session {self.session_id}")
+            self.refresh_sessions()
+            loads_saved = self.trace_normalizer.navigations.loads_saved
+            if loads_saved:
+                self.signals.log_signal.emit(f"Dropped {loads_saved} redundant navigations from the log")
+            self.save_trace(self.tracer, "capture", "capture")
+
+    async def async_replay_interactions(self, resume=False, start_at=None):
+        network_mode = self.network_mode_selector.currentText()
+        archive = session_archive_path(self.session_id, create_dir=False) if self.session_id else archive_path(LOG_FILE)
+        checkpoints = CheckpointStore(checkpoint_name(self.session_id if self.session_id is not None else LOG_FILE))
+        checkpoint = None
+        if resume or start_at is not None:
+            checkpoint = checkpoints.resume_point(self.logs, start_at)
+            if checkpoint:
+                self.signals.log_signal.emit(f"Resuming at step {checkpoint.step} from {checkpoint.url}")
+            else:
+                self.signals.log_signal.emit("No usable checkpoint, replaying from the first step")
+        # A checkpoint's cookies and localStorage are restored when the context is created
+        context_options = {**replay_context_options(network_mode), **checkpoint_context_options(checkpoint)}
+        async with self.browser_pool.context(**context_options) as context:
+            try:
+                if await serve_from_archive(context, archive, network_mode):
+                    self.signals.log_signal.emit(f"Serving network requests from {archive}")
+            except FileNotFoundError as e:
+                self.signals.log_signal.emit(f"Replay aborted: {e}")
+                return
+            # Installed after the archive route so it sees requests first
+            known_sizes = response_sizes(archive) if network_archive_exists(archive) else None
+            resource_filter = ResourceFilter(
+                self.resource_profile_selector.currentText(), initial_url(self.logs), known_sizes
             )
-            context = await browser.new_context()
+            await resource_filter.install(context)
             page = await context.new_page()
 
-            # Attach listeners to the main page
-            await self.attach_listeners(page)
+            wait_mode = REPLAY_MODES[self.replay_mode_selector.currentText()]
+            speed = self.replay_speed_input.value()
+            delay_between_actions = FIXED_DELAY / speed
 
-            # Capture new tabs
-            context.on("page", lambda new_page: asyncio.ensure_future(self.attach_listeners(new_page)))
-
-            # Navigate to the starting URL
+            tracer = Tracer("replay")
             try:
-                await page.goto(start_url)
-                self.log_interaction("navigate", None, start_url)
-                self.signals.log_signal.emit(f"Navigated to {start_url}")
-                await self.take_screenshot(page, "Initial Navigation")
-            except Exception as e:
-                self.signals.log_signal.emit(f"Error navigating to {start_url}: {e}")
-
-            # Wait for user interactions until stopped
-            while self.is_capturing:
-                await asyncio.sleep(1)
-
-            # Save logs to file
-            log_file = "interaction_logs.json"
-            with open(log_file, "w") as f:
-                json.dump(self.logs, f, indent=4)
-            self.signals.log_signal.emit(f"Logs saved to {log_file}")
-
-            await browser.close()
-
-    async def async_replay_interactions(self):
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=False)
-            context = await browser.new_context()
-            page = await context.new_page()
-
-            delay_between_actions = self.replay_speed_input.value()
-
-            for log in self.logs:
-                action = log["action"]
-                target = log.get("target")
-                value = log.get("value")
-                url = log.get("url")
-
-                try:
-                    if action == "navigate":
-                        await page.goto(url)
-                        self.signals.log_signal.emit(f"Replayed navigation to {url}")
-                    elif action == "click":
-                        await page.click(target)
-                        self.signals.log_signal.emit(f"Replayed click on {target}")
-                    elif action == "input":
-                        await page.fill(target, value)
-                        self.signals.log_signal.emit(f"Replayed input '{value}' on {target}")
-                    elif action == "press":
-                        await page.press(target, value)
-                        self.signals.log_signal.emit(f"Replayed key press '{value}' on {target}")
-                except Exception as e:
-                    self.signals.log_signal.emit(f"Error during replay for action '{action}': {e}")
-
-                # Delay between actions
-                await asyncio.sleep(delay_between_actions)
-
-            await browser.close()
+                results = await replay_log(
+                    page, self.logs,
+                    wait_mode=wait_mode,
+                    delay=delay_between_actions,
+                    speed=speed,
+                    open_initial_url=False,
+                    on_step=self.report_replay_step,
+                    tracer=tracer,
+                    collect_perf=self.collect_perf,
+                    start=checkpoint.step if checkpoint else 0,
+                    resume_url=checkpoint.url if checkpoint else None,
+                    checkpointer=Checkpointer(checkpoints, self.logs, self.checkpoint_every)
+                    if self.checkpoint_every else None,
+                )
+            finally:
+                self.save_trace(tracer, "replay", "step")
+            if self.collect_perf:
+                self.signals.log_signal.emit(format_regressions(find_regressions(self.logs, results)))
+
+            self.signals.log_signal.emit(resource_filter.describe())
+            if self.session_id is not None:
+                self.session_store.record_replay(self.session_id, results, wait_mode)
             self.signals.log_signal.emit("Replay completed.")
 
+    def save_trace(self, tracer, kind, category):
+        """Write a run's spans as a Chrome trace and log the latency histogram of `category` spans."""
+        if not tracer.spans:
+            return
+        name = f"session_{self.session_id}_{kind}" if self.session_id is not None else kind
+        path = write_chrome_trace(trace_path(name), [tracer])
+        self.signals.log_signal.emit(f"Timing trace saved to {path} (open in chrome://tracing)")
+        histogram = format_histogram(latency_histogram([tracer], category))
+        if histogram:
+            self.signals.log_signal.emit(histogram)
+
+    def report_replay_step(self, result):
+        if result.skipped:
+            self.signals.log_signal.emit(result.message)
+        elif result.ok:
+            self.signals.log_signal.emit(f"Replayed {result.message}")
+        else:
+            self.signals.log_signal.emit(f"Error during replay for action '{result.action}': {result.message}")
+
     async def attach_listeners(self, page):
         """Attach listeners to a page to capture interactions."""
         self.signals.log_signal.emit(f"Attaching listeners to {page.url}")
@@ -217,31 +386,34 @@ class MainApp(QMainWindow):
         # Capture navigations
         page.on("framenavigated", lambda frame: asyncio.ensure_future(self.on_navigation(frame, page)))
 
+        if self.collect_perf:
+            await install_page_metrics(page)
+
         # Capture clicks, inputs, and keypresses
-        await page.expose_function("log_interaction", lambda interaction: self.log_interaction(**interaction))
-        await page.evaluate("""
+        await page.expose_function("log_interactions", self.log_interactions)
+        await page.evaluate(event_batching_script("log_interactions") + ELEMENT_FINGERPRINT_SCRIPT + """
             if (!window.listenersAttached) {
+                // Ranked [strategy, selector] list; the first entry is used as the target
+                const describe = (el, cached) => {
+                    const selectors = window.__fingerprintElement(el, cached);
+                    return { target: selectors.length ? selectors[0][1] : el.tagName.toLowerCase(), selectors };
+                };
+
                 document.addEventListener("click", (event) => {
-                    const target = event.target.tagName.toLowerCase();
-                    const selector = target + (event.target.id ? `#${event.target.id}` : "") +
-                                     (event.target.className ? `.${event.target.className.split(" ").join(".")}` : "");
-                    window.log_interaction({ action: "click", target: selector, url: window.location.href });
+                    const { target, selectors } = describe(event.target, false);
+                    window.__queueCaptureEvent({ action: "click", target, selectors, url: window.location.href });
                 });
 
                 document.addEventListener("input", (event) => {
-                    const target = event.target.tagName.toLowerCase();
                     const value = event.target.value || "";
-                    const selector = target + (event.target.id ? `#${event.target.id}` : "") +
-                                     (event.target.className ? `.${event.target.className.split(" ").join(".")}` : "");
-                    window.log_interaction({ action: "input", target: selector, value, url: window.location.href });
+                    const { target, selectors } = describe(event.target, true);
+                    window.__queueCaptureEvent({ action: "input", target, selectors, value, url: window.location.href });
                 });
 
                 document.addEventListener("keydown", (event) => {
                     if (event.key === "Enter") {
-                        const target = event.target.tagName.toLowerCase();
-                        const selector = target + (event.target.id ? `#${event.target.id}` : "") +
-                                         (event.target.className ? `.${event.target.className.split(" ").join(".")}` : "");
-                        window.log_interaction({ action: "press", target: selector, value: "Enter", url: window.location.href });
+                        const { target, selectors } = describe(event.target, false);
+                        window.__queueCaptureEvent({ action: "press", target, selectors, value: "Enter", url: window.location.href });
                     }
                 });
 
@@ -258,34 +430,89 @@ class MainApp(QMainWindow):
                 self.signals.log_signal.emit(f"Skipped screenshot due to debounce: {description}")
                 return
 
+        if not self.screenshot_pipeline:
+            return
+
         self._last_screenshot_time = current_time
-        screenshot_path = os.path.join(self.screenshot_dir, f"screenshot_{len(self.logs)}.png")
+        # The step that triggered this screenshot, even while the normalizer still holds it back
+        step = self.log_writer.step_index(self.trace_normalizer.held) if self.log_writer else None
         try:
-            await page.screenshot(path=screenshot_path, full_page=True)
-            self.signals.log_signal.emit(f"Screenshot ({description}) saved: {screenshot_path}")
-            self.signals.screenshot_signal.emit(screenshot_path)
+            with self.tracer.span("screenshot", "capture", description=description):
+                screenshot_path = await self.screenshot_pipeline.capture(page, screenshot_name(), full_page=True)
+            if screenshot_path and self.log_writer:
+                self.log_writer.expect_screenshot(screenshot_path, step)
+            if screenshot_path is None:
+                self.signals.log_signal.emit(f"Dropped screenshot, write queue is full: {description}")
+            else:
+                self.signals.log_signal.emit(f"Screenshot ({description}) queued: {screenshot_path}")
         except Exception as e:
             self.signals.log_signal.emit(f"Failed to capture screenshot: {e}")
 
+    def on_screenshot_saved(self, path):
+        """Runs on the event loop thread, from the pipeline's done callback, once a file is on disk."""
+        if self.log_writer:
+            self.log_writer.add_screenshot(path)
+        self.signals.log_signal.emit(f"Screenshot saved: {path}")
+        self.signals.screenshot_signal.emit(path)
+
+    def on_screenshot_duplicate(self, path, earlier_path):
+        """Runs on the event loop thread when a frame matches the previous one."""
+        if self.log_writer:
+            self.log_writer.add_screenshot(earlier_path, skipped_path=path)
+        self.signals.log_signal.emit(f"Screenshot unchanged, not saved: {path} (same as {earlier_path})")
+
     async def on_navigation(self, frame, page):
         """Log navigation events."""
         if frame == page.main_frame:
             url = frame.url
-            self.log_interaction("navigate", None, url)
+            if self.collect_perf:
+                navigated = time.perf_counter()
+                perf = await navigation_metrics(page)
+                # age_ms keeps the entry's capture time at the navigation, not after the load wait
+                self.log_interactions([{"action": "navigate", "target": None, "url": url, "perf": perf,
+                                        "age_ms": (time.perf_counter() - navigated) * 1000}])
+            else:
+                self.log_interaction("navigate", None, url)
             self.signals.log_signal.emit(f"Navigated to {url}")
             await self.take_screenshot(page, "Navigation")
 
     def log_interaction(self, action, target, url=None, value=None):
         """Log an interaction."""
-        interaction = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "action": action,
-            "target": target,
-            "url": url,
-            "value": value
-        }
-        self.logs.append(interaction)
-        self.signals.log_signal.emit(f"Captured interaction: {interaction}")
+        self.log_interactions([{"action": action, "target": target, "url": url, "value": value}])
+
+    def log_interactions(self, interactions):
+        """Log a batch of interactions reported by the page in one pass."""
+        with self.tracer.span("log_interactions", "capture", events=len(interactions)):
+            self._log_interactions(interactions)
+
+    def _log_interactions(self, interactions):
+        timestamp = datetime.utcnow().isoformat()
+        batch = [
+            {
+                "timestamp": timestamp,
+                # High-resolution monotonic capture time (seconds), used for time-scaled replay
+                "mono": round(event_monotonic_time(interaction), 6),
+                "action": interaction.get("action"),
+                "target": interaction.get("target"),
+                "url": interaction.get("url"),
+                "value": interaction.get("value"),
+                # Ranked [strategy, selector] fallbacks for replay
+                "selectors": interaction.get("selectors"),
+                # Page performance metrics since the previous step, when collected
+                **({"perf": interaction["perf"]} if interaction.get("perf") else {})
+            }
+            for interaction in interactions
+        ]
+        # Keystrokes on one field and redundant navigations are held back until they can be merged or dropped
+        batch = [ready for interaction in batch for ready in self.trace_normalizer.push(interaction)]
+        if not batch:
+            return
+        self.logs.extend(batch)
+        if self.log_writer:
+            self.log_writer.extend(batch)
+        self.signals.log_signal.emit(
+            "\n".join(f"Captured interaction: {interaction}" for interaction in batch)
+        )
 
 
 def main():
@@ -298,6 +525,7 @@ def main():
 
     with loop:
         loop.run_forever()
+        loop.run_until_complete(window.browser_pool.close())
 
 
 if __name__ == "__main__":
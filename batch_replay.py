@@ -0,0 +1,346 @@
+"""
+batch_replay.py
+Replays many recorded interaction logs in parallel as regression checks.
+
+Sessions run in headless Chromium contexts from a BrowserPool; contexts are
+spread over several browser processes so throughput scales with cores.
+
+    python batch_replay.py recordings/*.jsonl --parallel 8 --report report.json
+    python batch_replay.py --session 12 --session 15
+
+Sessions from the SQLite store (session_store.py) are replayed by id, and
+their results are stored so failed steps can be queried later.
+
+With --compare, the batch is replayed once in "fixed" and once in "fast"
+wait mode and the speedup is printed.
+
+With --network strict, every session is served from the HAR archive recorded
+next to its log (see network_archive.py) and never touches the network, which
+is how CI runs them.
+
+With --trace, every session's step timings are written to one Chrome
+trace-event file (one row per session; see replay_tracing.py). The report
+always carries a per-action latency histogram.
+
+With --perf, page performance metrics are collected for every step and
+compared with the ones stored in the recording (see page_metrics.py); steps
+that got slower are listed per session.
+
+With --checkpoint-every N, each session saves a checkpoint every N good
+steps (see replay_checkpoint.py). --resume continues every session from its
+last checkpoint, and --start-at N from the latest checkpoint at or before
+step N.
+
+With --share-prefixes, sessions that start with the same steps (a login,
+the same navigation) replay that prefix once. The rest of each session is
+forked from a snapshot of it (see prefix_replay.py), and the report shows
+the steps and the estimated time this saved.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from browser_pool import BrowserPool
+from interaction_log import read_interaction_logs
+from network_archive import (
+    NETWORK_MODES, archive_path, network_archive_exists, replay_context_options, response_sizes,
+    serve_from_archive
+)
+from page_metrics import find_regressions, format_regressions
+from prefix_replay import MIN_SHARED_STEPS, Trace, replay_shared_prefixes
+from replay_checkpoint import (
+    CHECKPOINT_INTERVAL, CheckpointStore, Checkpointer, checkpoint_context_options, checkpoint_name,
+    checkpoint_names
+)
+from replay_engine import MAX_SPEED, MIN_SPEED, WAIT_MODES, initial_url, replay_log
+from replay_tracing import Tracer, format_histogram, latency_histogram, write_chrome_trace
+from resource_profiles import PROFILES, ResourceFilter
+from session_store import DB_FILE, SessionStore, session_archive_path
+from trace_normalize import normalize_trace
+
+
+def load_source(source, store=None):
+    """(label, events, archive path) for a log file path or a session id."""
+    if isinstance(source, int):
+        return f"session {source}", store.session_events(source), session_archive_path(source, create_dir=False)
+    return source, read_interaction_logs(source), archive_path(source)
+
+
+async def replay_session(pool, source, timeout=5000, wait_mode="fast", delay=None, speed=1.0,
+                         selector_cache=None, network="fallthrough", profile="full", store=None, tracer=None,
+                         collect_perf=False, checkpoint_every=None, resume=False, start_at=None,
+                         checkpoint_store=None):
+    """
+    Replay one log file or stored session in its own context and return its
+    report entry. Checkpoints go to `checkpoint_store`, by default the one
+    named after the source.
+    """
+    start = time.perf_counter()
+    report = {"log": str(source), "passed": False, "steps": 0, "failed_steps": [], "skipped_steps": 0}
+    try:
+        report["log"], events, archive = load_source(source, store)
+        steps = normalize_trace(events)
+        report["steps"] = len(steps)
+        if not steps:
+            report["error"] = "No interaction logs found or file is empty"
+            return report
+
+        checkpoints = checkpoint_store or CheckpointStore(checkpoint_name(source))
+        checkpoint = checkpoints.resume_point(steps, start_at) if resume or start_at is not None else None
+        if checkpoint:
+            report["resumed_from"] = checkpoint.step
+        checkpointer = Checkpointer(checkpoints, steps, checkpoint_every) if checkpoint_every else None
+
+        context_options = {**replay_context_options(network), **checkpoint_context_options(checkpoint)}
+        async with pool.context(**context_options) as context:
+            report["archived"] = await serve_from_archive(context, archive, network)
+            # Installed after the archive route so it sees requests first
+            known_sizes = response_sizes(archive) if network_archive_exists(archive) else None
+            resource_filter = ResourceFilter(profile, initial_url(steps), known_sizes)
+            await resource_filter.install(context)
+            page = await context.new_page()
+            results = await replay_log(page, steps, timeout=timeout, wait_mode=wait_mode,
+                                       delay=delay, speed=speed, selector_cache=selector_cache, tracer=tracer,
+                                       collect_perf=collect_perf, start=checkpoint.step if checkpoint else 0,
+                                       resume_url=checkpoint.url if checkpoint else None,
+                                       checkpointer=checkpointer)
+            report["resources"] = resource_filter.summary()
+
+        report["failed_steps"] = [r._asdict() for r in results if not r.ok]
+        report["skipped_steps"] = sum(1 for r in results if r.skipped)
+        report["passed"] = not report["failed_steps"]
+        if collect_perf:
+            report["perf_regressions"] = find_regressions(steps, results)
+        if isinstance(source, int):
+            store.record_replay(source, results, wait_mode)
+    except Exception as e:
+        report["error"] = str(e)
+    finally:
+        report["duration"] = round(time.perf_counter() - start, 3)
+    return report
+
+
+async def replay_sharing_prefixes(pool, sources, timeout=5000, wait_mode="fast", delay=None, speed=1.0,
+                                  selector_cache=None, network="fallthrough", profile="full", store=None,
+                                  collect_perf=False, min_shared=MIN_SHARED_STEPS):
+    """
+    Replay all sources along their shared-prefix tree. Returns the session
+    report entries, the prefix-sharing summary and the tracers of the tree's nodes.
+    """
+    sessions, traces, reports = [], [], {}
+    for source in sources:
+        report = {"log": str(source), "passed": False, "steps": 0, "failed_steps": [], "skipped_steps": 0,
+                  "duration": 0.0}
+        sessions.append(report)
+        try:
+            report["log"], events, archive = load_source(source, store)
+            steps = normalize_trace(events)
+        except Exception as e:
+            report["error"] = str(e)
+            continue
+        report["steps"] = len(steps)
+        if not steps:
+            report["error"] = "No interaction logs found or file is empty"
+            continue
+        # The label identifies the trace's results, so a source given twice gets its position added
+        label = report["log"] if report["log"] not in reports else f"{report['log']} #{len(sessions)}"
+        traces.append(Trace(label, steps, archive, source))
+        reports[label] = report
+
+    replayed, summary = await replay_shared_prefixes(
+        pool, traces, timeout, wait_mode, delay, speed, selector_cache, network, profile, min_shared, collect_perf
+    )
+    for trace in traces:
+        report, outcome = reports[trace.label], replayed[trace.label]
+        results = outcome["results"]
+        report["duration"] = outcome["duration"]
+        if outcome["error"]:
+            report["error"] = outcome["error"]
+            continue
+        report["failed_steps"] = [r._asdict() for r in results if not r.ok]
+        report["skipped_steps"] = sum(1 for r in results if r.skipped)
+        report["passed"] = not report["failed_steps"]
+        if collect_perf:
+            report["perf_regressions"] = find_regressions(trace.steps, results)
+        if isinstance(trace.source, int):
+            store.record_replay(trace.source, results, wait_mode)
+    tracers = summary.pop("tracers")
+    return sessions, summary, tracers
+
+
+async def run_batch(sources, parallel=4, browsers=None, timeout=5000, wait_mode="fast",
+                    delay=None, speed=1.0, network="fallthrough", profile="full", store=None, trace_file=None,
+                    collect_perf=False, checkpoint_every=None, resume=False, start_at=None,
+                    share_prefixes=False, min_shared=MIN_SHARED_STEPS):
+    """
+    Replay all sources (log file paths or session ids from `store`), at most
+    `parallel` at once, and return the batch report. With `trace_file`, the
+    step timings of all sessions are written there as a Chrome trace. With
+    `share_prefixes`, common step prefixes are replayed once and forked.
+    """
+    pool = BrowserPool(
+        headless=True,
+        max_browsers=browsers or max(1, min(parallel, os.cpu_count() or 1)),
+        max_contexts=parallel,
+    )
+    # Recordings of the same flow share elements, so a strategy that resolved once is tried first
+    selector_cache = {}
+    tracers = [Tracer(str(source)) for source in sources]
+    sharing = None
+    start = time.perf_counter()
+    try:
+        await pool.start()
+        if share_prefixes:
+            sessions, sharing, tracers = await replay_sharing_prefixes(
+                pool, sources, timeout, wait_mode, delay, speed, selector_cache, network, profile, store,
+                collect_perf, min_shared
+            )
+        else:
+            sessions = await asyncio.gather(
+                *(replay_session(pool, source, timeout, wait_mode, delay, speed, selector_cache, network,
+                                 profile, store, tracer, collect_perf, checkpoint_every, resume, start_at,
+                                 CheckpointStore(name))
+                  for source, tracer, name in zip(sources, tracers, checkpoint_names(sources)))
+            )
+    finally:
+        await pool.close()
+
+    wall_time = time.perf_counter() - start
+    if trace_file:
+        write_chrome_trace(trace_file, tracers)
+    passed = sum(1 for s in sessions if s["passed"])
+    resources = [s["resources"] for s in sessions if "resources" in s]
+    if sharing:
+        resources = [sharing]
+    report = {
+        "wait_mode": wait_mode,
+        "network": network,
+        "profile": profile,
+        "parallel": parallel,
+        "sessions": sessions,
+        "total": len(sessions),
+        "passed": passed,
+        "failed": len(sessions) - passed,
+        "wall_time": round(wall_time, 3),
+        "sessions_per_second": round(len(sessions) / wall_time, 3) if wall_time else None,
+        "requests_blocked": sum(r["requests_blocked"] for r in resources),
+        "bytes_saved": sum(r["bytes_saved"] for r in resources),
+        "latency": latency_histogram(tracers),
+    }
+    if sharing:
+        report["prefix_sharing"] = sharing
+    return report
+
+
+def print_report(report):
+    for session in report["sessions"]:
+        status = "PASS" if session["passed"] else "FAIL"
+        detail = session.get("error") or f"{len(session['failed_steps'])} failed of {session['steps']} steps"
+        if "resumed_from" in session:
+            detail += f", resumed at step {session['resumed_from']}"
+        print(f"{status}  {session['duration']:8.2f}s  {session['log']}  ({detail})")
+        if session.get("perf_regressions"):
+            print(format_regressions(session["perf_regressions"]))
+    steps = sum(s["steps"] for s in report["sessions"])
+    print(f"\n[{report['wait_mode']}, network={report['network']}] "
+          f"{report['passed']}/{report['total']} passed, {steps} steps "
+          f"in {report['wall_time']:.2f}s ({report['sessions_per_second']} sessions/s, "
+          f"parallel={report['parallel']})")
+    if report["profile"] != "full":
+        print(f"[{report['profile']}] blocked {report['requests_blocked']} requests, "
+              f"saved ~{report['bytes_saved'] / 1024:.0f} KB")
+    sharing = report.get("prefix_sharing")
+    if sharing:
+        print(f"\nShared prefixes:\n{sharing['plan']}")
+        print(f"[prefix sharing] replayed {sharing['executed_steps']} of {sharing['total_steps']} steps "
+              f"({sharing['steps_saved']} saved, {sharing['forks']} forks), "
+              f"~{sharing['estimated_time_saved']:.2f}s saved "
+              f"({sharing['shared_time']:.2f}s of shared steps - {sharing['fork_overhead']:.2f}s fork overhead)")
+    if report["latency"]:
+        print("\nStep latency by action:")
+        print(format_histogram(report["latency"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded interaction logs in parallel.")
+    parser.add_argument("logs", nargs="*", help="Interaction log files (JSON array, JSON Lines or trace)")
+    parser.add_argument("--session", type=int, action="append", default=[],
+                        help="Replay a stored session by id (repeatable)")
+    parser.add_argument("--db", default=DB_FILE, help="Session database for --session")
+    parser.add_argument("--parallel", type=int, default=os.cpu_count() or 4,
+                        help="Sessions replayed at once")
+    parser.add_argument("--browsers", type=int, help="Browser processes to spread contexts over")
+    parser.add_argument("--timeout", type=int, default=5000, help="Per-step selector timeout (ms)")
+    parser.add_argument("--wait-mode", choices=WAIT_MODES, default="fast",
+                        help="fast: event-driven waits; fixed: sleep after each step; "
+                             "recorded: original pacing scaled by --speed")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help=f"Speed factor for recorded pacing ({MIN_SPEED}-{MAX_SPEED})")
+    parser.add_argument("--delay", type=float, help="Flat pause after each step in fixed mode (s)")
+    parser.add_argument("--network", choices=NETWORK_MODES, default="fallthrough",
+                        help="strict: serve only from each log's HAR archive; fallthrough: archive "
+                             "first, then the network; live: ignore archives")
+    parser.add_argument("--profile", choices=list(PROFILES), default="full",
+                        help="Resource filtering profile applied to every replay context")
+    parser.add_argument("--compare", action="store_true",
+                        help="Replay in both wait modes and report the speedup")
+    parser.add_argument("--report", help="Write the JSON report to this file")
+    parser.add_argument("--perf", action="store_true",
+                        help="Collect page metrics per step and report regressions against the recording")
+    parser.add_argument("--checkpoint-every", type=int, metavar="N",
+                        help=f"Save a checkpoint every N good steps (default {CHECKPOINT_INTERVAL} "
+                             "with --resume or --start-at)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue each session from its last good checkpoint")
+    parser.add_argument("--start-at", type=int, metavar="N",
+                        help="Start each session at the latest checkpoint at or before step N")
+    parser.add_argument("--share-prefixes", action="store_true",
+                        help="Replay steps shared by several sessions once and fork the rest from a snapshot")
+    parser.add_argument("--min-shared", type=int, default=MIN_SHARED_STEPS, metavar="N",
+                        help="Shortest shared prefix worth a fork (steps)")
+    parser.add_argument("--trace", help="Write step timings as a Chrome trace-event JSON file "
+                                        "(with --compare, one file per wait mode)")
+    args = parser.parse_args(argv)
+    if not args.logs and not args.session:
+        parser.error("give at least one log file or --session")
+
+    if args.share_prefixes and (args.resume or args.start_at is not None or args.checkpoint_every):
+        parser.error("--share-prefixes cannot be combined with checkpoints")
+    checkpoint_every = args.checkpoint_every
+    if checkpoint_every is None and (args.resume or args.start_at is not None):
+        checkpoint_every = CHECKPOINT_INTERVAL
+
+    sources = args.logs + args.session
+    store = SessionStore(args.db) if args.session else None
+    modes = ("fixed", "fast") if args.compare else (args.wait_mode,)
+    reports = {}
+    for mode in modes:
+        trace_file = args.trace
+        if trace_file and args.compare:
+            trace_file = f"{os.path.splitext(trace_file)[0]}.{mode}.json"
+        reports[mode] = asyncio.run(
+            run_batch(sources, args.parallel, args.browsers, args.timeout, mode, args.delay, args.speed,
+                      args.network, args.profile, store, trace_file, args.perf, checkpoint_every,
+                      args.resume, args.start_at, args.share_prefixes, args.min_shared)
+        )
+        print_report(reports[mode])
+
+    if args.compare:
+        fixed, fast = reports["fixed"]["wall_time"], reports["fast"]["wall_time"]
+        print(f"\nfast mode: {fast:.2f}s vs fixed mode: {fixed:.2f}s "
+              f"({fixed / fast if fast else float('inf'):.1f}x faster)")
+        report = {"fixed": reports["fixed"], "fast": reports["fast"]}
+    else:
+        report = reports[args.wait_mode]
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if all(r["failed"] == 0 for r in reports.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+"""
+run_benchmarks.py
+Capture and replay benchmarks against local fixture pages in headless Chromium.
+
+The fixture pages in benchmarks/fixtures (a form, a single-page app with
+pushState routes, popups and a 5000-row list) are served by a stdlib HTTP
+server. Each scenario drives a synthetic interaction script through
+home.py's real capture path (inject_event_listeners -> report_dom_events ->
+log_entries -> log writer), then replays what was captured.
+
+Reported per scenario:
+- events_per_second: DOM events delivered to the capture code per second
+- log_latency_ms: time from a DOM event to its log write (p50/p95/max)
+- page_overhead_us: extra page time per dispatched event with capture injected
+- replay_steps_per_second and failed replay steps
+and for the whole run: screenshot capture latency and peak RSS.
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json --output new.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+sys.path.insert(0, ROOT)
+
+from browser_pool import BrowserPool  # noqa: E402
+from home import BrowserThread  # noqa: E402
+from interaction_log import InteractionLogWriter  # noqa: E402
+from replay_engine import replay_log  # noqa: E402
+from screenshot_pipeline import ScreenshotPipeline  # noqa: E402
+from session_store import SessionStore  # noqa: E402
+from trace_normalize import normalize_trace  # noqa: E402
+
+# Metric -> True when higher is better; used by --baseline
+METRICS = {
+    "events_per_second": True,
+    "log_latency_ms.p95": False,
+    "page_overhead_us": False,
+    "replay_steps_per_second": True,
+}
+RUN_METRICS = {
+    "screenshots.capture_ms.p95": False,
+    "peak_rss_mb.python": False,
+}
+
+# Dispatches input and click events on #name and returns the page time they took (ms)
+DISPATCH_SCRIPT = """
+(count) => {
+    const el = document.getElementById('name');
+    const start = performance.now();
+    for (let i = 0; i < count; i++) {
+        el.value = 'x' + i;
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new MouseEvent('click', {bubbles: true}));
+    }
+    return performance.now() - start;
+}
+"""
+
+
+###############################################################################
+# Fixture server
+###############################################################################
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=FIXTURES))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+###############################################################################
+# Instrumented capture
+###############################################################################
+class TimedLogWriter(InteractionLogWriter):
+    """Records how long each entry took from its DOM event ("mono") to the disk write."""
+
+    def __init__(self, path):
+        self.latencies = []
+        self.entries = []
+        super().__init__(path=path)
+
+    def _write(self, entries):
+        super()._write(entries)
+        now = time.perf_counter()
+        self.entries.extend(entries)
+        self.latencies.extend(now - entry["mono"] for entry in entries if entry.get("mono") is not None)
+
+
+def percentiles(values, scale=1.0):
+    if not values:
+        return {"p50": None, "p95": None, "max": None}
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {
+        "p50": round(statistics.median(ordered) * scale, 3),
+        "p95": round(p95 * scale, 3),
+        "max": round(ordered[-1] * scale, 3),
+    }
+
+
+async def form_script(page, base_url, iterations):
+    for i in range(iterations):
+        await page.locator("#name").press_sequentially(f"Customer {i}")
+        await page.locator("#email").press_sequentially(f"customer{i}@example.com")
+        await page.locator("#address").press_sequentially(f"{i} Main Street")
+        await page.select_option("#country", index=i % 3)
+        await page.locator("[data-testid=terms]").click()
+        await page.locator("[data-testid=submit]").click()
+        await page.locator("#name").fill("")
+
+
+async def spa_script(page, base_url, iterations):
+    for i in range(iterations):
+        await page.click("a[data-route=products]")
+        for sku in range(0, 50, 10):
+            await page.click(f"button[data-sku='{sku}']")
+        await page.click("a[data-route=cart]")
+        await page.locator("#coupon").press_sequentially(f"SAVE{i}")
+        await page.locator("#coupon").press("Enter")
+        await page.click("a[data-route=account]")
+        await page.locator("#nickname").press_sequentially(f"nick{i}")
+        await page.click("#save")
+        await page.click("a[data-route=home]")
+
+
+async def popup_script(page, base_url, iterations):
+    for i in range(iterations):
+        async with page.context.expect_page() as popup_info:
+            await page.click("#open-form" if i % 2 == 0 else "#open-list")
+        popup = await popup_info.value
+        await popup.wait_for_load_state()  # left open: the capture code injects into it after a delay
+        await page.locator("#search").press_sequentially(f"refund {i}")
+        await page.locator("#search").press("Enter")
+
+
+async def long_list_script(page, base_url, iterations):
+    for i in range(iterations):
+        for row in range(i * 97 % 4000, i * 97 % 4000 + 500, 50):
+            await page.click(f"button[data-row='{row}']")
+        await page.locator("#filter").press_sequentially(f"Row {i}")
+        await page.locator("#filter").fill("")
+
+
+SCENARIOS = {
+    "form": ("form.html", form_script),
+    "spa": ("spa.html", spa_script),
+    "popup": ("popup.html", popup_script),
+    "long_list": ("long_list.html", long_list_script),
+}
+
+
+async def run_capture(pool, thread, url, script, base_url, iterations, log_path):
+    """Drive `script` with the capture code injected; returns (raw DOM events, seconds, writer)."""
+    delivered = 0
+    report_dom_events = thread.report_dom_events
+
+    async def counting_report(events):
+        nonlocal delivered
+        delivered += len(events)
+        await report_dom_events(events)
+
+    thread.report_dom_events = counting_report  # picked up by expose_function in inject_event_listeners
+    thread.log_writer = TimedLogWriter(log_path)
+
+    async with pool.context() as context:
+        page = await context.new_page()
+        thread._last_active_page = page
+        await thread.inject_event_listeners(page)
+        context.on("page", lambda pg: asyncio.create_task(thread.handle_new_page(pg)))
+        page.on("framenavigated", lambda frame: asyncio.create_task(thread.handle_frame_navigated(frame)))
+        await page.goto(url)
+
+        start = time.perf_counter()
+        await script(page, base_url, iterations)
+        await page.evaluate("window.__flushCaptureEvents && window.__flushCaptureEvents()")
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(0.5)  # let the last exposed-function calls arrive
+
+    thread.log_writer.extend(thread.trace_normalizer.flush())
+    thread.log_writer.close()
+    return delivered, elapsed, thread.log_writer
+
+
+async def page_overhead(pool, thread, url, events=2000):
+    """Extra page time per dispatched event with the capture script injected (µs)."""
+    async with pool.context() as context:
+        page = await context.new_page()
+        await page.goto(url)
+        plain = await page.evaluate(DISPATCH_SCRIPT, events)
+    async with pool.context() as context:
+        page = await context.new_page()
+        thread._last_active_page = page
+        await thread.inject_event_listeners(page)
+        await page.goto(url)
+        captured = await page.evaluate(DISPATCH_SCRIPT, events)
+    # Two DOM events per iteration
+    return round(max(captured - plain, 0.0) * 1000 / (events * 2), 3)
+
+
+async def run_replay(pool, entries):
+    steps = normalize_trace(entries)
+    async with pool.context() as context:
+        page = await context.new_page()
+        start = time.perf_counter()
+        results = await replay_log(page, steps, wait_mode="fast")
+        elapsed = time.perf_counter() - start
+    failed = sum(1 for r in results if not r.ok)
+    return {
+        "replay_steps": len(steps),
+        "replay_seconds": round(elapsed, 3),
+        "replay_steps_per_second": round(len(steps) / elapsed, 2) if elapsed else None,
+        "replay_failed_steps": failed,
+    }
+
+
+async def run_screenshots(pool, url, directory, count=20):
+    """
+    Time each capture() call keeps the capture coroutine waiting. That
+    includes Chromium encoding the PNG; the file write runs on the pipeline's
+    pool.
+    """
+    pipeline = ScreenshotPipeline(directory=directory, drop_when_full=False)
+    timings = []
+    async with pool.context() as context:
+        page = await context.new_page()
+        await page.goto(url)
+        start = time.perf_counter()
+        for i in range(count):
+            call_start = time.perf_counter()
+            await pipeline.capture(page, f"bench_{i}")
+            timings.append(time.perf_counter() - call_start)
+            await page.mouse.wheel(0, 400)  # change the frame so deduplication does not skip it
+        await pipeline.drain()
+        total = time.perf_counter() - start
+    return {
+        "count": count,
+        "capture_ms": percentiles(timings, 1000),
+        "screenshots_per_second": round(count / total, 2) if total else None,
+    }
+
+
+async def run_benchmarks(scenarios, iterations, workdir):
+    server, base_url = start_fixture_server()
+    pool = BrowserPool(headless=True)
+    results = {"scenarios": {}}
+    try:
+        await pool.start()
+        for name in scenarios:
+            fixture, script = SCENARIOS[name]
+            url = f"{base_url}/{fixture}"
+            store = SessionStore(os.path.join(workdir, f"{name}.db"))
+            thread = BrowserThread(url, mode="capture", session_store=store)
+
+            delivered, elapsed, writer = await run_capture(
+                pool, thread, url, script, base_url, iterations, os.path.join(workdir, f"{name}.jsonl")
+            )
+            scenario = {
+                "dom_events": delivered,
+                "logged_entries": len(writer.entries),
+                "capture_seconds": round(elapsed, 3),
+                "events_per_second": round(delivered / elapsed, 2) if elapsed else None,
+                "log_latency_ms": percentiles(writer.latencies, 1000),
+            }
+            scenario.update(await run_replay(pool, writer.entries))
+            results["scenarios"][name] = scenario
+            store.close()
+            print(f"{name:<10} {delivered:>6} events  {scenario['events_per_second']} ev/s  "
+                  f"log p95 {scenario['log_latency_ms']['p95']} ms  "
+                  f"replay {scenario['replay_steps_per_second']} steps/s "
+                  f"({scenario['replay_failed_steps']} failed)", file=sys.stderr)
+
+        overhead_thread = BrowserThread(f"{base_url}/form.html", mode="capture",
+                                        session_store=SessionStore(os.path.join(workdir, "overhead.db")))
+        overhead_thread.log_writer = TimedLogWriter(os.path.join(workdir, "overhead.jsonl"))
+        overhead = await page_overhead(pool, overhead_thread, f"{base_url}/form.html")
+        overhead_thread.log_writer.close()
+        for scenario in results["scenarios"].values():
+            scenario["page_overhead_us"] = overhead
+        results["page_overhead_us"] = overhead
+
+        results["screenshots"] = await run_screenshots(
+            pool, f"{base_url}/long_list.html", os.path.join(workdir, "screenshots")
+        )
+    finally:
+        await pool.close()
+        server.shutdown()
+
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    results["peak_rss_mb"] = {
+        "python": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        # Largest reaped child (the Playwright driver); browser processes are its children
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1),
+    }
+    return results
+
+
+###############################################################################
+# Regression comparison
+###############################################################################
+def metric_value(data, dotted):
+    for part in dotted.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+
+def compare(baseline, current, tolerance):
+    """Print metric changes and return the regressions beyond `tolerance` (a fraction)."""
+    regressions = []
+    rows = []
+    for name in current["scenarios"]:
+        for metric, higher_is_better in METRICS.items():
+            rows.append((f"{name}.{metric}", higher_is_better,
+                         metric_value(baseline.get("scenarios", {}).get(name, {}), metric),
+                         metric_value(current["scenarios"][name], metric)))
+    for metric, higher_is_better in RUN_METRICS.items():
+        rows.append((metric, higher_is_better, metric_value(baseline, metric), metric_value(current, metric)))
+
+    for label, higher_is_better, old, new in rows:
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > tolerance else ""
+        print(f"{label:<40} {old:>12} -> {new:<12} {change:+.1%} {flag}")
+        if flag:
+            regressions.append(label)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark capture and replay against local fixture pages.")
+    parser.add_argument("--scenario", choices=list(SCENARIOS), action="append",
+                        help="Run only these scenarios (repeatable; default: all)")
+    parser.add_argument("--iterations", type=int, default=5, help="Repetitions of each interaction script")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative change counted as a regression (default 0.10)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = asyncio.run(run_benchmarks(args.scenario or list(SCENARIOS), args.iterations, workdir))
+    results["meta"] = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "iterations": args.iterations,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions beyond {args.tolerance:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+bot_bridge.py
+Delivers worker output from a queue.Queue to the GUI thread as a Qt signal.
+
+A daemon thread blocks on the queue, so nothing runs while the worker is
+idle. Messages that arrive close together are buffered and emitted as one
+list, at most once per frame, through a queued connection to the GUI thread.
+"""
+
+import threading
+
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
+
+_STOP = object()
+
+
+class BotQueueBridge(QObject):
+    messagesReady = pyqtSignal(list)
+    _wake = pyqtSignal()
+
+    def __init__(self, source_queue, frame_interval_ms=16, parent=None):
+        super().__init__(parent)
+        self.source_queue = source_queue
+        self._buffer = []
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.setInterval(frame_interval_ms)
+        self._frame_timer.timeout.connect(self._flush)
+        self._wake.connect(self._frame_timer.start, Qt.QueuedConnection)
+
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while True:
+            msg = self.source_queue.get()  # block until the worker produces something
+            if msg is _STOP:
+                break
+            with self._lock:
+                self._buffer.append(msg)
+                notify = not self._scheduled
+                self._scheduled = True
+            if notify:
+                self._wake.emit()
+
+    def _flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            self._scheduled = False
+        if batch:
+            self.messagesReady.emit(batch)
+
+    def stop(self):
+        """Stop the reader thread. Messages already buffered are still delivered."""
+        self.source_queue.put(_STOP)
+        self._reader.join(timeout=1)
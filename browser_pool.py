@@ -0,0 +1,203 @@
+"""
+browser_pool.py
+Long-lived Chromium processes shared by capture and replay runs.
+
+A BrowserPool keeps a playwright driver and warm browser processes and hands
+out isolated BrowserContexts, so a Send or Replay click costs a new context
+(tens of milliseconds) instead of a new driver and browser (seconds).
+
+Playwright objects are bound to the event loop that created them. Code that
+runs its own short-lived loops (e.g. a QThread calling asyncio.run) should
+use shared_pool() and run its coroutines on pool_loop() instead.
+"""
+
+import asyncio
+import atexit
+import threading
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+
+class _PooledBrowser:
+    def __init__(self, browser):
+        self.browser = browser
+        self.uses = 0  # contexts handed out over its lifetime
+        self.active = 0  # contexts currently open
+        self.retiring = False
+        self.closing = False  # retired and being closed; never handed out again
+
+
+class BrowserPool:
+    def __init__(self, headless=False, launch_args=None, max_browsers=1,
+                 max_contexts=8, recycle_after=50):
+        self.headless = headless
+        self.launch_args = list(launch_args or [])
+        self.max_browsers = max_browsers
+        self.max_contexts = max_contexts  # open contexts across all browsers
+        self.recycle_after = recycle_after  # contexts per browser before it is replaced
+
+        self._playwright = None
+        self._browsers = []
+        self._owners = {}  # context -> _PooledBrowser
+        self._slots = None
+        self._lock = None
+
+    async def start(self):
+        """Start the driver and one warm browser. Safe to call more than once."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.max_contexts)
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            if not self._browsers:
+                self._browsers.append(await self._launch())
+
+    async def _launch(self):
+        browser = await self._playwright.chromium.launch(headless=self.headless, args=self.launch_args)
+        return _PooledBrowser(browser)
+
+    async def _pick_browser(self):
+        """
+        Called with the lock held. Retiring browsers stay in _browsers until
+        their process has exited, so they count toward max_browsers. When
+        every browser is retiring, one replacement may go over the cap: a
+        retiring browser can hold a context for as long as the app runs (a
+        capture, the magentic side browser), so waiting for it could hang.
+        Past that, the least busy retiring browser that is not already
+        closing takes the context.
+        """
+        # Health check: drop browsers whose process has gone away
+        for pooled in list(self._browsers):
+            if not pooled.browser.is_connected():
+                self._browsers.remove(pooled)
+
+        candidates = [b for b in self._browsers if not b.retiring]
+        idle = [b for b in candidates if b.active == 0]
+        if idle:
+            return idle[0]
+        limit = self.max_browsers if candidates else self.max_browsers + 1
+        reusable = candidates or [b for b in self._browsers if not b.closing]
+        if len(self._browsers) < limit or not reusable:
+            pooled = await self._launch()
+            self._browsers.append(pooled)
+            return pooled
+        return min(reusable, key=lambda b: b.active)
+
+    async def acquire_context(self, **context_options):
+        """Open a new isolated context, waiting if max_contexts are already open."""
+        await self.start()
+        await self._slots.acquire()
+        try:
+            async with self._lock:
+                pooled = await self._pick_browser()
+                pooled.uses += 1
+                pooled.active += 1
+                if pooled.uses >= self.recycle_after:
+                    pooled.retiring = True
+            try:
+                context = await pooled.browser.new_context(**context_options)
+            except Exception:
+                pooled.active -= 1
+                raise
+        except Exception:
+            self._slots.release()
+            raise
+        self._owners[context] = pooled
+        return context
+
+    async def release_context(self, context):
+        pooled = self._owners.pop(context, None)
+        try:
+            await context.close()
+        except Exception:
+            pass  # the browser may already be gone
+        if pooled is None:
+            return
+        pooled.active -= 1
+        self._slots.release()
+        if pooled.retiring and pooled.active == 0 and not pooled.closing:
+            pooled.closing = True
+            try:
+                await pooled.browser.close()
+            except Exception:
+                pass
+            async with self._lock:
+                if pooled in self._browsers:
+                    self._browsers.remove(pooled)
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        context = await self.acquire_context(**context_options)
+        try:
+            yield context
+        finally:
+            await self.release_context(context)
+
+    async def close(self):
+        for context in list(self._owners):
+            await self.release_context(context)
+        for pooled in self._browsers:
+            try:
+                await pooled.browser.close()
+            except Exception:
+                pass
+        self._browsers = []
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+###############################################################################
+# Shared pools on a background event loop
+###############################################################################
+_pool_loop = None
+_pool_loop_lock = threading.Lock()
+_shared_pools = {}
+
+
+def pool_loop():
+    """Event loop of the background thread that owns the shared pools."""
+    global _pool_loop
+    with _pool_loop_lock:
+        if _pool_loop is None:
+            _pool_loop = asyncio.new_event_loop()
+            threading.Thread(target=_pool_loop.run_forever, name="browser-pool", daemon=True).start()
+            atexit.register(close_shared_pools)
+        return _pool_loop
+
+
+def run_on_pool_loop(coro):
+    """Run a coroutine on the pool loop from synchronous code and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, pool_loop()).result()
+
+
+def shared_pool(headless=False, launch_args=None, **pool_options):
+    """Return the shared pool for these launch settings; use it only from pool_loop()."""
+    key = (headless, tuple(launch_args or ()))
+    pool = _shared_pools.get(key)
+    if pool is None:
+        pool = BrowserPool(headless=headless, launch_args=launch_args, **pool_options)
+        _shared_pools[key] = pool
+    return pool
+
+
+def prewarm_shared_pool(headless=False, launch_args=None):
+    """Start the shared pool's browser in the background without waiting for it."""
+    return asyncio.run_coroutine_threadsafe(shared_pool(headless, launch_args).start(), pool_loop())
+
+
+def close_shared_pools(timeout=10):
+    if _pool_loop is None or not _shared_pools:
+        return
+
+    async def close_all():
+        for pool in list(_shared_pools.values()):
+            await pool.close()
+        _shared_pools.clear()
+
+    try:
+        asyncio.run_coroutine_threadsafe(close_all(), _pool_loop).result(timeout)
+    except Exception:
+        pass
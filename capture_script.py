@@ -0,0 +1,316 @@
+"""
+capture_script.py
+JavaScript snippets shared by the capture scripts injected in home.py and app.py.
+"""
+
+import json
+import time
+
+
+def event_monotonic_time(event: dict):
+    """
+    Capture time of a batched page event on Python's time.perf_counter() clock.
+    The page reports how long the event waited in its queue (age_ms), which is
+    subtracted from the time the batch arrived.
+    """
+    return time.perf_counter() - (event.get("age_ms") or 0) / 1000.0
+
+
+# How soon after a click or Enter the page must start navigating for the navigation to count as
+# caused by it (see trace_normalize.CAUSE_WINDOW)
+NAVIGATION_CAUSE_MS = 1000
+
+
+def event_batching_script(callback_name, flush_interval_ms=100, max_batch_size=25,
+                          cause_window_ms=NAVIGATION_CAUSE_MS):
+    """
+    Defines window.__queueCaptureEvent(evt) in the page. Events are buffered
+    and handed to the exposed `callback_name` function as one list, either
+    after `flush_interval_ms`, once `max_batch_size` events are queued, or
+    when the page is hidden or unloaded.
+
+    A click or Enter is marked "navigated": true when the page starts a
+    navigation (unload, pushState/replaceState, hash change) within
+    `cause_window_ms` of it. Its batch is held for that long so the mark can
+    be added before it is sent.
+
+    Each event is stamped with performance.now() when queued and sent with
+    its age_ms at flush time, so the receiver can recover when it happened.
+    When PAGE_METRICS_SCRIPT is installed, the last event of each batch
+    carries the page metrics since the previous snapshot as "perf".
+    """
+    return """
+        (function() {
+            if (window.__queueCaptureEvent) return;
+
+            let queue = [];
+            let timer = null;
+            let lastTrigger = null;
+
+            function isTrigger(evt) {
+                const action = String(evt.action || '').toLowerCase();
+                return action === 'click'
+                    || ((action === 'press' || action === 'keypress') && (evt.value || 'Enter') === 'Enter');
+            }
+
+            // The page is leaving the current document or URL; credit the click or Enter just before it
+            function markNavigation() {
+                if (lastTrigger && performance.now() - lastTrigger.queued_at <= %(cause_window_ms)d) {
+                    lastTrigger.navigated = true;
+                }
+                lastTrigger = null;
+            }
+
+            function flush() {
+                if (timer) {
+                    clearTimeout(timer);
+                    timer = null;
+                }
+                if (!queue.length || typeof window[%(callback)s] !== 'function') return;
+                const batch = queue;
+                queue = [];
+                const now = performance.now();
+                for (const evt of batch) {
+                    evt.age_ms = now - evt.queued_at;
+                    delete evt.queued_at;
+                }
+                if (typeof window.__perfSnapshot === 'function') {
+                    batch[batch.length - 1].perf = window.__perfSnapshot();
+                }
+                window[%(callback)s](batch);
+            }
+
+            window.__queueCaptureEvent = function(evt) {
+                evt.queued_at = performance.now();
+                queue.push(evt);
+                if (isTrigger(evt)) {
+                    lastTrigger = evt;
+                    // Hold the batch until it is known whether this click or Enter navigates
+                    if (timer) clearTimeout(timer);
+                    timer = setTimeout(flush, %(cause_window_ms)d);
+                } else if (queue.length >= %(max_batch_size)d) {
+                    flush();
+                } else if (!timer) {
+                    timer = setTimeout(flush, %(flush_interval_ms)d);
+                }
+            };
+            window.__flushCaptureEvents = flush;
+
+            for (const method of ['pushState', 'replaceState']) {
+                const original = history[method];
+                history[method] = function() {
+                    markNavigation();
+                    return original.apply(this, arguments);
+                };
+            }
+            window.addEventListener('hashchange', markNavigation, true);
+            window.addEventListener('beforeunload', () => {
+                markNavigation();
+                flush();
+            }, true);
+            window.addEventListener('pagehide', flush, true);
+            document.addEventListener('visibilitychange', () => {
+                if (document.visibilityState === 'hidden') flush();
+            }, true);
+        })();
+    """ % {
+        "callback": json.dumps(callback_name),
+        "flush_interval_ms": flush_interval_ms,
+        "max_batch_size": max_batch_size,
+        "cause_window_ms": cause_window_ms,
+    }
+
+
+# Defines window.__fingerprintElement(el) -> [[strategy, selector], ...], best first.
+# Strategies: id, test-attr, css-path (tags and stable attributes, no classes),
+# role (role + accessible name), text, nth-of-type. Class names are never used
+# because many sites generate them.
+ELEMENT_FINGERPRINT_SCRIPT = """
+    (function() {
+        if (window.__fingerprintElement) return;
+
+        const TEST_ATTRS = ['data-testid', 'data-test', 'data-test-id', 'data-qa', 'data-cy'];
+        const STABLE_ATTRS = ['name', 'aria-label', 'placeholder', 'type', 'href'];
+        const cache = new WeakMap();
+
+        function quote(value) {
+            return JSON.stringify(value);
+        }
+
+        function isUnique(selector) {
+            try {
+                return document.querySelectorAll(selector).length === 1;
+            } catch (e) {
+                return false;
+            }
+        }
+
+        function roleOf(el) {
+            const explicit = el.getAttribute('role');
+            if (explicit) return explicit.split(' ')[0];
+            switch (el.tagName) {
+                case 'A': return el.hasAttribute('href') ? 'link' : null;
+                case 'BUTTON': return 'button';
+                case 'SELECT': return 'combobox';
+                case 'TEXTAREA': return 'textbox';
+                case 'IMG': return 'img';
+                case 'INPUT': {
+                    const type = (el.getAttribute('type') || 'text').toLowerCase();
+                    if (['button', 'submit', 'reset', 'image'].includes(type)) return 'button';
+                    if (type === 'checkbox' || type === 'radio') return type;
+                    if (type === 'search') return 'searchbox';
+                    if (['text', 'email', 'tel', 'url', 'password'].includes(type)) return 'textbox';
+                    return null;
+                }
+            }
+            return null;
+        }
+
+        function accessibleName(el) {
+            const label = el.getAttribute('aria-label');
+            if (label) return label.trim();
+            const labelledBy = el.getAttribute('aria-labelledby');
+            if (labelledBy) {
+                const text = labelledBy.split(/\\s+/)
+                    .map(id => (document.getElementById(id) || {}).textContent || '')
+                    .join(' ').trim();
+                if (text) return text;
+            }
+            if (el.labels && el.labels.length) return el.labels[0].textContent.trim();
+            if (el.tagName === 'INPUT' && ['button', 'submit', 'reset'].includes(el.type)) return el.value;
+            if (el.tagName !== 'INPUT' && el.tagName !== 'TEXTAREA') {
+                const text = (el.innerText || '').trim();
+                if (text) return text;
+            }
+            return (el.getAttribute('placeholder') || el.getAttribute('alt') || el.getAttribute('title') || '').trim();
+        }
+
+        function stableStep(el) {
+            const tag = el.tagName.toLowerCase();
+            if (el.id) return tag + '#' + CSS.escape(el.id);
+            for (const attr of STABLE_ATTRS) {
+                const value = el.getAttribute(attr);
+                if (value && value.length <= 80) return tag + '[' + attr + '=' + quote(value) + ']';
+            }
+            return tag;
+        }
+
+        function stableCssPath(el) {
+            const parts = [];
+            let node = el;
+            while (node && node.nodeType === 1 && node !== document.documentElement && parts.length < 5) {
+                parts.unshift(stableStep(node));
+                const selector = parts.join(' > ');
+                if (isUnique(selector)) return selector;
+                if (node.id) break;
+                node = node.parentElement;
+            }
+            return null;
+        }
+
+        function nthOfTypePath(el) {
+            const parts = [];
+            let node = el;
+            while (node && node.nodeType === 1 && node !== document.documentElement) {
+                if (node === document.body) {
+                    parts.unshift('body');
+                    break;
+                }
+                let index = 1;
+                let sibling = node;
+                while ((sibling = sibling.previousElementSibling)) {
+                    if (sibling.tagName === node.tagName) index++;
+                }
+                parts.unshift(node.tagName.toLowerCase() + ':nth-of-type(' + index + ')');
+                node = node.parentElement;
+            }
+            return parts.join(' > ');
+        }
+
+        function fingerprint(el) {
+            const selectors = [];
+            const add = (strategy, selector) => {
+                if (selector && !selectors.some(s => s[1] === selector)) selectors.push([strategy, selector]);
+            };
+
+            if (el.id && isUnique('#' + CSS.escape(el.id))) add('id', '#' + CSS.escape(el.id));
+            for (const attr of TEST_ATTRS) {
+                const value = el.getAttribute(attr);
+                const selector = value && '[' + attr + '=' + quote(value) + ']';
+                if (selector && isUnique(selector)) add('test-attr', selector);
+            }
+            add('css-path', stableCssPath(el));
+
+            const role = roleOf(el);
+            const name = accessibleName(el);
+            if (role && name && name.length <= 80) add('role', 'role=' + role + '[name=' + quote(name) + ']');
+
+            const text = el.tagName === 'INPUT' || el.tagName === 'TEXTAREA' ? '' : (el.innerText || '').trim();
+            if (text && text.length <= 50 && !text.includes('\\n')) add('text', 'text=' + quote(text));
+
+            add('nth-of-type', nthOfTypePath(el));
+            return selectors;
+        }
+
+        // Input events fire per keystroke on the same element, so `cached` reuses the first result
+        window.__fingerprintElement = function(el, cached) {
+            if (!el || el.nodeType !== 1) return [];
+            if (cached && cache.has(el)) return cache.get(el);
+            const selectors = fingerprint(el);
+            cache.set(el, selectors);
+            return selectors;
+        };
+    })();
+"""
+
+
+# Defines window.__perfSnapshot() -> page metrics since the previous call:
+# request count, long tasks, and layout shift (CLS, ignoring shifts right after
+# input). The first snapshot after the document has loaded also carries its
+# Navigation Timing (TTFB, DOMContentLoaded, load, transfer size) and LCP.
+# Times are ms since navigation start. See page_metrics.py.
+PAGE_METRICS_SCRIPT = """
+    (function() {
+        if (window.__perfSnapshot) return;
+
+        const state = { lcp: null, cls: 0, longTasks: 0, longTaskMs: 0, requests: 0, navReported: false };
+
+        function observe(type, handler) {
+            try {
+                new PerformanceObserver(list => list.getEntries().forEach(handler)).observe({ type, buffered: true });
+            } catch (e) {
+                // Entry type not supported by this browser
+            }
+        }
+
+        observe('largest-contentful-paint', entry => { state.lcp = entry.renderTime || entry.startTime; });
+        observe('layout-shift', entry => { if (!entry.hadRecentInput) state.cls += entry.value; });
+        observe('longtask', entry => { state.longTasks += 1; state.longTaskMs += entry.duration; });
+        observe('resource', () => { state.requests += 1; });
+
+        const ms = value => value == null ? null : Math.round(value * 10) / 10;
+
+        window.__perfSnapshot = function() {
+            const snapshot = {
+                url: location.href,
+                requests: state.requests,
+                long_tasks: state.longTasks,
+                long_task_ms: ms(state.longTaskMs),
+                cls: Math.round(state.cls * 10000) / 10000,
+            };
+            if (!state.navReported) {
+                const nav = performance.getEntriesByType('navigation')[0];
+                if (nav && nav.loadEventEnd > 0) {
+                    state.navReported = true;
+                    snapshot.ttfb_ms = ms(nav.responseStart);
+                    snapshot.dom_content_loaded_ms = ms(nav.domContentLoadedEventEnd);
+                    snapshot.load_ms = ms(nav.loadEventEnd);
+                    snapshot.transfer_kb = ms(nav.transferSize / 1024);
+                    snapshot.lcp_ms = ms(state.lcp);
+                }
+            }
+            state.requests = state.longTasks = state.longTaskMs = state.cls = 0;
+            return snapshot;
+        };
+    })();
+"""
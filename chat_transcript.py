@@ -0,0 +1,182 @@
+"""
+chat_transcript.py
+Virtualized chat transcript for the BotWindow variants (magentic.py, Updated.py).
+
+Messages live in a list model and are painted by a delegate instead of one
+widget per message. Avatars come from a shared pixmap cache and row heights
+are cached per view width, so long agent runs stay cheap to scroll and resize.
+"""
+
+from collections import namedtuple
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize
+from PyQt5.QtGui import QColor, QFontMetrics, QPainter, QPalette, QPixmap
+from PyQt5.QtWidgets import QListView, QStyledItemDelegate
+
+ChatMessage = namedtuple("ChatMessage", ["avatar_path", "name", "text", "is_bot"])
+
+MessageRole = Qt.UserRole + 1
+
+_avatar_cache = {}
+
+
+def avatar_pixmap(path: str, size: int):
+    """Load and scale an avatar once per (path, size)."""
+    key = (path, size)
+    pixmap = _avatar_cache.get(key)
+    if pixmap is None:
+        pixmap = QPixmap(path)
+        if not pixmap.isNull():
+            pixmap = pixmap.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        _avatar_cache[key] = pixmap
+    return pixmap
+
+
+class ChatMessageModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._messages = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        message = self._messages[index.row()]
+        if role == MessageRole:
+            return message
+        if role == Qt.DisplayRole:
+            return message.text
+        return None
+
+    def append_message(self, message: ChatMessage):
+        self.append_messages([message])
+
+    def append_messages(self, messages):
+        if not messages:
+            return
+        first = len(self._messages)
+        self.beginInsertRows(QModelIndex(), first, first + len(messages) - 1)
+        self._messages.extend(messages)
+        self.endInsertRows()
+
+    def reset_messages(self, messages=()):
+        """Replace the whole transcript; the view drops its rows without per-row work."""
+        self.beginResetModel()
+        self._messages = list(messages)
+        self.endResetModel()
+
+
+class ChatBubbleDelegate(QStyledItemDelegate):
+    def __init__(self, avatar_size=40, margins=(10, 5), spacing=8, padding=0,
+                 radius=0, word_wrap=False, max_bubble_width=None,
+                 user_color=None, bot_color=None, parent=None):
+        super().__init__(parent)
+        self.avatar_size = avatar_size
+        self.margin_x, self.margin_y = margins
+        self.spacing = spacing
+        self.padding = padding
+        self.radius = radius
+        self.word_wrap = word_wrap
+        self.max_bubble_width = max_bubble_width
+        self.user_color = QColor(user_color) if user_color else None
+        self.bot_color = QColor(bot_color) if bot_color else None
+        self._heights = {}  # row -> height at _heights_width
+        self._heights_width = None
+
+    def clear_cache(self):
+        self._heights = {}
+        self._heights_width = None
+
+    def _text_width(self, row_width):
+        width = row_width - 2 * self.margin_x - self.avatar_size - self.spacing - 2 * self.padding
+        if self.max_bubble_width:
+            width = min(width, self.max_bubble_width - 2 * self.padding)
+        return max(width, 10)
+
+    def _text_flags(self):
+        return Qt.AlignLeft | Qt.AlignTop | (Qt.TextWordWrap if self.word_wrap else Qt.TextSingleLine)
+
+    def _text_rect(self, metrics: QFontMetrics, text: str, width: int):
+        if self.word_wrap:
+            return metrics.boundingRect(QRect(0, 0, width, 1_000_000), self._text_flags(), text)
+        return QRect(0, 0, min(metrics.horizontalAdvance(text), width), metrics.height())
+
+    @staticmethod
+    def _row_width(option):
+        widget = option.widget
+        if widget is not None and hasattr(widget, "viewport"):
+            return widget.viewport().width()
+        return option.rect.width()
+
+    def sizeHint(self, option, index):
+        width = self._row_width(option)
+        if width != self._heights_width:
+            # Heights depend on the wrap width; only the current width's are kept
+            self._heights = {}
+            self._heights_width = width
+        row = index.row()
+        height = self._heights.get(row)
+        if height is None:
+            message = index.data(MessageRole)
+            text_rect = self._text_rect(QFontMetrics(option.font), message.text, self._text_width(width))
+            content = max(self.avatar_size, text_rect.height() + 2 * self.padding)
+            height = content + 2 * self.margin_y
+            self._heights[row] = height
+        return QSize(width, height)
+
+    def paint(self, painter, option, index):
+        message = index.data(MessageRole)
+        rect = option.rect.adjusted(self.margin_x, self.margin_y, -self.margin_x, -self.margin_y)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.drawPixmap(rect.left(), rect.top(), avatar_pixmap(message.avatar_path, self.avatar_size))
+
+        metrics = QFontMetrics(option.font)
+        text_width = self._text_width(option.rect.width())
+        text = message.text
+        if not self.word_wrap:
+            text = metrics.elidedText(text, Qt.ElideRight, text_width)
+        text_rect = self._text_rect(metrics, text, text_width)
+        text_rect.moveTo(rect.left() + self.avatar_size + self.spacing + self.padding, rect.top() + self.padding)
+
+        color = self.bot_color if message.is_bot else self.user_color
+        if color is not None:
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(color)
+            bubble = text_rect.adjusted(-self.padding, -self.padding, self.padding, self.padding)
+            painter.drawRoundedRect(bubble, self.radius, self.radius)
+
+        painter.setFont(option.font)
+        painter.setPen(option.palette.color(QPalette.Text))
+        painter.drawText(text_rect, self._text_flags(), text)
+        painter.restore()
+
+
+class ChatTranscriptView(QListView):
+    def __init__(self, delegate: ChatBubbleDelegate = None, parent=None):
+        super().__init__(parent)
+        self.transcript = ChatMessageModel(self)
+        self.bubble_delegate = delegate or ChatBubbleDelegate()
+        self.setModel(self.transcript)
+        self.setItemDelegate(self.bubble_delegate)
+        self.transcript.modelReset.connect(self.bubble_delegate.clear_cache)
+
+        self.setSelectionMode(QListView.NoSelection)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setResizeMode(QListView.Adjust)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(500)
+
+    def add_message(self, avatar_path: str, name: str, text: str, is_bot=False):
+        self.transcript.append_message(ChatMessage(avatar_path, name, text, is_bot))
+
+    def add_messages(self, messages):
+        self.transcript.append_messages(messages)
+
+    def reset_messages(self, messages=()):
+        self.transcript.reset_messages(messages)
@@ -1,117 +1,161 @@
 import sys
-import json
+import html
+import re
 import asyncio
 import time
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QTextEdit, QLineEdit,
-    QPushButton, QScrollArea, QLabel, QHBoxLayout, QGridLayout, QDialog,
+    QPushButton, QLabel, QHBoxLayout, QDialog,
     QVBoxLayout as QVBoxDialogLayout
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, QSize, pyqtSignal
 from PyQt5.QtGui import QPixmap, QFont
-from playwright.async_api import async_playwright, Page, BrowserContext
+from playwright.async_api import Page, BrowserContext
 import os
-
-class ClickableLabel(QLabel):
-    clicked = pyqtSignal(str)
-    def __init__(self, image_path: str, parent=None):
-        super().__init__(parent)
-        self.image_path = image_path
-
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.clicked.emit(self.image_path)
+from browser_pool import shared_pool, run_on_pool_loop, prewarm_shared_pool
+from capture_script import (
+    ELEMENT_FINGERPRINT_SCRIPT, PAGE_METRICS_SCRIPT, event_batching_script, event_monotonic_time
+)
+from interaction_log import LOG_FILE, load_interaction_logs, interaction_logs_exist, clear_interaction_logs
+from network_archive import (
+    archive_path, clear_network_archive, network_archive_exists, recording_options, replay_context_options,
+    response_sizes, serve_from_archive
+)
+from page_metrics import find_regressions, format_regressions, navigation_metrics
+from replay_checkpoint import (
+    CHECKPOINT_INTERVAL, CheckpointStore, Checkpointer, checkpoint_context_options, checkpoint_name,
+    clear_checkpoints
+)
+from replay_engine import initial_url, replay_log
+from replay_tracing import Tracer, format_histogram, latency_histogram, trace_path, write_chrome_trace
+from resource_profiles import ResourceFilter
+from screenshot_pipeline import ScreenshotPipeline, screenshot_name
+from screenshot_gallery import ScreenshotGallery
+from session_store import SessionEventWriter, SessionStore, session_archive_path
+from trace_normalize import TraceNormalizer, normalize_trace
 
 class BrowserThread(QThread):
     update_chat = pyqtSignal(str)
     update_screenshot = pyqtSignal(str)
     
-    def __init__(self, url, mode='capture'):
+    def __init__(self, url, mode='capture', keep_intermediate_inputs=False,
+                 screenshot_format='png', screenshot_quality=80, screenshot_dedupe_distance=4,
+                 replay_wait_mode='fast', replay_speed=1.0, record_network=False,
+                 replay_network='fallthrough', replay_profile='full', session_store=None, session_id=None,
+                 collect_perf=False, resume=False, start_at=None, checkpoint_every=CHECKPOINT_INTERVAL):
         super().__init__()
         self.url = url.strip()
         self.mode = mode  # 'capture' or 'replay'
-        self.logs = []
+        self.session_store = session_store or SessionStore()
+        self.session_id = session_id  # Session to replay (latest when None); set when capturing
+        self.replay_wait_mode = replay_wait_mode  # 'fast', 'fixed' or 'recorded' (original pacing)
+        self.replay_speed = replay_speed  # Speed factor for 'recorded' pacing
+        self.record_network = record_network  # Opt-in: record traffic, response bodies included, to a HAR archive
+        self.replay_network = replay_network  # 'live', 'strict' or 'fallthrough' (see network_archive)
+        self.replay_profile = replay_profile  # Resource profile for replays (see resource_profiles)
+        self.collect_perf = collect_perf  # Store page performance metrics with each step (see page_metrics)
+        self.resume = resume  # Continue the replay from its last good checkpoint
+        self.start_at = start_at  # Or from the latest checkpoint at or before this step
+        self.checkpoint_every = checkpoint_every  # Good steps between replay checkpoints; None disables them
+        self.log_writer = None
+        self.trace_normalizer = TraceNormalizer(keep_intermediate=keep_intermediate_inputs)
+        self.tracer = Tracer(mode)  # Timing spans of capture callbacks or replay steps
         self.is_capturing = True
 
         self.last_screenshot_time = 0
         self.screenshot_interval = 2.0
-
-        
-        if os.path.exists('interaction_logs.json'):
-            try:
-                with open('interaction_logs.json', 'r') as f:
-                    content = f.read().strip()
-                    if content:
-                        self.logs = json.loads(content)
-                    else:
-                        self.logs = []
-            except json.JSONDecodeError:
-                self.logs = []
+        self.screenshot_format = screenshot_format  # 'png', 'jpeg' or 'webp'
+        self.screenshot_quality = screenshot_quality
+        self.screenshot_dedupe_distance = screenshot_dedupe_distance  # None keeps near-identical frames
+        self.screenshot_pipeline = None
 
     def stop_capture(self):
         self.is_capturing = False
 
-    async def log_interaction(self, action, target, url, value=None):
-        if not self.is_capturing:
-            return
-
+    def build_log_entry(self, action, target, url, value=None, mono=None, selectors=None):
         log_entry = {
             "timestamp": datetime.utcnow().isoformat() + "Z",
+            # High-resolution monotonic capture time (seconds), used for time-scaled replay
+            "mono": round(time.perf_counter() if mono is None else mono, 6),
             "action": action,
             "target": target,
             "url": url
         }
         if value is not None:
             log_entry["value"] = value
-            
-        self.logs.append(log_entry)
-        
-        try:
-            with open('interaction_logs.json', 'w') as f:
-                json.dump(self.logs, f, indent=2)
-        except Exception as e:
-            print(f"Error writing logs: {e}")
-        
-        msg = f"{action} on {target}"
-        if value:
-            msg += f": {value}"
-        self.update_chat.emit(msg)
+        if selectors:
+            log_entry["selectors"] = selectors  # Ranked [strategy, selector] fallbacks for replay
+        return log_entry
+
+    async def log_interaction(self, action, target, url, value=None):
+        await self.log_entries([self.build_log_entry(action, target, url, value)])
+
+    async def log_entries(self, entries):
+        if not self.is_capturing or not entries:
+            return
+
+        # Keystrokes on one field and redundant navigations are held back until they can be merged or dropped
+        ready = []
+        for entry in entries:
+            ready.extend(self.trace_normalizer.push(entry))
+        if not ready:
+            return
+        entries = ready
+
+        if self.log_writer:
+            self.log_writer.extend(entries)
+
+        messages = []
+        for entry in entries:
+            msg = f"{entry['action']} on {entry['target']}"
+            if entry.get("value"):
+                msg += f": {entry['value']}"
+            messages.append(msg)
+        self.update_chat.emit("<br>".join(messages))
 
     async def maybe_take_screenshot(self, page: Page):
+        if not self.screenshot_pipeline:
+            return
         current_time = time.time()
         if (current_time - self.last_screenshot_time) >= self.screenshot_interval:
             self.last_screenshot_time = current_time
-            screenshot_path = f'screenshots/screenshot_{datetime.now().strftime("%Y%m%d_%H%M%S")}.png'
-            await page.screenshot(path=screenshot_path)
-            self.update_screenshot.emit(screenshot_path)
+            # The step that triggered this screenshot, even while the normalizer still holds it back
+            step = self.log_writer.step_index(self.trace_normalizer.held) if self.log_writer else None
+            # Chromium encodes the frame; the write happens on the pipeline's pool, then update_screenshot is emitted
+            with self.tracer.span("screenshot", "capture"):
+                path = await self.screenshot_pipeline.capture(page, screenshot_name())
+            if path and self.log_writer:
+                self.log_writer.expect_screenshot(path, step)
 
     async def inject_event_listeners(self, page: Page):
-        await page.expose_function("reportDomEvent", self.report_dom_event)
-        
-        script = """
+        await page.expose_function("reportDomEvents", self.report_dom_events)
+
+        script = event_batching_script("reportDomEvents") + ELEMENT_FINGERPRINT_SCRIPT
+        if self.collect_perf:
+            script += PAGE_METRICS_SCRIPT
+        script += """
             (function() {
                 if (window.__event_injected) return;
                 window.__event_injected = true;
 
-                function getSelector(el) {
-                    if (!el) return '';
-                    if (el.id) return '#' + el.id;
-                    if (el.className) {
-                        let classes = el.className.toString().split(' ');
-                        if (classes[0])
-                            return el.tagName.toLowerCase() + '#' + classes[0];
-                    }
-                    return el.tagName.toLowerCase();
+                // Ranked selectors for the element; the best one doubles as the target
+                function describe(el, cached) {
+                    const selectors = window.__fingerprintElement(el, cached);
+                    return {
+                        target: selectors.length ? selectors[0][1] : (el && el.tagName ? el.tagName.toLowerCase() : ''),
+                        selectors: selectors
+                    };
                 }
 
-               
                 document.addEventListener('click', e => {
-                    let selector = getSelector(e.target);
-                    if (selector !== 'html' && selector !== 'body') {
-                        window.reportDomEvent({
+                    let tag = e.target && e.target.tagName;
+                    if (tag && tag !== 'HTML' && tag !== 'BODY') {
+                        let element = describe(e.target, false);
+                        window.__queueCaptureEvent({
                             action: 'Click',
-                            target: selector,
+                            target: element.target,
+                            selectors: element.selectors,
                             value: '',
                             url: window.location.href
                         });
@@ -121,7 +165,7 @@ class BrowserThread(QThread):
              
                 document.addEventListener('keydown', e => {
                     if (e.key === 'Enter') {
-                        window.reportDomEvent({
+                        window.__queueCaptureEvent({
                             action: 'KeyPress',
                             target: 'keyboard',
                             value: 'Enter',
@@ -132,14 +176,15 @@ class BrowserThread(QThread):
 
               
                 document.addEventListener('input', e => {
-                    let selector = getSelector(e.target);
+                    let element = describe(e.target, true);
                     let value = '';
                     if (e.target && 'value' in e.target) {
                         value = e.target.value;
                     }
-                    window.reportDomEvent({
+                    window.__queueCaptureEvent({
                         action: 'Input',
-                        target: selector,
+                        target: element.target,
+                        selectors: element.selectors,
                         value: value,
                         url: window.location.href
                     });
@@ -149,23 +194,34 @@ class BrowserThread(QThread):
         await page.add_init_script(script)
         await page.evaluate(script)
 
-    async def report_dom_event(self, event_data: dict):
-        action = event_data.get("action", "")
-        target = event_data.get("target", "")
-        value = event_data.get("value", "")
-        url = event_data.get("url", "")
-
-        if not self.is_capturing:
+    async def report_dom_events(self, events: list):
+        if not self.is_capturing or not events:
             return
-        
-        await self.log_interaction(action, target, url, value)
+
+        with self.tracer.span("report_dom_events", "capture", events=len(events)):
+            entries = [
+                self.build_log_entry(
+                    event_data.get("action", ""),
+                    event_data.get("target", ""),
+                    event_data.get("url", ""),
+                    event_data.get("value", ""),
+                    mono=event_monotonic_time(event_data),
+                    selectors=event_data.get("selectors")
+                )
+                for event_data in events
+            ]
+            await self.log_entries(entries)
         if self._last_active_page:
             await self.maybe_take_screenshot(self._last_active_page)
 
     async def handle_frame_navigated(self, frame):
         if frame == self._last_active_page.main_frame:
             url = frame.url
-            await self.log_interaction("Navigate", "main_frame", url)
+            with self.tracer.span("handle_frame_navigated", "capture", url=url):
+                entry = self.build_log_entry("Navigate", "main_frame", url)
+                if self.collect_perf:
+                    entry["perf"] = await navigation_metrics(frame.page)
+                await self.log_entries([entry])
             await asyncio.sleep(0.3)
             await self.maybe_take_screenshot(self._last_active_page)
 
@@ -192,100 +248,154 @@ class BrowserThread(QThread):
         while self.is_capturing:
             await asyncio.sleep(1)
 
-    async def replay_mode(self, page: Page):
+    def load_replay_source(self):
+        """Events and network archive of the session to replay; the legacy log files if there are no sessions."""
+        if self.session_id is None:
+            self.session_id = self.session_store.latest_session_id()
+        if self.session_id is not None:
+            events = self.session_store.session_events(self.session_id)
+            return events, session_archive_path(self.session_id, create_dir=False)
+        return load_interaction_logs(), archive_path()
+
+    def checkpoint_store(self):
+        return CheckpointStore(checkpoint_name(self.session_id if self.session_id is not None else LOG_FILE))
+
+    def find_checkpoint(self, steps):
+        """Checkpoint to resume from when resuming was asked for; None replays from the first step."""
+        if not self.resume and self.start_at is None:
+            return None
+        checkpoint = self.checkpoint_store().resume_point(steps, self.start_at)
+        if checkpoint is None:
+            self.update_chat.emit("No usable checkpoint, replaying from the first step")
+        return checkpoint
+
+    async def replay_mode(self, context: BrowserContext, page: Page, replay_logs, archive, checkpoint=None):
         try:
-            if not os.path.exists('interaction_logs.json') or os.path.getsize('interaction_logs.json') == 0:
+            if not replay_logs:
                 self.update_chat.emit("No interaction logs found or file is empty")
                 return
-
-            with open('interaction_logs.json', 'r') as f:
-                content = f.read().strip()
-                if not content:
-                    self.update_chat.emit("Interaction logs file is empty")
-                    return
-                replay_logs = json.loads(content)
-
-            initial_url = None
-            for log in replay_logs:
-                if log.get("url"):
-                    initial_url = log["url"]
-                    break
-
-            if initial_url:
-                if initial_url.startswith("http"):
-                    await page.goto(initial_url)
-                    await asyncio.sleep(2)
-                else:
-                    self.update_chat.emit(f"Skipping invalid initial URL: {initial_url}")
-
-            for log in replay_logs:
-                action = log.get("action")
-                target = log.get("target")
-                value = log.get("value", "")
-                log_url = log.get("url", "")
-
-                try:
-                    if action == "Click":
-                        element = await page.wait_for_selector(target, timeout=5000)
-                        if element:
-                            await element.click()
-                            await asyncio.sleep(0.3)
-                            
-                    elif action == "Input":
-                        element = await page.wait_for_selector(target, timeout=5000)
-                        if element:
-                            await element.fill(value)
-                            await asyncio.sleep(0.3)
-                            
-                    elif action == "KeyPress" and value == "Enter":
-                        await page.keyboard.press("Enter")
-                        await asyncio.sleep(1)
-
-                    elif action == "Navigate":
-                        if log_url.startswith("http"):
-                            await page.goto(log_url)
-                            await asyncio.sleep(1)
-                        else:
-                            self.update_chat.emit(f"Skipping invalid URL: '{log_url}'")
-
-                    elif action == "OpenNewTab":
-                        if log_url.startswith("chrome://"):
-                            self.update_chat.emit(f"Skipping internal browser URL: {log_url}")
-                        else:
-                            self.update_chat.emit(f"OpenNewTab replay not implemented: {log_url}")
-
-                    self.update_chat.emit(f"Replayed: {action} on {target}")
-                except Exception as e:
-                    self.update_chat.emit(f"Failed to replay action: {str(e)}")
-
+            if self.session_id is not None:
+                self.update_chat.emit(f"Replaying session {self.session_id}")
+            if checkpoint:
+                self.update_chat.emit(f"Resuming at step {checkpoint.step} of {len(replay_logs)} from {checkpoint.url}")
+
+            if await serve_from_archive(context, archive, self.replay_network):
+                self.update_chat.emit(f"Serving network requests from {archive} ({self.replay_network})")
+            # Installed after the archive route so it sees requests first
+            known_sizes = response_sizes(archive) if network_archive_exists(archive) else None
+            resource_filter = ResourceFilter(self.replay_profile, initial_url(replay_logs), known_sizes)
+            await resource_filter.install(context)
+
+            results = await replay_log(
+                page, replay_logs,
+                wait_mode=self.replay_wait_mode,
+                speed=self.replay_speed,
+                on_step=self.report_replay_step,
+                tracer=self.tracer,
+                collect_perf=self.collect_perf,
+                start=checkpoint.step if checkpoint else 0,
+                resume_url=checkpoint.url if checkpoint else None,
+                checkpointer=Checkpointer(self.checkpoint_store(), replay_logs, self.checkpoint_every)
+                if self.checkpoint_every else None
+            )
+            self.update_chat.emit(resource_filter.describe())
+            if self.collect_perf:
+                report = format_regressions(find_regressions(replay_logs, results))
+                self.update_chat.emit(html.escape(report).replace("\n", "<br>"))
+            if self.session_id is not None:
+                self.session_store.record_replay(self.session_id, results, self.replay_wait_mode)
         except Exception as e:
             self.update_chat.emit(f"Error during replay: {str(e)}")
 
+    def report_replay_step(self, result):
+        if not result.ok:
+            self.update_chat.emit(f"Failed to replay action: {result.message}")
+        elif result.skipped:
+            self.update_chat.emit(result.message)
+        else:
+            self.update_chat.emit(f"Replayed: {result.action} on {result.target}")
+
     async def browser_automation(self):
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=False)
-                context = await browser.new_context()
+            if self.mode == 'capture':
+                if not (self.url.startswith('http://') or self.url.startswith('https://')):
+                    self.url = 'https://' + self.url
+                self.session_id = self.session_store.create_session(self.url, source='home')
+                archive = session_archive_path(self.session_id)
+                context_options = recording_options(archive) if self.record_network else {}
+            else:
+                events, archive = self.load_replay_source()
+                replay_logs = normalize_trace(events)
+                # A checkpoint's cookies and localStorage are restored when the context is created
+                checkpoint = self.find_checkpoint(replay_logs)
+                context_options = {**replay_context_options(self.replay_network),
+                                   **checkpoint_context_options(checkpoint)}
+            # Contexts come from the warm shared browser instead of a fresh driver and Chromium per run
+            # The network archive is written when the context closes
+            async with shared_pool(headless=False).context(**context_options) as context:
                 page = await context.new_page()
-                
+
                 if not os.path.exists('screenshots'):
                     os.makedirs('screenshots')
 
                 if self.mode == 'capture':
-                    if not (self.url.startswith('http://') or self.url.startswith('https://')):
-                        self.url = 'https://' + self.url
-                    await page.goto(self.url)
-                    await self.maybe_take_screenshot(page)
-                    await self.capture_mode(context, page)
+                    # Events are batched into the session's rows; closing the writer ends the session
+                    self.log_writer = SessionEventWriter(self.session_store, self.session_id)
+                    self.screenshot_pipeline = ScreenshotPipeline(
+                        image_format=self.screenshot_format,
+                        quality=self.screenshot_quality,
+                        dedupe_distance=self.screenshot_dedupe_distance,
+                        on_saved=self.on_screenshot_saved,
+                        on_duplicate=self.on_screenshot_duplicate,
+                        on_error=self.update_chat.emit
+                    )
+                    try:
+                        await page.goto(self.url)
+                        await self.maybe_take_screenshot(page)
+                        await self.capture_mode(context, page)
+                    finally:
+                        # Pending screenshots are linked to the session before it is closed
+                        await self.screenshot_pipeline.drain()
+                        self.log_writer.extend(self.trace_normalizer.flush())
+                        self.log_writer.close()
+                        self.update_chat.emit(f"Saved capture as session {self.session_id}")
+                        loads_saved = self.trace_normalizer.navigations.loads_saved
+                        if loads_saved:
+                            self.update_chat.emit(f"Dropped {loads_saved} redundant navigations from the log")
+                        self.save_trace("capture")
                 else:
-                    await self.replay_mode(page)
-                    
-                await browser.close()
+                    try:
+                        await self.replay_mode(context, page, replay_logs, archive, checkpoint)
+                    finally:
+                        self.save_trace("step")
         except Exception as e:
             self.update_chat.emit(f"Browser automation error: {str(e)}")
 
+    def save_trace(self, category):
+        """Write the run's spans as a Chrome trace and post the latency histogram of `category` spans."""
+        if not self.tracer.spans:
+            return
+        name = f"session_{self.session_id}_{self.mode}" if self.session_id is not None else self.mode
+        path = write_chrome_trace(trace_path(name), [self.tracer])
+        self.update_chat.emit(f"Timing trace saved to {path} (open in chrome://tracing)")
+        histogram = format_histogram(latency_histogram([self.tracer], category))
+        if histogram:
+            self.update_chat.emit(html.escape(histogram).replace("\n", "<br>"))
+
+    def on_screenshot_saved(self, path):
+        # Runs on the event loop thread (the pipeline's done callback), after the file is on disk
+        if self.log_writer:
+            self.log_writer.add_screenshot(path)
+        self.update_screenshot.emit(path)
+
+    def on_screenshot_duplicate(self, path, earlier_path):
+        # Not written; the session links the step to the earlier, identical frame
+        if self.log_writer:
+            self.log_writer.add_screenshot(earlier_path, skipped_path=path)
+
     def run(self):
-        asyncio.run(self.browser_automation())
+        # Playwright objects belong to the pool's loop, so the automation runs there
+        run_on_pool_loop(self.browser_automation())
 
 
 class ZoomDialog(QDialog):
@@ -322,24 +432,12 @@ class ChatbotWindow(QMainWindow):
         self.chat_display.setReadOnly(True)
         layout.addWidget(self.chat_display)
 
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setFixedHeight(500)
-        layout.addWidget(scroll_area)
-
-        screenshot_widget = QWidget()
-        self.screenshot_grid = QGridLayout(screenshot_widget)
-        self.screenshot_grid.setHorizontalSpacing(5)
-        self.screenshot_grid.setVerticalSpacing(5)
-        self.screenshot_grid.setContentsMargins(5, 5, 5, 5)
-
-        screenshot_widget.setStyleSheet("background-color: #222;")
-        screenshot_widget.setLayout(self.screenshot_grid)
-        scroll_area.setWidget(screenshot_widget)
-
-        self.screenshot_col = 0
-        self.screenshot_row = 0
-        self.max_cols = 3
+        # Virtualized gallery: only visible thumbnails are loaded
+        self.screenshot_gallery = ScreenshotGallery(QSize(280, 180))
+        self.screenshot_gallery.setFixedHeight(500)
+        self.screenshot_gallery.setStyleSheet("background-color: #222;")
+        self.screenshot_gallery.screenshotClicked.connect(self.open_zoom_dialog)
+        layout.addWidget(self.screenshot_gallery)
 
         # Button layout
         button_layout = QHBoxLayout()
@@ -374,6 +472,8 @@ class ChatbotWindow(QMainWindow):
 
         self.show_welcome_message()
         self.browser_thread = None
+        self.session_store = SessionStore()  # Every capture is a session; replays pick one by id
+        prewarm_shared_pool(headless=False)  # Launch Chromium now so the first Send is fast
 
         self.setStyleSheet("""
             QTextEdit, QLabel {
@@ -385,8 +485,9 @@ class ChatbotWindow(QMainWindow):
         welcome_msg = """<b>Welcome to the Browser Automation Chatbot!</b><br>
 Type a website URL or commands in the multi-line box below and press Send to start capturing.<br>
 - Click "Stop Capture" to stop logging<br>
-- Click "Replay" to replay recorded interactions<br>
-- Click "Clear Logs" to remove the interaction logs<br><br>
+- Click "Replay" to replay the latest session, or type a session id first to replay that one<br>
+- Type "resume" (or "12 resume") before Replay to continue from the last checkpoint, or "from 40" to start near step 40<br>
+- Click "Clear Logs" to remove all recorded sessions<br><br>
 """
         self.chat_display.append(welcome_msg)
 
@@ -400,7 +501,7 @@ Type a website URL or commands in the multi-line box below and press Send to sta
         self.input_field.clear()
 
         # Start capture mode with the user input as a URL or command
-        self.browser_thread = BrowserThread(user_input, mode='capture')
+        self.browser_thread = BrowserThread(user_input, mode='capture', session_store=self.session_store)
         self.browser_thread.update_chat.connect(self.update_chat)
         self.browser_thread.update_screenshot.connect(self.show_screenshot)
         self.browser_thread.start()
@@ -411,8 +512,26 @@ Type a website URL or commands in the multi-line box below and press Send to sta
             self.chat_display.append("<span style='color:red;'>Bot:</span> Stopped capturing interactions")
 
     def replay_interactions(self):
-        if os.path.exists('interaction_logs.json'):
-            self.browser_thread = BrowserThread('', mode='replay')
+        session_id = None
+        resume, start_at = False, None
+        typed = self.input_field.toPlainText().strip()
+        # "[session id] [resume | from <step>]"
+        match = re.fullmatch(r"(\d+)?\s*(?:(resume)|from\s+(\d+))?", typed, re.IGNORECASE)
+        if typed and match:
+            self.input_field.clear()
+            resume = bool(match.group(2))
+            start_at = int(match.group(3)) if match.group(3) else None
+        if typed and match and match.group(1):
+            session_id = int(match.group(1))
+            if self.session_store.session(session_id) is None:
+                self.chat_display.append(f"<span style='color:red;'>Bot:</span> No session {session_id}")
+                return
+
+        if session_id is not None or self.session_store.latest_session_id() is not None or interaction_logs_exist():
+            self.browser_thread = BrowserThread(
+                '', mode='replay', session_store=self.session_store, session_id=session_id,
+                resume=resume, start_at=start_at
+            )
             self.browser_thread.update_chat.connect(self.update_chat)
             self.browser_thread.update_screenshot.connect(self.show_screenshot)
             self.browser_thread.start()
@@ -421,8 +540,10 @@ Type a website URL or commands in the multi-line box below and press Send to sta
             self.chat_display.append("<span style='color:red;'>Bot:</span> No recorded interactions found")
 
     def clear_logs(self):
-        if os.path.exists('interaction_logs.json'):
-            os.remove('interaction_logs.json')
+        clear_network_archive()
+        clear_checkpoints()
+        sessions_cleared = self.session_store.clear()
+        if clear_interaction_logs() or sessions_cleared:
             self.chat_display.append("<span style='color:red;'>Bot:</span> Interaction logs cleared.")
         else:
             self.chat_display.append("<span style='color:red;'>Bot:</span> No logs to clear.")
@@ -433,18 +554,7 @@ Type a website URL or commands in the multi-line box below and press Send to sta
         scrollbar.setValue(scrollbar.maximum())
 
     def show_screenshot(self, path):
-        from PyQt5.QtCore import Qt
-        clickable_label = ClickableLabel(path)
-        pixmap = QPixmap(path)
-        scaled_pixmap = pixmap.scaled(280, 180, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        clickable_label.setPixmap(scaled_pixmap)
-        clickable_label.clicked.connect(self.open_zoom_dialog)
-
-        self.screenshot_grid.addWidget(clickable_label, self.screenshot_row, self.screenshot_col)
-        self.screenshot_col += 1
-        if self.screenshot_col >= self.max_cols:
-            self.screenshot_col = 0
-            self.screenshot_row += 1
+        self.screenshot_gallery.add_screenshot(path)
 
     def open_zoom_dialog(self, image_path: str):
         dlg = ZoomDialog(image_path, self)
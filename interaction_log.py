@@ -0,0 +1,157 @@
+"""
+interaction_log.py
+Append-only JSON Lines storage for captured interactions.
+
+Entries are buffered in memory and written by a background flusher thread,
+so logging an event never rewrites the whole file. The reader also accepts
+the older JSON-array interaction_logs.json files and compact trace files.
+"""
+
+import json
+import os
+import threading
+
+LOG_FILE = "interaction_logs.jsonl"
+LEGACY_LOG_FILE = "interaction_logs.json"
+
+
+class InteractionLogWriter:
+    """
+    Buffers log entries and appends them to a JSON Lines file.
+
+    The buffer is flushed when it holds `flush_count` entries, every
+    `flush_interval` seconds, and on close().
+    """
+
+    def __init__(self, path=LOG_FILE, flush_count=50, flush_interval=1.0):
+        self.path = path
+        self.flush_count = flush_count
+        self.flush_interval = flush_interval
+
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self._flusher = threading.Thread(target=self._run, daemon=True)
+        self._flusher.start()
+
+    def append(self, entry: dict):
+        self.extend([entry])
+
+    def extend(self, entries):
+        if self._closed:
+            return
+        with self._buffer_lock:
+            self._buffer.extend(entries)
+            pending = len(self._buffer)
+        if pending >= self.flush_count:
+            self._wake.set()
+
+    def flush(self):
+        """Write out everything buffered so far."""
+        with self._buffer_lock:
+            entries, self._buffer = self._buffer, []
+        if not entries:
+            return
+        with self._write_lock:
+            try:
+                self._write(entries)
+            except Exception as e:
+                print(f"Error writing logs: {e}")
+
+    def _write(self, entries):
+        lines = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def close(self):
+        """Stop the flusher thread and write any remaining entries."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._flusher.join()
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_interaction_logs(path):
+    """
+    Yield entries from a log file written either as a JSON array or as
+    JSON Lines. Unreadable lines (e.g. a partial last line) are skipped.
+    Compact trace files (trace_format.py) are streamed block by block.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+
+    from trace_format import is_trace_file, iter_trace  # trace_format imports this module
+    if is_trace_file(path):
+        yield from iter_trace(path)
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        first = ""
+        while not first:
+            ch = f.read(1)
+            if not ch:
+                return
+            if not ch.isspace():
+                first = ch
+        f.seek(0)
+
+        if first == "[":
+            try:
+                yield from json.load(f)
+            except json.JSONDecodeError:
+                return
+            return
+
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def read_interaction_logs(path):
+    return list(iter_interaction_logs(path))
+
+
+def load_interaction_logs(path=None):
+    """
+    Load recorded interactions. Without a path, entries from a legacy
+    JSON-array log come first, followed by the JSON Lines log.
+    """
+    if path:
+        return read_interaction_logs(path)
+    return read_interaction_logs(LEGACY_LOG_FILE) + read_interaction_logs(LOG_FILE)
+
+
+def interaction_logs_exist():
+    return any(os.path.exists(p) for p in (LOG_FILE, LEGACY_LOG_FILE))
+
+
+def clear_interaction_logs():
+    """Remove both the JSON Lines log and any legacy log. Returns True if something was removed."""
+    removed = False
+    for p in (LOG_FILE, LEGACY_LOG_FILE):
+        if os.path.exists(p):
+            os.remove(p)
+            removed = True
+    return removed
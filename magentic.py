@@ -5,13 +5,16 @@ import asyncio
 import subprocess
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QTextEdit, QPushButton, QLabel, QFrame, QScrollArea, QToolButton, QMessageBox
+    QTextEdit, QPushButton, QLabel, QFrame, QToolButton, QMessageBox
 )
-from PyQt5.QtCore import Qt, QUrl, QTimer, pyqtSignal
-from PyQt5.QtGui import QFont, QPixmap
+from PyQt5.QtCore import Qt, QUrl, pyqtSignal
+from PyQt5.QtGui import QFont
 from PyQt5.QtMultimedia import QSoundEffect
 import os
-from magentic_flow_worker import userQueue, botQueue, magentic_flow_worker  # Import the queues from external worker
+from browser_pool import pool_loop, shared_pool
+from bot_bridge import BotQueueBridge
+from chat_transcript import ChatBubbleDelegate, ChatMessage, ChatTranscriptView
+from magentic_flow_worker import userQueue, botQueue, magentic_flow_worker, new_session_id  # Import the queues from external worker
 
 ###############################################################################
 # Worker Thread Launch
@@ -25,63 +28,33 @@ def start_magentic_flow_worker():
     return worker_thread
 
 ###############################################################################
-# Launch Playwright Chromium in a separate thread using asyncio.run
+# Launch Playwright Chromium on the shared browser pool's event loop
 ###############################################################################
 def spawn_playwright_chromium_in_thread(x, y, width, height):
     """
-    Spawns a new thread that runs an asyncio event loop, launching Chromium
-    positioned at (x, y) with size (width, height).
+    Schedules Chromium positioned at (x, y) with size (width, height) on the
+    browser pool's background event loop.
     """
-    def run_chromium():
-        asyncio.run(launch_chromium_on_right(x, y, width, height))
-    t = threading.Thread(target=run_chromium, daemon=True)
-    t.start()
+    return asyncio.run_coroutine_threadsafe(launch_chromium_on_right(x, y, width, height), pool_loop())
 
 async def launch_chromium_on_right(x, y, width, height):
     """
-    Actually run asynchronous playwright code in the new thread's event loop.
+    Actually run asynchronous playwright code on the pool loop, reusing a warm browser.
     """
-    from playwright.async_api import async_playwright
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=False,
-            args=[
-                f"--window-position={x},{y}",
-                f"--window-size={width},{height}"
-            ]
-        )
-        context = await browser.new_context()
+    pool = shared_pool(
+        headless=False,
+        launch_args=[
+            f"--window-position={x},{y}",
+            f"--window-size={width},{height}"
+        ]
+    )
+    async with pool.context() as context:
         page = await context.new_page()
         await page.goto("https://www.google.com")
         # Keep the browser alive
         while True:
             await asyncio.sleep(0.2)
 
-###############################################################################
-# ChatBubble: single-line, no wrapping
-###############################################################################
-class ChatBubble(QWidget):
-    def __init__(self, avatar_path: str, name: str, message: str, parent=None):
-        super().__init__(parent)
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(10, 5, 10, 5)
-        layout.setSpacing(8)
-
-        avatar_label = QLabel()
-        avatar_label.setFixedSize(40, 40)
-        avatar_label.setScaledContents(True)
-        pix = QPixmap(avatar_path)
-        if not pix.isNull():
-            pix = pix.scaled(40, 40, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        avatar_label.setPixmap(pix)
-        layout.addWidget(avatar_label)
-
-        msg_layout = QVBoxLayout()
-        text_label = QLabel(message)
-        text_label.setWordWrap(False)
-        msg_layout.addWidget(text_label, alignment=Qt.AlignLeft)
-        layout.addLayout(msg_layout)
-
 ###############################################################################
 # Multi-line Text Input with Enter-to-send (via signal)
 ###############################################################################
@@ -108,6 +81,7 @@ class BotWindow(QMainWindow):
         self.setWindowTitle("Side-by-Side Chat + Chromium via External Worker")
         # Create external worker for queues
         self.worker_thread = start_magentic_flow_worker()
+        self.active_sessions = set()  # Session ids whose replies belong in the current chat
 
         # Avatars
         self.user_avatar = "user_avatar.png"
@@ -128,16 +102,9 @@ class BotWindow(QMainWindow):
         heading_layout.addWidget(heading_label)
         layout.addWidget(heading_frame, 0)
 
-        # Scroll area
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        layout.addWidget(self.scroll_area, 1)
-
-        self.chat_container = QWidget()
-        self.chat_layout = QVBoxLayout(self.chat_container)
-        self.chat_layout.setAlignment(Qt.AlignTop)
-        self.chat_container.setLayout(self.chat_layout)
-        self.scroll_area.setWidget(self.chat_container)
+        # Chat transcript (virtualized: bubbles are painted, not widgets)
+        self.chat_view = ChatTranscriptView(ChatBubbleDelegate(avatar_size=40, margins=(10, 5), spacing=8))
+        layout.addWidget(self.chat_view, 1)
 
         # Welcome bubble
         self.show_welcome_bubble()
@@ -175,10 +142,9 @@ class BotWindow(QMainWindow):
         else:
             self.sound_effect = None
 
-        # QTimer to poll botQueue
-        self.poll_timer = QTimer(self)
-        self.poll_timer.timeout.connect(self.poll_bot_queue)
-        self.poll_timer.start(200)
+        # botQueue output is pushed to the GUI thread, one update per frame
+        self.bot_bridge = BotQueueBridge(botQueue, parent=self)
+        self.bot_bridge.messagesReady.connect(self.show_bot_messages)
 
         self.setStyleSheet("""
             * {
@@ -209,11 +175,12 @@ class BotWindow(QMainWindow):
             }
         """)
 
-    def show_welcome_bubble(self):
+    def welcome_message(self):
         welcome_text = "👋 Hello, I'm the left-side Chatbot. The external worker logic handles the 2 queues."
-        bubble = ChatBubble(self.bot_avatar, "Bot", welcome_text)
-        bubble.setMaximumWidth(int(self.width() * 0.9))
-        self.chat_layout.addWidget(bubble)
+        return ChatMessage(self.bot_avatar, "Bot", welcome_text, True)
+
+    def show_welcome_bubble(self):
+        self.chat_view.add_messages([self.welcome_message()])
 
     def show_help_dialog(self):
         QMessageBox.information(self, "Help",
@@ -225,37 +192,33 @@ class BotWindow(QMainWindow):
         user_text = self.input_field.toPlainText().strip()
         if not user_text:
             return
-        bubble = ChatBubble(self.user_avatar, "You", user_text)
-        bubble.setMaximumWidth(int(self.width() * 0.9))
-        self.chat_layout.addWidget(bubble)
+        self.chat_view.add_message(self.user_avatar, "You", user_text)
         self.input_field.clear()
 
-        # Send to external worker's userQueue
-        userQueue.put(("You", user_text))
+        # Send to external worker's userQueue; replies come back tagged with this session id
+        session_id = new_session_id()
+        self.active_sessions.add(session_id)
+        userQueue.put(("You", user_text, session_id))
 
-        self.scroll_area.verticalScrollBar().setValue(
-            self.scroll_area.verticalScrollBar().maximum()
-        )
+        self.chat_view.scrollToBottom()
 
-    def poll_bot_queue(self):
-        while not botQueue.empty():
-            msg = botQueue.get_nowait()
-            bubble = ChatBubble(self.bot_avatar, "Bot", msg)
-            bubble.setMaximumWidth(int(self.width() * 0.9))
-            self.chat_layout.addWidget(bubble)
-            if self.sound_effect:
-                self.sound_effect.play()
-            self.scroll_area.verticalScrollBar().setValue(
-                self.scroll_area.verticalScrollBar().maximum()
-            )
+    def show_bot_messages(self, replies):
+        # Replies from flows started before the last "New Task" are dropped
+        messages = [
+            ChatMessage(self.bot_avatar, "Bot", reply.text, True)
+            for reply in replies if reply.session_id in self.active_sessions
+        ]
+        if not messages:
+            return
+        self.chat_view.add_messages(messages)
+        if self.sound_effect:
+            self.sound_effect.play()
+        self.chat_view.scrollToBottom()
 
     def reset_chat(self):
-        while self.chat_layout.count():
-            item = self.chat_layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
-        self.show_welcome_bubble()
+        # Model reset: constant time regardless of transcript length
+        self.active_sessions = set()
+        self.chat_view.reset_messages([self.welcome_message()])
 
     def showEvent(self, event):
         super().showEvent(event)
@@ -1,53 +1,136 @@
 """
 magentic_flow_worker.py
 Stand-alone module that manages userQueue -> multi-step flow -> botQueue
+
+Flows run concurrently on an asyncio loop inside the worker thread, up to
+MAX_CONCURRENT_FLOWS at a time. Every flow has a session id and its replies
+are put on botQueue as BotReply(session_id, text) so the GUI can route them;
+a flow that raises ends with a "Flow failed" reply for its session.
 """
 
-import time
+import argparse
+import asyncio
+import functools
+import itertools
 import random
 import queue
 import threading
+import time
+from collections import namedtuple
 
 # Global queues (or you could pass them in):
 userQueue = queue.Queue()
 botQueue = queue.Queue()
 
-def magentic_flow_worker():
+BotReply = namedtuple("BotReply", ["session_id", "text"])
+
+MAX_CONCURRENT_FLOWS = 8
+STEP_DELAY = 1.0  # seconds per simulated step
+
+_session_counter = itertools.count(1)
+
+
+def new_session_id():
+    return f"session-{next(_session_counter)}"
+
+
+async def run_flow(session_id, message, step_delay=STEP_DELAY):
+    """Simulates one multi-step flow, enqueueing each step to botQueue."""
+    steps = [
+        f"Parsing your request: '{message}'",
+        "Validating payment details...",
+        "Repairing transaction records...",
+        "Verifying final statuses...",
+        "Payment repair completed successfully!"
+    ]
+    emoji_list = ["🤖", "💡", "🔧", "✅", "✨", "📁", "🕑"]
+
+    for step in steps:
+        await asyncio.sleep(step_delay)
+        botQueue.put(BotReply(session_id, f"{random.choice(emoji_list)} {step}"))
+
+
+async def run_flows(max_concurrent=MAX_CONCURRENT_FLOWS, step_delay=STEP_DELAY):
     """
-    Continuously processes userQueue.
-    For each (username, message), simulates multi-step replies,
-    enqueues each step to botQueue.
+    Reads (username, message[, session_id]) items from userQueue and runs a
+    flow for each, at most `max_concurrent` at once. A None message stops
+    intake; flows already running are allowed to finish.
     """
+    loop = asyncio.get_running_loop()
+    inbox = asyncio.Queue()
+
+    # userQueue is a blocking queue.Queue; a daemon thread forwards it to the loop
+    def forward_user_queue():
+        while True:
+            item = userQueue.get()
+            loop.call_soon_threadsafe(inbox.put_nowait, item)
+            if item[1] is None:
+                break
+    threading.Thread(target=forward_user_queue, daemon=True).start()
+
+    slots = asyncio.Semaphore(max_concurrent)
+    running = set()
+
+    def on_flow_done(session_id, task):
+        running.discard(task)
+        slots.release()
+        if not task.cancelled() and task.exception():
+            botQueue.put(BotReply(session_id, f"⚠️ Flow failed: {task.exception()}"))
+
     while True:
-        username, message = userQueue.get()  # block until a user msg is available
+        item = await inbox.get()
+        message = item[1]
         if message is None:
             break  # sentinel to stop
+        session_id = item[2] if len(item) > 2 else new_session_id()
+
+        await slots.acquire()
+        task = asyncio.create_task(run_flow(session_id, message, step_delay))
+        running.add(task)
+        task.add_done_callback(functools.partial(on_flow_done, session_id))
+
+    if running:
+        await asyncio.gather(*running, return_exceptions=True)
+
 
-        steps = [
-            f"Parsing your request: '{message}'",
-            "Validating payment details...",
-            "Repairing transaction records...",
-            "Verifying final statuses...",
-            "Payment repair completed successfully!"
-        ]
-        emoji_list = ["🤖", "💡", "🔧", "✅", "✨", "📁", "🕑"]
+def magentic_flow_worker(max_concurrent=MAX_CONCURRENT_FLOWS, step_delay=STEP_DELAY):
+    """
+    Continuously processes userQueue until a None message is received.
+    Meant to be the target of a background thread.
+    """
+    asyncio.run(run_flows(max_concurrent, step_delay))
 
-        for step in steps:
-            time.sleep(1)  # 1s delay per step
-            reply = f"{random.choice(emoji_list)} {step}"
-            botQueue.put(reply)
 
 # If you want to run this standalone for debugging:
 if __name__ == "__main__":
-    worker_thread = threading.Thread(target=magentic_flow_worker, daemon=True)
+    parser = argparse.ArgumentParser(description="Run the flow worker standalone.")
+    parser.add_argument("--sessions", type=int, default=1,
+                        help="Number of concurrent sessions to submit")
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT_FLOWS)
+    parser.add_argument("--step-delay", type=float, default=STEP_DELAY)
+    args = parser.parse_args()
+
+    worker_thread = threading.Thread(
+        target=magentic_flow_worker, args=(args.max_concurrent, args.step_delay), daemon=True
+    )
     worker_thread.start()
 
-    # Example usage: push a message
-    userQueue.put(("You", "Hello from external worker"))
-    
+    # Example usage: push messages, then the sentinel
+    start = time.perf_counter()
+    for i in range(args.sessions):
+        userQueue.put(("You", f"Hello from external worker #{i + 1}"))
+    userQueue.put(("You", None))
+
     # Print out bot replies
-    while True:
-        if not botQueue.empty():
-            msg = botQueue.get()
-            print("Bot:", msg)
-        time.sleep(0.2)
+    finished = {}
+    while len(finished) < args.sessions:
+        reply = botQueue.get()
+        print(f"Bot [{reply.session_id}]:", reply.text)
+        if "completed" in reply.text:
+            finished[reply.session_id] = time.perf_counter() - start
+    worker_thread.join()
+
+    elapsed = time.perf_counter() - start
+    single_flow = 5 * args.step_delay
+    print(f"{args.sessions} sessions finished in {elapsed:.2f}s "
+          f"(one flow takes {single_flow:.2f}s, limit {args.max_concurrent} at once)")
@@ -0,0 +1,117 @@
+"""
+network_archive.py
+Records a capture session's network traffic to a HAR archive next to its
+interaction log, and serves replays from that archive instead of the live site.
+
+    async with pool.context(**recording_options(archive_path(log_path))) as context:
+        ...  # the archive is written when the context closes
+
+    async with pool.context(**replay_context_options("strict")) as context:
+        await serve_from_archive(context, archive_path(log_path), "strict")
+
+Network modes for replay:
+- "live": ignore any archive and fetch from the site.
+- "strict": answer every request from the archive; requests it does not
+  contain are aborted, so a replay can never touch the network (CI).
+- "fallthrough": answer from the archive when it has the request and let
+  misses go to the network.
+"""
+
+import json
+import os
+
+from interaction_log import LOG_FILE
+
+NETWORK_MODES = ("live", "strict", "fallthrough")
+
+# Playwright's route_from_har not_found option for each mode
+_NOT_FOUND = {"strict": "abort", "fallthrough": "fallback"}
+
+
+def archive_path(log_path=LOG_FILE):
+    """Archive that belongs to an interaction log: same name, .har extension."""
+    return os.path.splitext(log_path)[0] + ".har"
+
+
+def network_archive_exists(path=None):
+    path = path or archive_path()
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+
+def clear_network_archive(path=None):
+    path = path or archive_path()
+    if os.path.exists(path):
+        os.remove(path)
+        return True
+    return False
+
+
+def recording_options(path, content="embed", url_filter=None):
+    """
+    new_context() keyword arguments that record the context's traffic to `path`.
+    "minimal" mode keeps only what route_from_har needs to answer requests, and
+    "embed" stores response bodies inside the HAR so it is a single file.
+    Service workers are blocked so their fetches are recorded like any other.
+    """
+    options = {
+        "record_har_path": path,
+        "record_har_mode": "minimal",
+        "record_har_content": content,
+        "service_workers": "block",
+    }
+    if url_filter:
+        options["record_har_url_filter"] = url_filter
+    return options
+
+
+def replay_context_options(mode):
+    """new_context() keyword arguments for a replay in `mode`."""
+    if mode not in NETWORK_MODES:
+        raise ValueError(f"Unknown network mode: {mode}")
+    # Requests a service worker answers from its own cache would bypass routing
+    return {} if mode == "live" else {"service_workers": "block"}
+
+
+async def serve_from_archive(context, path, mode="fallthrough", url=None):
+    """
+    Route `context`'s requests to the archive at `path`. Returns True when the
+    archive is in use; False in "live" mode or when a "fallthrough" replay has
+    no archive. A "strict" replay without an archive raises FileNotFoundError.
+    """
+    if mode not in NETWORK_MODES:
+        raise ValueError(f"Unknown network mode: {mode}")
+    if mode == "live":
+        return False
+    if not network_archive_exists(path):
+        if mode == "strict":
+            raise FileNotFoundError(f"No network archive at {path}")
+        return False
+    await context.route_from_har(path, not_found=_NOT_FOUND[mode], url=url)
+    return True
+
+
+def _archive_entries(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("log", {}).get("entries", [])
+
+
+def response_sizes(path):
+    """URL -> response body size (bytes) for every request in an archive."""
+    sizes = {}
+    for entry in _archive_entries(path):
+        size = entry.get("response", {}).get("content", {}).get("size")
+        url = entry.get("request", {}).get("url")
+        if url and size and size > 0:
+            sizes[url] = size
+    return sizes
+
+
+def archive_summary(path):
+    """Number of recorded requests and total response body bytes in an archive."""
+    entries = _archive_entries(path)
+    body_bytes = 0
+    for entry in entries:
+        size = entry.get("response", {}).get("content", {}).get("size")
+        if size and size > 0:
+            body_bytes += size
+    return {"requests": len(entries), "bytes": body_bytes}
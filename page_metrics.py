@@ -0,0 +1,115 @@
+"""
+page_metrics.py
+Optional page performance metrics for captured and replayed steps, and the
+per-step regression report between a recording and a replay.
+
+    await install_page_metrics(page)
+    entry["perf"] = await navigation_metrics(page)       # after a navigation
+    results = await replay_log(page, steps, collect_perf=True)
+    print(format_regressions(find_regressions(steps, results)))
+
+A step's "perf" dict (see capture_script.PAGE_METRICS_SCRIPT) holds what the
+page did since the previous step: "requests", "long_tasks", "long_task_ms"
+and "cls". Steps that loaded a document also carry "ttfb_ms",
+"dom_content_loaded_ms", "load_ms", "transfer_kb" and "lcp_ms".
+"""
+
+from capture_script import PAGE_METRICS_SCRIPT
+
+# How long to wait for the load event before reading a navigation's timings (ms)
+NAVIGATION_METRICS_TIMEOUT = 5000
+
+# Metrics that count what happened during a step; merged steps add them up
+ADDITIVE_METRICS = ("requests", "long_tasks", "long_task_ms", "cls")
+
+# metric -> (relative increase, absolute increase); a replay regresses on a
+# metric only when it exceeds the recording by both
+REGRESSION_THRESHOLDS = {
+    "ttfb_ms": (0.5, 100),
+    "dom_content_loaded_ms": (0.25, 200),
+    "load_ms": (0.25, 250),
+    "lcp_ms": (0.25, 250),
+    "cls": (0.5, 0.05),
+    "long_tasks": (1.0, 2),
+    "long_task_ms": (0.5, 100),
+    "requests": (0.5, 5),
+}
+
+
+async def install_page_metrics(target):
+    """Start the performance observers on a page or context, including the current document of a page."""
+    await target.add_init_script(PAGE_METRICS_SCRIPT)
+    if hasattr(target, "evaluate"):
+        try:
+            await target.evaluate(PAGE_METRICS_SCRIPT)
+        except Exception:
+            pass  # The page is between documents; the init script covers the next one
+
+
+async def collect_page_metrics(page):
+    """The page's metrics since the previous snapshot, or None when the observers are not installed."""
+    try:
+        return await page.evaluate("window.__perfSnapshot ? window.__perfSnapshot() : null")
+    except Exception:
+        return None  # Navigated away while evaluating
+
+
+async def navigation_metrics(page, timeout=NAVIGATION_METRICS_TIMEOUT):
+    """Metrics of a navigation, read once the new document has fired its load event."""
+    try:
+        await page.wait_for_load_state("load", timeout=timeout)
+    except Exception:
+        pass
+    return await collect_page_metrics(page)
+
+
+def merge_metrics(earlier, later):
+    """Metrics of two steps folded into one: counts are added, page timings of the later step win."""
+    if not earlier:
+        return later
+    if not later:
+        return earlier
+    merged = {**earlier, **later}
+    for metric in ADDITIVE_METRICS:
+        if metric in earlier and metric in later:
+            merged[metric] = round(earlier[metric] + later[metric], 4)
+    return merged
+
+
+def find_regressions(steps, results, thresholds=None):
+    """
+    Compare each replayed step's metrics (StepResult.perf) with the "perf"
+    recorded on the same step. Returns one dict per regressed metric.
+    """
+    thresholds = thresholds or REGRESSION_THRESHOLDS
+    regressions = []
+    for result in results:
+        current = result.perf
+        baseline = steps[result.index].get("perf") if result.index < len(steps) else None
+        if not current or not baseline:
+            continue
+        for metric, (relative, absolute) in thresholds.items():
+            before, after = baseline.get(metric), current.get(metric)
+            if before is None or after is None:
+                continue
+            if after - before > absolute and after > before * (1 + relative):
+                regressions.append({
+                    "index": result.index,
+                    "action": result.action,
+                    "target": result.target,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                })
+    return regressions
+
+
+def format_regressions(regressions):
+    if not regressions:
+        return "No performance regressions against the recording"
+    lines = [f"{len(regressions)} performance regressions against the recording:"]
+    for r in regressions:
+        change = f" (+{(r['current'] / r['baseline'] - 1) * 100:.0f}%)" if r["baseline"] else ""
+        lines.append(f"  step {r['index']} {r['action']} {r['target'] or ''}: "
+                     f"{r['metric']} {r['baseline']} -> {r['current']}{change}")
+    return "\n".join(lines)
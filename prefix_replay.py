@@ -0,0 +1,220 @@
+"""
+prefix_replay.py
+Replays a family of recordings that start with the same steps (the same
+login, the same navigation) by running each shared prefix once and forking
+the rest from a snapshot.
+
+    traces = [Trace("session 3", steps, archive, 3), ...]
+    print(describe_plan(plan_prefix_tree(traces)))
+    reports, summary = await replay_shared_prefixes(pool, traces, wait_mode="fast")
+
+The traces are arranged in a prefix tree of their steps. Each PlanNode
+replays its steps once in a new context and, when it has children, snapshots
+the context's storage_state and URL; every child forks a new context from
+that snapshot and carries on.
+
+Only cookies and localStorage cross a fork and the page is reloaded at the
+snapshot URL, so a prefix is only cut right after a navigation, or after a
+click or Enter that navigated. Anything typed into a form that was not
+submitted would otherwise be lost. Shared runs shorter than
+MIN_SHARED_STEPS are replayed once per branch, because a fork would cost
+about as much as it saves.
+"""
+
+import asyncio
+import time
+from collections import namedtuple
+
+from network_archive import network_archive_exists, replay_context_options, response_sizes, serve_from_archive
+from replay_checkpoint import Checkpoint, checkpoint_context_options
+from replay_engine import initial_url, normalize_action, replay_log
+from replay_tracing import Tracer
+from resource_profiles import ResourceFilter
+
+MIN_SHARED_STEPS = 2
+
+# A recording to replay: its label, normalized steps, HAR archive and source (path or session id)
+Trace = namedtuple("Trace", ["label", "steps", "archive", "source"])
+
+
+class PlanNode:
+    """Replays steps[start:end] of its traces once; `children` fork from the state it leaves."""
+
+    def __init__(self, start, end, traces, children=()):
+        self.start = start
+        self.end = end
+        self.traces = traces  # every trace whose path goes through this node
+        self.children = list(children)
+
+    @property
+    def steps(self):
+        return self.traces[0].steps[self.start:self.end]
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+def step_key(step):
+    """What makes two recorded steps the same step for replay."""
+    action = normalize_action(step.get("action"))
+    return (action, step.get("target"), step.get("url") if action == "navigate" else None,
+            step.get("value") or None)
+
+
+def fork_safe(step):
+    """A fork may follow this step: it loaded a page, so the page state is cookies, storage and the URL."""
+    return normalize_action(step.get("action")) == "navigate" or bool(step.get("navigates_to"))
+
+
+def _common_end(traces, depth):
+    """Index where the traces' steps stop being the same, starting from `depth`."""
+    end = depth
+    shortest = min(len(t.steps) for t in traces)
+    first = traces[0].steps
+    while end < shortest and all(step_key(t.steps[end]) == step_key(first[end]) for t in traces[1:]):
+        end += 1
+    return end
+
+
+def _fork_point(steps, depth, end, min_shared):
+    """The last fork-safe cut in (depth, end], if the run before it is long enough to be worth sharing."""
+    for cut in range(end, depth, -1):
+        if fork_safe(steps[cut - 1]):
+            return cut if cut - depth >= min_shared else None
+    return None
+
+
+def _plan(traces, depth, min_shared):
+    """PlanNodes that replay `traces` from `depth`, all starting from the same state."""
+    end = _common_end(traces, depth)
+    if all(len(t.steps) == end for t in traces):
+        # One trace, or traces that are identical from here on: a single run serves them all
+        return [PlanNode(depth, end, traces)]
+
+    cut = _fork_point(traces[0].steps, depth, end, min_shared) if len(traces) > 1 else None
+    if cut is not None:
+        return [PlanNode(depth, cut, traces, _plan(traces, cut, min_shared))]
+
+    # No fork worth taking before the traces diverge: split them at the divergence and let
+    # each group replay the short shared part itself (and find its own fork point further on)
+    groups = {}
+    for trace in traces:
+        key = step_key(trace.steps[end]) if end < len(trace.steps) else None
+        groups.setdefault(key, []).append(trace)
+    nodes = []
+    for group in groups.values():
+        nodes.extend(_plan(group, depth, min_shared))
+    return nodes
+
+
+def plan_prefix_tree(traces, min_shared=MIN_SHARED_STEPS):
+    """Root PlanNodes for `traces`; each root starts from a fresh context."""
+    traces = [t for t in traces if t.steps]
+    return _plan(traces, 0, min_shared) if traces else []
+
+
+def describe_plan(roots):
+    lines = []
+
+    def add(node, indent):
+        labels = ", ".join(t.label for t in node.traces)
+        lines.append(f"{'  ' * indent}steps {node.start}-{node.end - 1}  [{labels}]" if node.end > node.start
+                     else f"{'  ' * indent}(no steps)  [{labels}]")
+        for child in node.children:
+            add(child, indent + 1)
+
+    for root in roots:
+        add(root, 0)
+    return "\n".join(lines)
+
+
+def plan_savings(roots):
+    """Steps replayed with and without prefix sharing."""
+    total = sum(len(t.steps) for root in roots for t in root.traces)
+    executed = sum(node.end - node.start for root in roots for node in root.walk())
+    return {"total_steps": total, "executed_steps": executed, "steps_saved": total - executed}
+
+
+async def replay_shared_prefixes(pool, traces, timeout=5000, wait_mode="fast", delay=None, speed=1.0,
+                                 selector_cache=None, network="fallthrough", profile="full",
+                                 min_shared=MIN_SHARED_STEPS, collect_perf=False):
+    """
+    Replay `traces` along their prefix tree. Returns ({label: results}, summary)
+    where results are the StepResults on each trace's path and summary holds
+    the plan's step counts, the measured time spent in shared prefixes and at
+    forks, the estimated wall-clock time saved, resource filter totals and
+    the nodes' tracers.
+    """
+    roots = plan_prefix_tree(traces, min_shared)
+    if selector_cache is None:
+        selector_cache = {}
+    results = {t.label: [] for root in roots for t in root.traces}
+    errors = {}
+    durations = {label: 0.0 for label in results}
+    summary = {**plan_savings(roots), "forks": 0, "shared_time": 0.0, "fork_overhead": 0.0,
+               "requests_blocked": 0, "bytes_saved": 0, "tracers": []}
+
+    async def run(node, snapshot):
+        if node.start == node.end and not node.children:
+            return  # These traces end where their parent node ended
+        labels = ", ".join(t.label for t in node.traces)
+        tracer = Tracer(f"steps {node.start}-{node.end - 1} [{labels}]")
+        summary["tracers"].append(tracer)
+        start = time.perf_counter()
+        child_snapshot = None
+        try:
+            archive = node.traces[0].archive
+            options = {**replay_context_options(network), **checkpoint_context_options(snapshot)}
+            async with pool.context(**options) as context:
+                await serve_from_archive(context, archive, network)
+                known_sizes = response_sizes(archive) if network_archive_exists(archive) else None
+                resource_filter = ResourceFilter(profile, initial_url(node.traces[0].steps), known_sizes)
+                await resource_filter.install(context)
+                page = await context.new_page()
+                replay_start = time.perf_counter()
+                node_results = await replay_log(
+                    page, node.traces[0].steps[:node.end], timeout=timeout, wait_mode=wait_mode, delay=delay,
+                    speed=speed, selector_cache=selector_cache, tracer=tracer, collect_perf=collect_perf,
+                    start=node.start, resume_url=snapshot.url if snapshot else None,
+                )
+                replay_time = time.perf_counter() - replay_start
+                if node.children:
+                    with tracer.span("snapshot", "wait"):
+                        child_snapshot = Checkpoint(node.end, page.url, await context.storage_state(),
+                                                    None, None, None)
+                blocked = resource_filter.summary()
+                summary["requests_blocked"] += blocked["requests_blocked"]
+                summary["bytes_saved"] += blocked["bytes_saved"]
+        except Exception as e:
+            for trace in node.traces:
+                errors.setdefault(trace.label, str(e))
+            return
+        finally:
+            elapsed = time.perf_counter() - start
+            for trace in node.traces:
+                durations[trace.label] += elapsed
+
+        for trace in node.traces:
+            results[trace.label].extend(node_results)
+        # Reopening the snapshot URL and taking the snapshot are the price of a fork
+        resume_time = sum(s.end - s.start for s in tracer.spans if snapshot and s.name.startswith("initial"))
+        summary["fork_overhead"] += resume_time + sum(s.end - s.start for s in tracer.spans if s.name == "snapshot")
+        if len(node.traces) > 1:
+            # Time the other traces would have spent replaying these steps (and their pauses) themselves
+            summary["shared_time"] += (replay_time - resume_time) * (len(node.traces) - 1)
+        if node.children:
+            summary["forks"] += sum(1 for child in node.children if child.end > child.start or child.children)
+            await asyncio.gather(*(run(child, child_snapshot) for child in node.children))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(root, None) for root in roots))
+    summary["wall_time"] = round(time.perf_counter() - start, 3)
+    summary["estimated_time_saved"] = round(summary["shared_time"] - summary["fork_overhead"], 3)
+    summary["shared_time"] = round(summary["shared_time"], 3)
+    summary["fork_overhead"] = round(summary["fork_overhead"], 3)
+    summary["plan"] = describe_plan(roots)
+    reports = {label: {"results": results[label], "error": errors.get(label),
+                       "duration": round(durations[label], 3)} for label in results}
+    return reports, summary
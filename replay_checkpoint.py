@@ -0,0 +1,171 @@
+"""
+replay_checkpoint.py
+Checkpoints of a running replay, so a long replay can be resumed instead of
+starting again from the first step.
+
+    store = CheckpointStore(checkpoint_name(12))
+    results = await replay_log(page, steps, checkpointer=Checkpointer(store, steps))
+
+    checkpoint = store.resume_point(steps)            # last good checkpoint
+    checkpoint = store.resume_point(steps, step=120)  # latest one at or before step 120
+    async with pool.context(**checkpoint_context_options(checkpoint)) as context:
+        page = await context.new_page()
+        await replay_log(page, steps, start=checkpoint.step, resume_url=checkpoint.url, ...)
+
+A checkpoint is written every CHECKPOINT_INTERVAL successful steps and holds
+the context's storage_state (cookies and localStorage), the page URL and the
+index of the next step. sessionStorage and in-memory page state are not
+kept, so a resumed replay reloads the URL. Each checkpoint also stores a
+digest of the steps before it, and a checkpoint whose digest no longer
+matches the log is never used.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from collections import namedtuple
+from datetime import datetime
+
+CHECKPOINT_DIR = "checkpoints"
+CHECKPOINT_INTERVAL = 10  # successful steps between checkpoints
+
+Checkpoint = namedtuple("Checkpoint", ["step", "url", "storage_state", "digest", "created_at", "path"])
+
+
+def checkpoint_name(source):
+    """
+    Checkpoint directory name for a session id or a log file path. Paths are
+    told apart by a hash of the real path, so a/log.jsonl and b/log.jsonl
+    never share checkpoints.
+    """
+    if isinstance(source, int):
+        return f"session_{source}"
+    stem = os.path.splitext(os.path.basename(source))[0]
+    path_hash = hashlib.sha1(os.path.realpath(source).encode("utf-8")).hexdigest()[:8]
+    return f"{stem}_{path_hash}"
+
+
+def checkpoint_names(sources):
+    """checkpoint_name() of each source; a source listed again gets its own "_2", "_3"... store."""
+    seen = {}
+    names = []
+    for source in sources:
+        name = checkpoint_name(source)
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}_{seen[name]}")
+    return names
+
+
+def steps_digest(steps, count):
+    """Digest of the first `count` steps; a checkpoint is only valid for the same steps."""
+    fields = [[step.get(key) for key in ("action", "target", "url", "value")] for step in steps[:count]]
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def checkpoint_context_options(checkpoint):
+    """new_context() keyword arguments that restore a checkpoint's cookies and localStorage."""
+    return {"storage_state": checkpoint.storage_state} if checkpoint else {}
+
+
+def clear_checkpoints(directory=CHECKPOINT_DIR):
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+        return True
+    return False
+
+
+class CheckpointStore:
+    """The checkpoints of one log or session, one JSON file per checkpoint."""
+
+    def __init__(self, name, directory=CHECKPOINT_DIR):
+        self.directory = os.path.join(directory, name)
+
+    def _path(self, step):
+        return os.path.join(self.directory, f"step-{step:06d}.json")
+
+    def save(self, step, url, storage_state, digest):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(step)
+        data = {
+            "step": step,
+            "url": url,
+            "storage_state": storage_state,
+            "digest": digest,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+        }
+        # Written under a temporary name so a crash never leaves a truncated checkpoint
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+        return path
+
+    def load(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return Checkpoint(data["step"], data["url"], data["storage_state"], data["digest"],
+                          data.get("created_at"), path)
+
+    def steps(self):
+        """Step indices that have a checkpoint, in order."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(name[5:-5]) for name in os.listdir(self.directory)
+                      if name.startswith("step-") and name.endswith(".json"))
+
+    def resume_point(self, steps, step=None):
+        """
+        The latest checkpoint at or before `step` (any step when None) that
+        was taken on these `steps`, or None.
+        """
+        for index in reversed(self.steps()):
+            if (step is not None and index > step) or index > len(steps):
+                continue
+            try:
+                checkpoint = self.load(self._path(index))
+            except (OSError, ValueError, KeyError):
+                continue
+            if checkpoint.digest == steps_digest(steps, index):
+                return checkpoint
+        return None
+
+    def discard_after(self, step):
+        """Drop checkpoints past `step`; they belong to a run that is being replaced."""
+        for index in self.steps():
+            if index > step:
+                os.remove(self._path(index))
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+
+
+class Checkpointer:
+    """
+    Used by replay_log(): saves a checkpoint after every `every` successful
+    steps. Once a step fails the rest of the run is not checkpointed, so the
+    last checkpoint is always the last good state.
+    """
+
+    def __init__(self, store, steps, every=CHECKPOINT_INTERVAL):
+        self.store = store
+        self.steps = steps
+        self.every = max(1, every)
+        self.failed = False
+        self.saved = []
+
+    def begin(self, start):
+        self.store.discard_after(start)
+        self.failed = False
+
+    async def step_done(self, page, result):
+        if not result.ok:
+            self.failed = True
+            return None
+        next_step = result.index + 1
+        if self.failed or next_step % self.every or next_step >= len(self.steps):
+            return None
+        storage_state = await page.context.storage_state()
+        path = self.store.save(next_step, page.url, storage_state, steps_digest(self.steps, next_step))
+        self.saved.append(next_step)
+        return path
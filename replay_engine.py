@@ -0,0 +1,426 @@
+"""
+replay_engine.py
+Replays a recorded interaction log on a Playwright page.
+
+Understands both log vocabularies: home.py's "Click"/"Input"/"KeyPress"/
+"Navigate"/"OpenNewTab" and app.py's "click"/"input"/"press"/"navigate".
+Every step produces a StepResult so callers can report progress or build
+pass/fail reports.
+
+Click, Input and targeted key presses resolve their element through the
+step's ranked "selectors" (id, test attributes, CSS path, role and name,
+text, nth-of-type), falling back to "target". The strategy that worked is
+cached per element, and a step whose selectors never match fails after
+RESOLVE_TIMEOUT instead of waiting out the action timeout.
+
+Each step is timed as a "step" span on a replay_tracing.Tracer, with child
+"wait" spans (selector resolution, load and settle waits, pacing) and
+"action" spans (the Playwright call). StepResult.wait is the waiting part
+of a step's duration. With collect_perf, StepResult.perf holds the page
+metrics of the step (see page_metrics).
+
+Long replays can save checkpoints through a replay_checkpoint.Checkpointer
+and later start at a checkpoint's step instead of step 0.
+
+Three wait modes are available:
+- "fixed": sleep a fixed time after every step (the original behaviour).
+- "fast": no sleeps; each step waits only for what it needs (load state
+  after navigations, actionability before clicks and fills, DOM mutations to
+  settle after Enter).
+- "recorded": the "fast" waits plus the original gaps between steps, taken
+  from their capture timestamps, divided by `speed` and capped at `max_gap`.
+
+In every mode, a click or Enter whose navigation the trace normalizer folded
+into it ("navigates_to") waits for that page. If the page does not start
+navigating within NAVIGATION_START_TIMEOUT, or ends up on a different URL,
+the recorded URL is loaded directly so the next steps run on the right page.
+"""
+
+import asyncio
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+from datetime import datetime
+
+from page_metrics import collect_page_metrics, install_page_metrics
+from replay_tracing import Tracer
+
+StepResult = namedtuple("StepResult",
+                        ["index", "action", "target", "ok", "skipped", "message", "duration", "wait", "perf"],
+                        defaults=[0.0, None])
+
+ACTION_ALIASES = {
+    "click": "click",
+    "input": "input",
+    "keypress": "press",
+    "press": "press",
+    "navigate": "navigate",
+    "opennewtab": "open_new_tab",
+}
+
+WAIT_MODES = ("fixed", "fast", "recorded")
+
+# Speed factor range for "recorded" pacing
+MIN_SPEED = 0.1
+MAX_SPEED = 50.0
+MAX_GAP = 5.0  # seconds; longer idle gaps in a recording are shortened to this
+
+# Pauses after each kind of step in "fixed" mode, as used by home.py's replay
+STEP_DELAYS = {"click": 0.3, "input": 0.3, "press": 1.0, "navigate": 1.0}
+INITIAL_DELAY = 2.0
+
+# How long to keep looking for any candidate selector before failing a step (ms)
+RESOLVE_TIMEOUT = 1500
+RESOLVE_POLL_INTERVAL = 0.1
+
+# Upper bound on the optional "fast" mode waits (network idle, DOM quiescence)
+SETTLE_TIMEOUT = 2000
+
+# How long a click or Enter recorded as navigating gets to start that navigation (ms)
+NAVIGATION_START_TIMEOUT = 1000
+
+# Resolves once no DOM mutation has happened for `quietMs`, or after `timeoutMs`
+DOM_QUIET_SCRIPT = """
+([quietMs, timeoutMs]) => new Promise(resolve => {
+    let quietTimer = null;
+    const done = () => {
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(hardTimer);
+        resolve();
+    };
+    const observer = new MutationObserver(() => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(done, quietMs);
+    });
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    quietTimer = setTimeout(done, quietMs);
+    const hardTimer = setTimeout(done, timeoutMs);
+})
+"""
+
+
+class SkipStep(Exception):
+    """Raised for steps that cannot be replayed and should be skipped, not failed."""
+
+
+class TargetNotFound(Exception):
+    """None of a step's candidate selectors matched an element."""
+
+
+def normalize_action(action):
+    return ACTION_ALIASES.get(str(action or "").lower())
+
+
+def step_time(step):
+    """
+    Capture time of a step in seconds: the monotonic "mono" stamp when the log
+    has one, otherwise the ISO "timestamp". None if neither is usable.
+    """
+    mono = step.get("mono")
+    if mono is not None:
+        return float(mono)
+    timestamp = step.get("timestamp")
+    if timestamp:
+        try:
+            return datetime.fromisoformat(timestamp.rstrip("Z")).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def recorded_offsets(steps, speed=1.0, max_gap=MAX_GAP):
+    """
+    Offsets (seconds from the first step) at which each step should start to
+    reproduce the recorded pacing at `speed`. Gaps are capped at `max_gap`
+    before scaling; missing or backwards timestamps count as no gap.
+    """
+    offsets = []
+    elapsed = 0.0
+    previous = None
+    for step in steps:
+        current = step_time(step)
+        if previous is not None and current is not None:
+            gap = min(max(current - previous, 0.0), max_gap)
+            elapsed += gap / speed
+        if current is not None:
+            previous = current
+        offsets.append(elapsed)
+    return offsets
+
+
+def initial_url(steps):
+    for step in steps:
+        if step.get("url"):
+            return step["url"]
+    return None
+
+
+def candidate_selectors(step):
+    """[(strategy, selector), ...] for a step, best first, ending with its plain target."""
+    candidates = []
+    for entry in step.get("selectors") or []:
+        if isinstance(entry, (list, tuple)) and len(entry) == 2 and entry[1]:
+            candidates.append((entry[0], entry[1]))
+    target = step.get("target")
+    if target and target != "keyboard" and all(target != selector for _, selector in candidates):
+        candidates.append(("target", target))
+    return candidates
+
+
+async def resolve_target(page, step, cache=None, timeout=RESOLVE_TIMEOUT):
+    """
+    Return (locator, strategy) for the first candidate selector that matches.
+    `cache` maps an element's selector list to the index that resolved it
+    last time; that candidate is tried first.
+    """
+    candidates = candidate_selectors(step)
+    if not candidates:
+        raise TargetNotFound("Step has no target selector")
+
+    key = tuple(selector for _, selector in candidates)
+    order = list(range(len(candidates)))
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None and cached < len(candidates):
+        order.remove(cached)
+        order.insert(0, cached)
+
+    invalid = set()
+    deadline = time.perf_counter() + timeout / 1000
+    while True:
+        for i in order:
+            if i in invalid:
+                continue
+            strategy, selector = candidates[i]
+            locator = page.locator(selector)
+            try:
+                count = await locator.count()
+            except Exception as e:
+                if "selector" in str(e).lower():
+                    invalid.add(i)  # unparsable selector, e.g. an id starting with a digit
+                continue
+            if count:
+                if cache is not None:
+                    cache[key] = i
+                return locator.first, strategy
+
+        if len(invalid) == len(candidates) or time.perf_counter() >= deadline:
+            tried = ", ".join(selector for _, selector in candidates)
+            raise TargetNotFound(f"No element matched any of: {tried}")
+        await asyncio.sleep(RESOLVE_POLL_INTERVAL)
+
+
+async def wait_for_settled_load(page):
+    """Best effort: wait for network idle, but never longer than SETTLE_TIMEOUT."""
+    try:
+        await page.wait_for_load_state("networkidle", timeout=SETTLE_TIMEOUT)
+    except Exception:
+        pass
+
+
+async def wait_for_caused_navigation(page, step, timeout, before_url):
+    """
+    After a click or Enter that navigated during capture, wait for the page it
+    reached to load. Returns None when the step has no "navigates_to", True
+    when the replayed trigger navigated there, and False when the page was
+    loaded with goto() because it did not.
+    """
+    url = step.get("navigates_to")
+    if not url:
+        return None
+    try:
+        # Any URL change counts as the navigation starting; pushState changes count too
+        await page.wait_for_url(lambda current: current != before_url, wait_until="commit",
+                                timeout=NAVIGATION_START_TIMEOUT)
+        await page.wait_for_load_state("load", timeout=timeout)
+        if page.url == url:
+            return True
+    except Exception:
+        pass
+    # No navigation, or a different page (redirect, query string); load the recorded one
+    await page.goto(url, wait_until="load", timeout=timeout)
+    return False
+
+
+def _navigation_note(caused, step):
+    return f" (did not reach {step['navigates_to']}, loaded it directly)" if caused is False else ""
+
+
+async def wait_for_dom_quiet(page, quiet_ms=100, timeout_ms=SETTLE_TIMEOUT):
+    """Wait until the DOM stops changing, or for the navigation a key press started."""
+    try:
+        await page.evaluate(DOM_QUIET_SCRIPT, [quiet_ms, timeout_ms])
+    except Exception:
+        # The page navigated away while we were watching it
+        try:
+            await page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+        except Exception:
+            pass
+
+
+def _phase(tracer, name, category, **args):
+    return tracer.span(name, category, **args) if tracer is not None else nullcontext(args)
+
+
+async def replay_step(page, step, timeout=5000, wait_mode="fixed", selector_cache=None, tracer=None):
+    """Perform one step and return a short description of what was done."""
+    action = normalize_action(step.get("action"))
+    target = step.get("target")
+    value = step.get("value") or ""
+    url = step.get("url") or ""
+    fast = wait_mode in ("fast", "recorded")
+
+    if action == "click":
+        with _phase(tracer, "resolve", "wait") as span:
+            locator, span["strategy"] = await resolve_target(page, step, selector_cache)
+        before_url = page.url
+        # locator.click waits for the element to be visible, stable, enabled and unobscured
+        with _phase(tracer, "click", "action"):
+            await locator.click(timeout=timeout)
+        with _phase(tracer, "navigation", "wait"):
+            caused = await wait_for_caused_navigation(page, step, timeout, before_url)
+        return f"click on {target} (via {span['strategy']}){_navigation_note(caused, step)}"
+
+    if action == "input":
+        with _phase(tracer, "resolve", "wait") as span:
+            locator, span["strategy"] = await resolve_target(page, step, selector_cache)
+        with _phase(tracer, "fill", "action"):
+            await locator.fill(value, timeout=timeout)
+        return f"input '{value}' on {target} (via {span['strategy']})"
+
+    if action == "press":
+        key = value or "Enter"
+        before_url = page.url
+        if target and target != "keyboard":
+            with _phase(tracer, "resolve", "wait") as span:
+                locator, span["strategy"] = await resolve_target(page, step, selector_cache)
+            with _phase(tracer, "press", "action", key=key):
+                await locator.press(key, timeout=timeout)
+        else:
+            with _phase(tracer, "press", "action", key=key):
+                await page.keyboard.press(key)
+        caused = None
+        if key == "Enter":
+            with _phase(tracer, "settle", "wait"):
+                caused = await wait_for_caused_navigation(page, step, timeout, before_url)
+                if caused is None and fast:
+                    await wait_for_dom_quiet(page)
+        return f"key press '{key}' on {target or 'keyboard'}{_navigation_note(caused, step)}"
+
+    if action == "navigate":
+        if not url.startswith("http"):
+            raise SkipStep(f"Skipping invalid URL: '{url}'")
+        with _phase(tracer, "goto", "action", url=url):
+            await page.goto(url, wait_until="load")
+        if fast:
+            with _phase(tracer, "settle", "wait"):
+                await wait_for_settled_load(page)
+        return f"navigation to {url}"
+
+    if action == "open_new_tab":
+        if url.startswith("chrome://"):
+            raise SkipStep(f"Skipping internal browser URL: {url}")
+        raise SkipStep(f"OpenNewTab replay not implemented: {url}")
+
+    raise SkipStep(f"Unknown action: {step.get('action')}")
+
+
+async def replay_log(page, steps, timeout=5000, wait_mode="fixed", delay=None,
+                     speed=1.0, max_gap=MAX_GAP, open_initial_url=True, on_step=None,
+                     selector_cache=None, tracer=None, collect_perf=False, start=0, resume_url=None,
+                     checkpointer=None):
+    """
+    Replay `steps` in order and return a list of StepResult.
+
+    In "fixed" mode `delay` is a flat pause after every step; when None,
+    home.py's per-action pauses (STEP_DELAYS) are used. In "recorded" mode
+    steps start at their recorded offsets divided by `speed` (MIN_SPEED to
+    MAX_SPEED). `on_step` is called with each StepResult. Pass the same
+    `selector_cache` dict to several runs to share resolved strategies, and
+    a Tracer to keep the run's timing spans. With `collect_perf`, each step's
+    page metrics are read after its waits; a navigation that has not fired
+    its load event by then is reported with the next step.
+
+    `start` skips the steps before it; the page is first opened at
+    `resume_url` (a checkpoint's URL), and the context is expected to carry
+    the checkpoint's storage state. `checkpointer` saves checkpoints as
+    steps succeed.
+    """
+    if wait_mode not in WAIT_MODES:
+        raise ValueError(f"Unknown wait mode: {wait_mode}")
+    if wait_mode == "recorded" and not MIN_SPEED <= speed <= MAX_SPEED:
+        raise ValueError(f"Replay speed must be between {MIN_SPEED}x and {MAX_SPEED}x")
+    fixed = wait_mode == "fixed"
+    if not 0 <= start <= len(steps):
+        raise ValueError(f"Start step {start} is outside the log (0-{len(steps)})")
+    if selector_cache is None:
+        selector_cache = {}
+    if tracer is None:
+        tracer = Tracer()
+    offsets = recorded_offsets(steps, speed, max_gap) if wait_mode == "recorded" else None
+    results = []
+    if collect_perf:
+        await install_page_metrics(page)
+    if checkpointer is not None:
+        checkpointer.begin(start)
+
+    url = None
+    if start:
+        url = resume_url or initial_url(steps[start:])
+    elif open_initial_url and steps and normalize_action(steps[0].get("action")) != "navigate":
+        url = initial_url(steps)
+    if url and url.startswith("http"):
+        with tracer.span("initial goto", "action", url=url):
+            await page.goto(url, wait_until="load")
+        with tracer.span("initial settle", "wait"):
+            if fixed:
+                await asyncio.sleep(INITIAL_DELAY if delay is None else delay)
+            else:
+                await wait_for_settled_load(page)
+
+    # Recorded offsets are relative to the first step that is actually replayed
+    replay_start = time.perf_counter() - (offsets[start] if offsets and start < len(steps) else 0)
+    for index in range(start, len(steps)):
+        step = steps[index]
+        action = normalize_action(step.get("action"))
+        if offsets:
+            # Sleep until this step's scheduled start; time spent in earlier steps counts toward the gap
+            wait = replay_start + offsets[index] - time.perf_counter()
+            if wait > 0:
+                with tracer.span("pace", "wait", step=index):
+                    await asyncio.sleep(wait)
+        tracer.reset_phases()
+        with tracer.span(f"{index}: {action}", "step", index=index, action=action,
+                         target=step.get("target")) as span:
+            step_start = time.perf_counter()
+            ok, skipped = True, False
+            try:
+                message = await replay_step(page, step, timeout, wait_mode, selector_cache, tracer)
+            except SkipStep as e:
+                skipped, message = True, str(e)
+            except Exception as e:
+                ok, message = False, str(e)
+            duration = time.perf_counter() - step_start
+            waited = tracer.phase_totals.get("wait", 0.0)
+            span.update(outcome="skipped" if skipped else "ok" if ok else "failed",
+                        wait_ms=round(waited * 1000, 3), action_ms=round((duration - waited) * 1000, 3))
+        perf = None
+        if collect_perf and not skipped:
+            with tracer.span("metrics", "wait", step=index):
+                perf = await collect_page_metrics(page)
+        result = StepResult(index, step.get("action"), step.get("target"), ok, skipped, message, duration, waited,
+                            perf)
+        results.append(result)
+        if on_step:
+            on_step(result)
+        if checkpointer is not None:
+            with tracer.span("checkpoint", "wait", step=index):
+                await checkpointer.step_done(page, result)
+
+        if fixed and not result.skipped:
+            pause = STEP_DELAYS.get(action, 0) if delay is None else delay
+            if pause:
+                with tracer.span("pace", "wait", step=index):
+                    await asyncio.sleep(pause)
+
+    return results
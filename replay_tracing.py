@@ -0,0 +1,157 @@
+"""
+replay_tracing.py
+Timing spans for replay steps and capture callbacks, exported as Chrome trace-event JSON.
+
+    tracer = Tracer("replay")
+    with tracer.span("resolve", "wait", target="#submit"):
+        ...
+    write_chrome_trace("replay_trace.json", [tracer])   # open in chrome://tracing or ui.perfetto.dev
+    print(format_histogram(latency_histogram([tracer])))
+
+Categories used by the replay engine:
+- "step": one span per replayed step, with its action, outcome and the
+  time spent waiting versus acting inside it.
+- "wait": selector resolution, load and DOM-settle waits, pacing sleeps.
+- "action": the Playwright call itself (click, fill, press, goto).
+Capture callbacks are recorded under "capture".
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+Span = namedtuple("Span", ["name", "category", "start", "end", "args"])
+
+TRACE_DIR = "traces"
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_tracer_ids = iter(range(1, 1 << 30))
+_tracer_ids_lock = threading.Lock()
+
+
+class Tracer:
+    """
+    Collects spans on the perf_counter clock. `phase_totals` accumulates the
+    seconds per category since the last reset_phases(), which the replay
+    engine uses to split a step's duration into wait and action time.
+    """
+
+    def __init__(self, name="replay"):
+        self.name = name
+        with _tracer_ids_lock:
+            self.tid = next(_tracer_ids)  # one trace-viewer row per tracer
+        self.spans = []
+        self.phase_totals = {}
+
+    @contextmanager
+    def span(self, name, category, **args):
+        start = time.perf_counter()
+        try:
+            yield args  # callers may add outcome details to args before the span closes
+        finally:
+            self.add(name, category, start, time.perf_counter(), args)
+
+    def add(self, name, category, start, end, args=None):
+        self.spans.append(Span(name, category, start, end, args or {}))
+        self.phase_totals[category] = self.phase_totals.get(category, 0.0) + (end - start)
+
+    def reset_phases(self):
+        self.phase_totals = {}
+
+
+def chrome_trace(tracers):
+    """Trace-event JSON object ("X" complete events, µs) for one or more tracers."""
+    tracers = [t for t in tracers if t is not None]
+    starts = [span.start for t in tracers for span in t.spans]
+    origin = min(starts) if starts else 0.0
+    pid = os.getpid()
+    events = []
+    for tracer in tracers:
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tracer.tid,
+                       "args": {"name": tracer.name}})
+        for span in tracer.spans:
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - origin) * 1e6, 3),
+                "dur": round((span.end - span.start) * 1e6, 3),
+                "pid": pid,
+                "tid": tracer.tid,
+                "args": {k: v if isinstance(v, (str, int, float, bool, type(None))) else str(v)
+                         for k, v in span.args.items()},
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def trace_path(name, directory=TRACE_DIR):
+    """Where a run's trace goes, e.g. trace_path("session_3_replay") -> traces/session_3_replay.json."""
+    return os.path.join(directory, f"{name}.json")
+
+
+def write_chrome_trace(path, tracers):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(tracers), f)
+    return path
+
+
+def latency_histogram(tracers, category="step", key="action"):
+    """
+    Per-action latency summary of `category` spans: count, mean/p50/p95/max
+    (ms), and counts per HISTOGRAM_BUCKETS bucket. Step spans also report the
+    mean wait and action time.
+    """
+    groups = {}
+    for tracer in tracers:
+        if tracer is None:
+            continue
+        for span in tracer.spans:
+            if span.category == category:
+                groups.setdefault(str(span.args.get(key) or span.name), []).append(span)
+
+    summary = {}
+    for label, spans in sorted(groups.items()):
+        durations = sorted((s.end - s.start) * 1000 for s in spans)
+        buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        for ms in durations:
+            buckets[bisect.bisect_left(HISTOGRAM_BUCKETS, ms)] += 1
+        entry = {
+            "count": len(durations),
+            "mean_ms": round(sum(durations) / len(durations), 2),
+            "p50_ms": round(durations[len(durations) // 2], 2),
+            "p95_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 2),
+            "max_ms": round(durations[-1], 2),
+            "buckets": dict(zip([f"<={b}ms" for b in HISTOGRAM_BUCKETS] + [f">{HISTOGRAM_BUCKETS[-1]}ms"],
+                                buckets)),
+        }
+        waits = [s.args["wait_ms"] for s in spans if "wait_ms" in s.args]
+        if waits:
+            entry["mean_wait_ms"] = round(sum(waits) / len(waits), 2)
+            entry["mean_action_ms"] = round(entry["mean_ms"] - entry["mean_wait_ms"], 2)
+        summary[label] = entry
+    return summary
+
+
+def format_histogram(summary, width=30):
+    """Plain-text table plus a bar per bucket, for logs and chat panes."""
+    lines = []
+    for label, entry in summary.items():
+        split = ""
+        if "mean_wait_ms" in entry:
+            split = f"  wait {entry['mean_wait_ms']:.0f} / action {entry['mean_action_ms']:.0f} ms"
+        lines.append(f"{label}: n={entry['count']} p50={entry['p50_ms']:.0f}ms p95={entry['p95_ms']:.0f}ms "
+                     f"max={entry['max_ms']:.0f}ms{split}")
+        peak = max(entry["buckets"].values()) or 1
+        for bucket, count in entry["buckets"].items():
+            if count:
+                lines.append(f"  {bucket:>9} {'#' * max(1, round(count / peak * width))} {count}")
+    return "\n".join(lines)
@@ -0,0 +1,177 @@
+"""
+resource_profiles.py
+Named resource-filtering profiles for replay contexts.
+
+Most replays only check DOM interactions, so images, fonts, media and
+third-party analytics can be blocked without changing the outcome:
+
+    resource_filter = ResourceFilter("dom-only", first_party_url=initial_url(steps))
+    await resource_filter.install(context)
+    ...
+    print(resource_filter.summary())
+
+Profiles:
+- "full": nothing blocked (routing is not installed at all).
+- "no-media": images, media and fonts.
+- "dom-only": "no-media" plus text tracks, manifests, beacons and known
+  analytics and advertising domains.
+- "first-party-only": every subresource served from another site.
+
+Blocked requests are aborted before they reach the network. Their size is
+taken from the HAR archive when one was recorded, otherwise estimated from
+typical per-type sizes, so "bytes_saved" is approximate without an archive.
+"""
+
+from collections import Counter, namedtuple
+from urllib.parse import urlsplit
+
+ResourceProfile = namedtuple("ResourceProfile", ["blocked_types", "blocked_domains", "first_party_only"])
+
+MEDIA_TYPES = frozenset({"image", "media", "font"})
+
+TRACKER_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "segment.io",
+    "segment.com",
+    "mixpanel.com",
+    "amplitude.com",
+    "fullstory.com",
+    "newrelic.com",
+    "nr-data.net",
+    "clarity.ms",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "adsrvr.org",
+    "criteo.com",
+)
+
+PROFILES = {
+    "full": ResourceProfile(frozenset(), (), False),
+    "no-media": ResourceProfile(MEDIA_TYPES, (), False),
+    "dom-only": ResourceProfile(MEDIA_TYPES | {"texttrack", "manifest", "ping"}, TRACKER_DOMAINS, False),
+    "first-party-only": ResourceProfile(frozenset(), (), True),
+}
+
+# Rough per-request transfer sizes used when no archive says otherwise (bytes)
+TYPICAL_SIZES = {
+    "image": 25_000,
+    "media": 500_000,
+    "font": 30_000,
+    "script": 20_000,
+    "stylesheet": 10_000,
+    "texttrack": 5_000,
+    "manifest": 1_000,
+}
+DEFAULT_SIZE = 2_000
+
+# Second-level labels under which sites register a third label (example.co.uk)
+_SHARED_SLDS = {"co", "com", "net", "org", "gov", "ac", "edu"}
+
+
+def get_profile(name):
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown resource profile: {name}") from None
+
+
+def site_of(host):
+    """Registrable part of a host name, approximated without a public suffix list."""
+    labels = (host or "").lower().rstrip(".").split(".")
+    if len(labels) >= 3 and labels[-2] in _SHARED_SLDS and len(labels[-1]) == 2:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def host_matches(host, domains):
+    host = (host or "").lower()
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+class ResourceFilter:
+    """
+    Aborts the requests a profile excludes and counts what that saved.
+    `known_sizes` maps URL -> body size, e.g. network_archive.response_sizes().
+    """
+
+    def __init__(self, profile="full", first_party_url=None, known_sizes=None):
+        self.name = profile
+        self.profile = get_profile(profile)
+        self.first_party = site_of(urlsplit(first_party_url).hostname) if first_party_url else None
+        self.known_sizes = known_sizes or {}
+
+        self.requests_blocked = 0
+        self.requests_allowed = 0
+        self.bytes_saved = 0
+        self.bytes_estimated = 0  # part of bytes_saved that came from TYPICAL_SIZES
+        self.blocked_by_type = Counter()
+
+    @property
+    def active(self):
+        profile = self.profile
+        return bool(profile.blocked_types or profile.blocked_domains or profile.first_party_only)
+
+    async def install(self, context):
+        """Route the context's requests through this filter. Call before opening pages."""
+        if self.active:
+            await context.route("**/*", self._handle)
+
+    def should_block(self, request):
+        resource_type = request.resource_type
+        if resource_type == "document" and request.is_navigation_request():
+            if self.first_party is None:
+                self.first_party = site_of(urlsplit(request.url).hostname)
+            return False
+
+        if resource_type in self.profile.blocked_types:
+            return True
+        host = urlsplit(request.url).hostname
+        if host is None:
+            return False  # data: and blob: URLs never reach the network
+        if self.profile.blocked_domains and host_matches(host, self.profile.blocked_domains):
+            return True
+        if self.profile.first_party_only and self.first_party and site_of(host) != self.first_party:
+            return True
+        return False
+
+    async def _handle(self, route):
+        request = route.request
+        if not self.should_block(request):
+            self.requests_allowed += 1
+            await route.fallback()  # later routes (e.g. a HAR archive) still see the request
+            return
+
+        self.requests_blocked += 1
+        self.blocked_by_type[request.resource_type] += 1
+        size = self.known_sizes.get(request.url)
+        if size is None:
+            size = TYPICAL_SIZES.get(request.resource_type, DEFAULT_SIZE)
+            self.bytes_estimated += size
+        self.bytes_saved += size
+        await route.abort("blockedbyclient")
+
+    def summary(self):
+        return {
+            "profile": self.name,
+            "requests_blocked": self.requests_blocked,
+            "requests_allowed": self.requests_allowed,
+            "bytes_saved": self.bytes_saved,
+            "bytes_estimated": self.bytes_estimated,
+            "blocked_by_type": dict(self.blocked_by_type),
+        }
+
+    def describe(self):
+        """One-line report for chat and log panes."""
+        if not self.active:
+            return f"Resource profile '{self.name}': nothing blocked"
+        total = self.requests_blocked + self.requests_allowed
+        approx = "~" if self.bytes_estimated else ""
+        return (f"Resource profile '{self.name}': blocked {self.requests_blocked} of {total} requests, "
+                f"saved {approx}{self.bytes_saved / 1024:.0f} KB")
@@ -0,0 +1,97 @@
+"""
+screenshot_gallery.py
+Virtualized screenshot gallery: a QListView in icon mode over a list model.
+
+The model only stores file paths. Thumbnails are requested from a
+ThumbnailCache when the view asks for a row's decoration, which only happens
+for rows that are being painted, so memory stays flat however many
+screenshots a session produces.
+"""
+
+import os
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, pyqtSignal
+from PyQt5.QtWidgets import QListView
+
+from thumbnail_cache import ThumbnailCache
+
+PathRole = Qt.UserRole + 1
+
+
+class ScreenshotListModel(QAbstractListModel):
+    def __init__(self, thumbnails: ThumbnailCache, parent=None):
+        super().__init__(parent)
+        self.thumbnails = thumbnails
+        self.thumbnails.ready.connect(self._on_thumbnail_ready)
+        self._paths = []
+        self._rows = {}  # path -> rows showing it, for thumbnail updates
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self._paths[index.row()]
+        if role == Qt.DecorationRole:
+            if self.thumbnails.failed(path):
+                return self.thumbnails.error_placeholder()
+            return self.thumbnails.request(path) or self.thumbnails.placeholder()
+        if role == Qt.ToolTipRole:
+            return os.path.basename(path)
+        if role == PathRole:
+            return path
+        return None
+
+    def add_path(self, path: str):
+        # The file may have been written again under a name seen before
+        self.thumbnails.forget(path)
+        row = len(self._paths)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._paths.append(path)
+        self._rows.setdefault(path, []).append(row)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._paths = []
+        self._rows = {}
+        self.endResetModel()
+
+    def _on_thumbnail_ready(self, path: str):
+        for row in self._rows.get(path, ()):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class ScreenshotGallery(QListView):
+    screenshotClicked = pyqtSignal(str)
+
+    def __init__(self, thumbnail_size=QSize(280, 180), spacing=5, parent=None):
+        super().__init__(parent)
+        self.thumbnails = ThumbnailCache(thumbnail_size, parent=self)
+        self.screenshot_model = ScreenshotListModel(self.thumbnails, self)
+        self.setModel(self.screenshot_model)
+
+        self.setViewMode(QListView.IconMode)
+        self.setIconSize(thumbnail_size)
+        self.setGridSize(thumbnail_size + QSize(spacing * 2, spacing * 2))
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(200)
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setWrapping(True)
+        self.setSelectionMode(QListView.SingleSelection)
+        self.setVerticalScrollMode(QListView.ScrollPerPixel)
+
+        self.clicked.connect(self._on_clicked)
+
+    def add_screenshot(self, path: str):
+        self.screenshot_model.add_path(path)
+
+    def clear(self):
+        self.screenshot_model.clear()
+
+    def _on_clicked(self, index):
+        self.screenshotClicked.emit(index.data(PathRole))
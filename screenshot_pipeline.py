@@ -0,0 +1,190 @@
+"""
+screenshot_pipeline.py
+Takes screenshots without blocking the capture event loop.
+
+PNG and JPEG frames are encoded by Chromium inside page.screenshot(): the
+browser process does that work while the capture coroutine awaits it, so
+the event loop keeps running but that coroutine waits for the encode.
+Playwright has no way to get unencoded pixels, so only what happens to the
+bytes afterwards runs on a bounded thread pool: the WebP transcode
+(Chromium has no WebP output), the deduplication hash and the disk write.
+When the pool is saturated new frames are either dropped or the caller
+waits (backpressure), depending on `drop_when_full`.
+
+Frames whose difference hash is within `dedupe_distance` bits of the previous
+frame are not written; they are recorded as a reference to the earlier file
+and reported through `on_duplicate`, which home.py and app.py use to store
+the reference with the session. Hashing runs on its own single worker so
+frames are compared in the order they were captured. Problems are reported
+through `on_error` rather than printed.
+"""
+
+import asyncio
+import io
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed for WebP output and deduplication
+    Image = None
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for deduplication
+    np = None
+
+FORMATS = ("png", "jpeg", "webp")
+
+_screenshot_ids = itertools.count(1)
+
+
+def screenshot_name(prefix="screenshot"):
+    """A file name no other screenshot uses: the time to the microsecond plus a per-process counter."""
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{next(_screenshot_ids)}"
+
+
+def difference_hash(data: bytes, hash_size=8):
+    """64-bit dHash of an encoded image: compares neighbouring pixels of a downscaled grayscale frame."""
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft("L", (img.width // 8 or 1, img.height // 8 or 1))  # cheap JPEG downscale on decode
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int):
+    return bin(a ^ b).count("1")
+
+
+def encode_and_write(data: bytes, path: str, image_format: str, quality: int):
+    """Runs on the worker pool: transcode to WebP if needed and write the file; PNG and JPEG arrive encoded."""
+    if image_format == "webp":
+        with Image.open(io.BytesIO(data)) as img:
+            img.save(path, format="WEBP", quality=quality)
+    else:
+        with open(path, "wb") as f:
+            f.write(data)
+    return path
+
+
+class ScreenshotPipeline:
+    def __init__(self, directory="screenshots", image_format="png", quality=80,
+                 max_workers=2, max_pending=4, drop_when_full=True, on_saved=None,
+                 dedupe_distance=None, on_duplicate=None, on_error=None):
+        image_format = image_format.lower()
+        if image_format == "jpg":
+            image_format = "jpeg"
+        if image_format not in FORMATS:
+            raise ValueError(f"Unsupported screenshot format: {image_format}")
+        if image_format == "webp" and Image is None:
+            raise ValueError("WebP screenshots require Pillow (pip install pillow)")
+
+        self.directory = directory
+        self.image_format = image_format
+        self.quality = quality
+        self.drop_when_full = drop_when_full
+        # The callbacks run on the event loop thread, not in the pool
+        self.on_saved = on_saved  # called with the file path once it is on disk
+        self.on_duplicate = on_duplicate  # called with (skipped path, earlier path)
+        self.on_error = on_error  # called with a message when a frame could not be processed
+        self.dropped = 0
+
+        if dedupe_distance is not None and (Image is None or np is None):
+            self._report("Screenshot deduplication needs Pillow and NumPy; keeping every frame")
+            dedupe_distance = None
+        self.dedupe_distance = dedupe_distance
+        self.references = {}  # skipped path -> earlier path it duplicates
+        self._last_hash = None
+        self._last_path = None
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="screenshot")
+        # One worker, so frames are hashed and compared in capture order
+        self._hasher = (ThreadPoolExecutor(max_workers=1, thread_name_prefix="screenshot-hash")
+                        if dedupe_distance is not None else None)
+        self._slots = asyncio.Semaphore(max_pending)
+        self._pending = set()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def extension(self):
+        return "jpg" if self.image_format == "jpeg" else self.image_format
+
+    async def capture(self, page, name: str, full_page=False):
+        """
+        Grab a frame and queue it for writing. Returns the target path, or
+        None if the frame was dropped because the queue was full.
+        """
+        if self.drop_when_full and self._slots.locked():
+            self.dropped += 1
+            return None
+        await self._slots.acquire()
+
+        path = os.path.join(self.directory, f"{name}.{self.extension}")
+        try:
+            if self.image_format == "jpeg":
+                data = await page.screenshot(type="jpeg", quality=self.quality, full_page=full_page)
+            else:
+                data = await page.screenshot(type="png", full_page=full_page)
+        except Exception:
+            self._slots.release()
+            raise
+
+        loop = asyncio.get_running_loop()
+        # Submitted here, before any await, so the hash worker sees frames in capture order
+        duplicate = loop.run_in_executor(self._hasher, self._duplicate_of, data, path) if self._hasher else None
+        task = asyncio.ensure_future(self._process(data, path, duplicate))
+        self._pending.add(task)
+        task.add_done_callback(self._on_written)
+        return path
+
+    def _duplicate_of(self, data: bytes, path: str):
+        """Runs on the hash worker: the earlier path this frame duplicates, or None."""
+        frame_hash = difference_hash(data)
+        if self._last_hash is not None and hamming_distance(frame_hash, self._last_hash) <= self.dedupe_distance:
+            self.references[path] = self._last_path
+            return self._last_path
+        self._last_hash = frame_hash
+        self._last_path = path
+        return None
+
+    async def _process(self, data: bytes, path: str, duplicate):
+        """Returns (path, earlier path if this frame is a duplicate)."""
+        if duplicate is not None:
+            earlier_path = await duplicate
+            if earlier_path:
+                return path, earlier_path
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, encode_and_write, data, path, self.image_format, self.quality)
+        return path, None
+
+    def _report(self, message):
+        if self.on_error:
+            self.on_error(message)
+
+    def _on_written(self, task):
+        self._pending.discard(task)
+        self._slots.release()
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error:
+            self._report(f"Error writing screenshot: {error}")
+            return
+        path, duplicate_of = task.result()
+        if duplicate_of:
+            if self.on_duplicate:
+                self.on_duplicate(path, duplicate_of)
+        elif self.on_saved:
+            self.on_saved(path)
+
+    async def drain(self):
+        """Wait for queued frames to be written and shut the pools down."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        if self._hasher:
+            self._hasher.shutdown(wait=True)
@@ -0,0 +1,397 @@
+"""
+session_store.py
+SQLite catalog of capture sessions, their events and screenshots, and replay results.
+
+Every capture is a row in `sessions`; its events are rows in `events`,
+keyed by (session_id, seq) and indexed by URL and action, with the full
+entry kept as JSON. Screenshots are linked to the step they follow, and
+each replay stores its per-step results so failures can be queried later.
+
+    store = SessionStore()
+    with SessionEventWriter(store, store.create_session("https://example.com")) as writer:
+        writer.extend(entries)
+
+    python session_store.py list
+    python session_store.py touching https://example.com/checkout --prefix
+    python session_store.py failed
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+from interaction_log import InteractionLogWriter, iter_interaction_logs
+from network_archive import archive_path
+from replay_engine import step_time
+
+DB_FILE = "sessions.db"
+ARCHIVE_DIR = "archives"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    ended_at TEXT,
+    start_url TEXT,
+    source TEXT,
+    event_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS events (
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    action TEXT,
+    url TEXT,
+    target TEXT,
+    ts REAL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_url ON events (url, session_id);
+CREATE INDEX IF NOT EXISTS events_action ON events (action, session_id);
+
+CREATE TABLE IF NOT EXISTS screenshots (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    seq INTEGER,
+    path TEXT NOT NULL,
+    captured_at TEXT NOT NULL,
+    skipped_path TEXT  -- set when the frame duplicated `path` and was not written
+);
+CREATE INDEX IF NOT EXISTS screenshots_step ON screenshots (session_id, seq);
+
+CREATE TABLE IF NOT EXISTS replay_runs (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    started_at TEXT NOT NULL,
+    wait_mode TEXT,
+    passed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS replay_runs_session ON replay_runs (session_id);
+
+CREATE TABLE IF NOT EXISTS replay_steps (
+    run_id INTEGER NOT NULL REFERENCES replay_runs(id) ON DELETE CASCADE,
+    step INTEGER NOT NULL,
+    action TEXT,
+    target TEXT,
+    ok INTEGER NOT NULL,
+    skipped INTEGER NOT NULL,
+    message TEXT,
+    duration REAL,
+    perf TEXT,
+    PRIMARY KEY (run_id, step)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS replay_steps_failed ON replay_steps (run_id) WHERE ok = 0;
+"""
+
+
+def _now():
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def session_archive_path(session_id, directory=ARCHIVE_DIR, create_dir=True):
+    """HAR archive recorded for a session (see network_archive)."""
+    if create_dir:
+        os.makedirs(directory, exist_ok=True)
+    return archive_path(os.path.join(directory, f"session-{session_id}"))
+
+
+class SessionStore:
+    """
+    Thread-safe wrapper around one SQLite connection. Capture threads,
+    screenshot workers and the GUI may all call it.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")  # readers don't block the capture writer
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Add columns introduced after a database was created."""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(replay_steps)")}
+        if "perf" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE replay_steps ADD COLUMN perf TEXT")
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(screenshots)")}
+        if "skipped_path" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE screenshots ADD COLUMN skipped_path TEXT")
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    # Sessions ----------------------------------------------------------------
+
+    def create_session(self, start_url=None, source=None):
+        cursor = self._execute(
+            "INSERT INTO sessions (started_at, start_url, source) VALUES (?, ?, ?)",
+            (_now(), start_url, source),
+        )
+        return cursor.lastrowid
+
+    def finish_session(self, session_id):
+        self._execute("UPDATE sessions SET ended_at = ? WHERE id = ?", (_now(), session_id))
+
+    def session(self, session_id):
+        rows = self._query("SELECT * FROM sessions WHERE id = ?", (session_id,))
+        return rows[0] if rows else None
+
+    def list_sessions(self, limit=None):
+        sql = "SELECT * FROM sessions ORDER BY id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self._query(sql)
+
+    def latest_session_id(self):
+        rows = self._query("SELECT id FROM sessions WHERE event_count > 0 ORDER BY id DESC LIMIT 1")
+        return rows[0]["id"] if rows else None
+
+    def delete_session(self, session_id):
+        self._execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        archive = session_archive_path(session_id, create_dir=False)
+        if os.path.exists(archive):
+            os.remove(archive)
+
+    def clear(self):
+        """Delete every session. Returns True if there was anything to delete."""
+        session_ids = [row["id"] for row in self._query("SELECT id FROM sessions")]
+        for session_id in session_ids:
+            self.delete_session(session_id)
+        return bool(session_ids)
+
+    # Events ------------------------------------------------------------------
+
+    def add_events(self, session_id, entries, start_seq):
+        """Insert entries as steps start_seq, start_seq + 1, ... in one transaction."""
+        rows = [
+            (session_id, start_seq + i, entry.get("action"), entry.get("url"), entry.get("target"),
+             step_time(entry), json.dumps(entry, ensure_ascii=False))
+            for i, entry in enumerate(entries)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO events (session_id, seq, action, url, target, ts, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "UPDATE sessions SET event_count = max(event_count, ?) WHERE id = ?",
+                (start_seq + len(rows), session_id),
+            )
+
+    def session_events(self, session_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM events WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def sessions_touching_url(self, url, prefix=False):
+        """Sessions with at least one event on `url` (or on any URL starting with it)."""
+        if prefix:
+            # A range instead of LIKE so the events_url index is used
+            condition, params = "url >= ? AND url < ?", (url, url + "\uffff")
+        else:
+            condition, params = "url = ?", (url,)
+        return self._query(
+            f"SELECT * FROM sessions WHERE id IN (SELECT DISTINCT session_id FROM events WHERE {condition}) "
+            "ORDER BY id DESC",
+            params,
+        )
+
+    # Screenshots -------------------------------------------------------------
+
+    def add_screenshot(self, session_id, path, seq=None, skipped_path=None):
+        """
+        Link a screenshot file to step `seq`. A frame that was not written
+        because it duplicated an earlier one is stored with that earlier
+        `path` and the name it would have had as `skipped_path`.
+        """
+        self._execute(
+            "INSERT INTO screenshots (session_id, seq, path, captured_at, skipped_path) VALUES (?, ?, ?, ?, ?)",
+            (session_id, seq, path, _now(), skipped_path),
+        )
+
+    def session_screenshots(self, session_id):
+        return self._query(
+            "SELECT seq, path, captured_at, skipped_path FROM screenshots WHERE session_id = ? ORDER BY id",
+            (session_id,),
+        )
+
+    # Replay results ----------------------------------------------------------
+
+    def record_replay(self, session_id, results, wait_mode=None):
+        """Store a replay_log() result list; returns the run id."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO replay_runs (session_id, started_at, wait_mode, passed) VALUES (?, ?, ?, ?)",
+                (session_id, _now(), wait_mode, int(all(r.ok for r in results))),
+            )
+            run_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO replay_steps (run_id, step, action, target, ok, skipped, message, duration, perf) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, r.index, r.action, r.target, int(r.ok), int(r.skipped), r.message, r.duration,
+                  json.dumps(r.perf) if r.perf else None)
+                 for r in results],
+            )
+        return run_id
+
+    def replay_metrics(self, run_id):
+        """Step index -> page metrics stored for a replay run (see page_metrics)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT step, perf FROM replay_steps WHERE run_id = ? AND perf IS NOT NULL ORDER BY step", (run_id,)
+            ).fetchall()
+        return {row[0]: json.loads(row[1]) for row in rows}
+
+    def failed_replay_steps(self, session_id=None):
+        sql = ("SELECT r.session_id, r.id AS run_id, r.started_at, s.step, s.action, s.target, s.message "
+               "FROM replay_steps s JOIN replay_runs r ON r.id = s.run_id WHERE s.ok = 0")
+        params = ()
+        if session_id is not None:
+            sql += " AND r.session_id = ?"
+            params = (session_id,)
+        return self._query(sql + " ORDER BY r.id DESC, s.step", params)
+
+    # Import / export ---------------------------------------------------------
+
+    def import_log(self, path, source="import"):
+        """Copy a JSON, JSON Lines or trace log into a new session; returns its id."""
+        entries = iter_interaction_logs(path)
+        first = next(entries, None)
+        session_id = self.create_session(first.get("url") if first else None, source)
+        if first is None:
+            return session_id
+        seq, batch = 0, [first]
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) >= 1000:
+                self.add_events(session_id, batch, seq)
+                seq, batch = seq + len(batch), []
+        self.add_events(session_id, batch, seq)
+        self.finish_session(session_id)
+        return session_id
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SessionEventWriter(InteractionLogWriter):
+    """
+    InteractionLogWriter that appends to a session's events instead of a file.
+    Each background flush is one transaction. Closing it finishes the session.
+    """
+
+    def __init__(self, store, session_id, flush_count=50, flush_interval=1.0):
+        self.store = store
+        self.session_id = session_id
+        self.received = 0  # entries handed to the writer, i.e. the seq of the next step
+        self._next_seq = 0
+        self._screenshot_steps = {}  # path -> step it was taken after (see expect_screenshot)
+        super().__init__(path=store.path, flush_count=flush_count, flush_interval=flush_interval)
+
+    def extend(self, entries):
+        entries = list(entries)
+        self.received += len(entries)
+        super().extend(entries)
+
+    def _write(self, entries):
+        self.store.add_events(self.session_id, entries, self._next_seq)
+        self._next_seq += len(entries)
+
+    def step_index(self, held=0):
+        """
+        Seq of the newest entry logged so far, counting `held` entries a
+        TraceNormalizer has not released yet (TraceNormalizer.held), or None.
+        """
+        count = self.received + held
+        return count - 1 if count else None
+
+    def expect_screenshot(self, path, step):
+        """Record the step a screenshot being taken now belongs to; add_screenshot() links it there."""
+        self._screenshot_steps[path] = step
+
+    def add_screenshot(self, path, skipped_path=None):
+        """
+        Link a screenshot to the step that triggered it, as recorded by
+        expect_screenshot() under the name it was taken with, or else to the
+        last step logged.
+        """
+        name = skipped_path or path
+        if name in self._screenshot_steps:
+            step = self._screenshot_steps.pop(name)
+        else:
+            step = self.step_index()
+        self.store.add_screenshot(self.session_id, path, step, skipped_path)
+
+    def close(self):
+        if self._closed:
+            return
+        super().close()
+        self.store.finish_session(self.session_id)
+
+
+###############################################################################
+# Command line
+###############################################################################
+def _print_sessions(sessions):
+    for s in sessions:
+        print(f"{s['id']:>5}  {s['started_at']}  {s['event_count']:>6} events  "
+              f"{s['source'] or '-':<7} {s['start_url'] or ''}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the capture session catalog.")
+    parser.add_argument("--db", default=DB_FILE, help="Session database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List sessions, newest first").add_argument("--limit", type=int)
+    commands.add_parser("show", help="Print a session's events as JSON Lines").add_argument("session_id", type=int)
+    touching = commands.add_parser("touching", help="Sessions with events on a URL")
+    touching.add_argument("url")
+    touching.add_argument("--prefix", action="store_true", help="Match every URL starting with this one")
+    commands.add_parser("failed", help="Steps that failed in replay").add_argument("--session", type=int)
+    commands.add_parser("import", help="Import a log file as a new session").add_argument("log_file")
+    commands.add_parser("delete", help="Delete a session").add_argument("session_id", type=int)
+    args = parser.parse_args(argv)
+
+    store = SessionStore(args.db)
+    try:
+        if args.command == "list":
+            _print_sessions(store.list_sessions(args.limit))
+        elif args.command == "show":
+            for entry in store.session_events(args.session_id):
+                print(json.dumps(entry, ensure_ascii=False))
+        elif args.command == "touching":
+            _print_sessions(store.sessions_touching_url(args.url, args.prefix))
+        elif args.command == "failed":
+            for step in store.failed_replay_steps(args.session):
+                print(f"session {step['session_id']} run {step['run_id']} step {step['step']}: "
+                      f"{step['action']} on {step['target']} - {step['message']}")
+        elif args.command == "import":
+            print(f"Imported {args.log_file} as session {store.import_log(args.log_file)}", file=sys.stderr)
+        elif args.command == "delete":
+            store.delete_session(args.session_id)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
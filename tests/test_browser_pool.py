@@ -0,0 +1,111 @@
+"""
+BrowserPool recycling with fake browsers: a browser that is retiring while
+a context stays open must not block later acquires, and retiring browsers
+count toward max_browsers otherwise.
+
+    python -m pytest tests/test_browser_pool.py
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("playwright.async_api")
+
+from browser_pool import BrowserPool  # noqa: E402
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, launcher):
+        self.launcher = launcher
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        await asyncio.sleep(0)
+        return FakeContext(self)
+
+    async def close(self):
+        await asyncio.sleep(0.001)
+        self.connected = False
+        self.launcher.live -= 1
+
+
+class FakeChromium:
+    def __init__(self):
+        self.launched = 0
+        self.live = 0
+        self.peak = 0
+
+    async def launch(self, **options):
+        self.launched += 1
+        self.live += 1
+        self.peak = max(self.peak, self.live)
+        return FakeBrowser(self)
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeChromium()
+
+    async def stop(self):
+        pass
+
+
+def make_pool(**options):
+    pool = BrowserPool(**options)
+    pool._playwright = FakePlaywright()
+    return pool, pool._playwright.chromium
+
+
+def test_acquire_succeeds_while_a_retiring_browser_keeps_a_context_open():
+    async def scenario():
+        pool, chromium = make_pool(max_browsers=1, recycle_after=3)
+        long_lived = await pool.acquire_context()  # e.g. a capture or the magentic side browser
+        for _ in range(5):
+            async with pool.context():
+                pass
+        context = await asyncio.wait_for(pool.acquire_context(), timeout=1)
+        assert context.browser is not long_lived.browser
+        assert long_lived.browser.is_connected()
+        await pool.release_context(context)
+        await pool.release_context(long_lived)
+        assert not long_lived.browser.is_connected()
+        await pool.close()
+        return chromium
+
+    chromium = asyncio.run(scenario())
+    assert chromium.launched >= 2
+    assert chromium.live == 0
+
+
+def test_retiring_browsers_count_toward_max_browsers():
+    async def scenario():
+        pool, chromium = make_pool(max_browsers=2, max_contexts=6, recycle_after=3)
+
+        async def job(i):
+            async with pool.context():
+                await asyncio.sleep(0.001 * (i % 4))
+
+        await asyncio.gather(*(job(i) for i in range(60)))
+        await pool.close()
+        return chromium
+
+    chromium = asyncio.run(scenario())
+    # One replacement may be launched while every browser is retiring
+    assert chromium.peak <= 3
+    assert chromium.live == 0
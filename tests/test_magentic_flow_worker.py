@@ -0,0 +1,127 @@
+"""
+Throughput test for magentic_flow_worker: N sessions submitted together
+finish in about the time of one flow, each session's replies carry its own
+session id, a failing flow is reported to its session, and the None
+sentinel still stops the worker.
+
+    python -m pytest tests/test_magentic_flow_worker.py
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import magentic_flow_worker as worker  # noqa: E402
+
+STEP_DELAY = 0.05
+FLOW_STEPS = 5  # replies per flow (see run_flow)
+SESSIONS = 6
+
+
+@pytest.fixture(autouse=True)
+def fresh_queues(monkeypatch):
+    """Give each test its own userQueue and botQueue; the module's are restored afterwards."""
+    monkeypatch.setattr(worker, "userQueue", queue.Queue())
+    monkeypatch.setattr(worker, "botQueue", queue.Queue())
+
+
+def run_worker(messages, max_concurrent=worker.MAX_CONCURRENT_FLOWS, step_delay=STEP_DELAY, expected=None):
+    """
+    Run the worker over `messages` plus the sentinel and collect `expected`
+    replies (FLOW_STEPS per message by default). Returns (replies, wall
+    time, worker thread).
+    """
+    if expected is None:
+        expected = len(messages) * FLOW_STEPS
+    thread = threading.Thread(target=worker.magentic_flow_worker, args=(max_concurrent, step_delay),
+                              daemon=True)
+    start = time.perf_counter()
+    thread.start()
+    for item in messages:
+        worker.userQueue.put(item)
+    worker.userQueue.put(("You", None))
+
+    replies = []
+    deadline = start + 10
+    while len(replies) < expected and time.perf_counter() < deadline:
+        try:
+            replies.append(worker.botQueue.get(timeout=0.5))
+        except queue.Empty:
+            pass
+    elapsed = time.perf_counter() - start
+    thread.join(timeout=5)
+    return replies, elapsed, thread
+
+
+def test_concurrent_sessions_finish_in_about_one_flow_time():
+    _, single, _ = run_worker([("You", "only one", "solo")])
+    messages = [("You", f"message {i}", f"s{i}") for i in range(SESSIONS)]
+    replies, elapsed, _ = run_worker(messages)
+
+    assert len(replies) == SESSIONS * FLOW_STEPS
+    # Sequential flows would take SESSIONS times as long
+    assert elapsed < single + 2 * STEP_DELAY * FLOW_STEPS
+    assert elapsed < single * SESSIONS / 2
+
+
+def test_replies_carry_their_session_id():
+    messages = [("You", f"message {i}", f"s{i}") for i in range(SESSIONS)]
+    replies, _, _ = run_worker(messages)
+
+    by_session = {}
+    for reply in replies:
+        assert isinstance(reply, worker.BotReply)
+        by_session.setdefault(reply.session_id, []).append(reply.text)
+    assert set(by_session) == {f"s{i}" for i in range(SESSIONS)}
+    for i in range(SESSIONS):
+        texts = by_session[f"s{i}"]
+        assert len(texts) == FLOW_STEPS
+        assert f"message {i}" in texts[0]
+        assert "completed" in texts[-1]
+
+
+def test_sessions_without_an_id_get_distinct_ones():
+    replies, _, _ = run_worker([("You", "first"), ("You", "second")])
+    assert len({reply.session_id for reply in replies}) == 2
+
+
+def test_concurrency_limit_queues_extra_sessions():
+    messages = [("You", f"message {i}", f"s{i}") for i in range(4)]
+    replies, elapsed, _ = run_worker(messages, max_concurrent=2)
+    assert len(replies) == 4 * FLOW_STEPS
+    # Two rounds of two flows each
+    assert elapsed >= 2 * FLOW_STEPS * STEP_DELAY
+
+
+def test_failed_flow_is_reported_to_its_session(monkeypatch):
+    run_flow = worker.run_flow
+
+    async def failing_flow(session_id, message, step_delay):
+        if session_id == "bad":
+            raise RuntimeError("payment service unavailable")
+        await run_flow(session_id, message, step_delay)
+
+    monkeypatch.setattr(worker, "run_flow", failing_flow)
+    replies, _, thread = run_worker([("You", "fine", "good"), ("You", "broken", "bad")],
+                                    expected=FLOW_STEPS + 1)
+
+    failures = [reply for reply in replies if reply.session_id == "bad"]
+    assert len(failures) == 1
+    assert "Flow failed" in failures[0].text and "payment service unavailable" in failures[0].text
+    assert len([reply for reply in replies if reply.session_id == "good"]) == FLOW_STEPS
+    assert not thread.is_alive()
+
+
+def test_sentinel_shuts_the_worker_down():
+    _, _, thread = run_worker([("You", "hello", "s1")])
+    assert not thread.is_alive()
+
+    _, _, thread = run_worker([])
+    assert not thread.is_alive()
+    assert worker.botQueue.empty()
@@ -0,0 +1,95 @@
+"""
+Round-trip tests for trace_format: entries read back from a trace file equal
+the entries written, including values that do not fit their column.
+
+    python -m pytest tests/test_trace_format.py
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interaction_log import read_interaction_logs  # noqa: E402
+from trace_format import TraceReader, TraceWriter, json_to_trace, synthetic_events, trace_to_json  # noqa: E402
+
+SELECTORS = [["id", "#email"], ["css-path", "form > input[name=\"email\"]"]]
+
+
+def round_trip(tmp_path, entries, block_size=3):
+    path = str(tmp_path / "session.trace")
+    with TraceWriter(path, block_size) as writer:
+        writer.extend(entries)
+    with TraceReader(path) as reader:
+        return list(reader), [reader[i] for i in range(len(reader))]
+
+
+def test_round_trip_of_captured_entries(tmp_path):
+    entries = list(synthetic_events(50))
+    streamed, indexed = round_trip(tmp_path, entries, block_size=16)
+    assert streamed == entries
+    assert indexed == entries
+
+
+def test_empty_selectors_stay_an_empty_list(tmp_path):
+    entries = [
+        {"action": "click", "target": "#a", "selectors": []},
+        {"action": "click", "target": "#b", "selectors": None},
+        {"action": "click", "target": "#c", "selectors": SELECTORS},
+        {"action": "click", "target": "#d"},
+    ]
+    streamed, indexed = round_trip(tmp_path, entries)
+    assert streamed == indexed == entries
+    assert streamed[0]["selectors"] == []
+    assert streamed[1]["selectors"] is None
+    assert "selectors" not in streamed[3]
+
+
+def test_non_string_values_keep_their_type(tmp_path):
+    entries = [
+        {"action": "click", "target": 7, "url": "https://example.com/"},
+        {"action": "input", "target": "#q", "url": {"href": "https://example.com/"}, "value": 3},
+        {"action": 1, "target": True, "url": None, "navigates_to": ["https://example.com/next"]},
+        {"action": "click", "target": "7", "selectors": [["id", 7], ["css-path", "div"]]},
+        {"action": "click", "target": "#x", "selectors": [["id"]]},
+    ]
+    streamed, indexed = round_trip(tmp_path, entries)
+    assert streamed == indexed == entries
+    assert streamed[0]["target"] == 7
+    assert streamed[3]["target"] == "7"
+
+
+def test_unknown_keys_and_missing_fields(tmp_path):
+    entries = [
+        {"action": "navigate", "url": "https://example.com/", "perf": {"ttfb_ms": 12.5}},
+        {"mono": 1.5},
+        {},
+        {"action": "click", "target": "#a", "navigated": True, "navigates_to": "https://example.com/b"},
+    ]
+    streamed, indexed = round_trip(tmp_path, entries)
+    assert streamed == indexed == entries
+
+
+def test_iter_from_and_negative_index(tmp_path):
+    entries = [{"action": "click", "target": f"#b{i}", "selectors": [] if i % 2 else SELECTORS}
+               for i in range(10)]
+    path = str(tmp_path / "session.trace")
+    with TraceWriter(path, block_size=4) as writer:
+        writer.extend(entries)
+    with TraceReader(path) as reader:
+        assert list(reader.iter_from(5)) == entries[5:]
+        assert reader[-1] == entries[-1]
+        assert list(reader.iter_from(10)) == []
+
+
+def test_json_lines_conversion_round_trip(tmp_path):
+    entries = list(synthetic_events(20)) + [{"action": "click", "target": 3, "selectors": []}]
+    src = tmp_path / "log.jsonl"
+    src.write_text("".join(json.dumps(e) + "\n" for e in entries), encoding="utf-8")
+    trace = str(tmp_path / "log.trace")
+    out = str(tmp_path / "out.jsonl")
+
+    assert json_to_trace(str(src), trace) == len(entries)
+    assert trace_to_json(trace, out) == len(entries)
+    assert read_interaction_logs(out) == entries
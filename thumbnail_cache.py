@@ -0,0 +1,158 @@
+"""
+thumbnail_cache.py
+Screenshot thumbnails decoded off the GUI thread.
+
+Thumbnails are decoded and scaled as QImage on a QThreadPool, written to a
+.thumbs directory next to the screenshots, and kept as QPixmap in a
+size-bounded LRU. Widgets show placeholder() until `ready` fires for their path,
+then the pixmap, or error_placeholder() when the image could not be decoded.
+Like the disk cache, the memory cache is keyed on the file's mtime, so a file
+written again under the same name is decoded again.
+"""
+
+import os
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QObject, QRunnable, QSize, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QImageReader, QPainter, QPixmap
+
+THUMBNAIL_DIR = ".thumbs"
+
+
+def _cache_key(image_path: str):
+    try:
+        return image_path, os.path.getmtime(image_path)
+    except OSError:
+        return image_path, None
+
+
+def thumbnail_path(image_path: str, size: QSize):
+    directory, name = os.path.split(image_path)
+    stem = os.path.splitext(name)[0]
+    return os.path.join(directory, THUMBNAIL_DIR, f"{stem}_{size.width()}x{size.height()}.png")
+
+
+class ThumbnailSignals(QObject):
+    loaded = pyqtSignal(object, QImage)  # (path, mtime) key, image
+
+
+class ThumbnailTask(QRunnable):
+    """Loads one thumbnail, from the disk cache if it is fresh, otherwise from the full image."""
+
+    def __init__(self, key, size: QSize):
+        super().__init__()
+        self.key = key
+        self.image_path = key[0]
+        self.size = size
+        self.signals = ThumbnailSignals()
+
+    def run(self):
+        cached = thumbnail_path(self.image_path, self.size)
+        image = QImage()
+        try:
+            if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(self.image_path):
+                image = QImage(cached)
+        except OSError:
+            pass
+
+        if image.isNull():
+            reader = QImageReader(self.image_path)
+            source_size = reader.size()
+            if source_size.isValid():
+                # Let the decoder downscale where the format supports it (e.g. JPEG)
+                reader.setScaledSize(source_size.scaled(self.size, Qt.KeepAspectRatio))
+            image = reader.read()
+            if not image.isNull():
+                image = image.scaled(self.size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                os.makedirs(os.path.dirname(cached), exist_ok=True)
+                image.save(cached, "PNG")
+
+        self.signals.loaded.emit(self.key, image)
+
+
+class ThumbnailCache(QObject):
+    ready = pyqtSignal(str)
+
+    def __init__(self, size=QSize(280, 180), max_bytes=64 * 1024 * 1024, pool=None, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.max_bytes = max_bytes
+        self.pool = pool or QThreadPool.globalInstance()
+        self._pixmaps = OrderedDict()  # (path, mtime) -> pixmap
+        self._bytes = 0
+        self._in_flight = set()
+        self._failed = set()  # (path, mtime) keys that did not decode; not retried
+        self._placeholder = None
+        self._error_placeholder = None
+
+    def get(self, image_path: str):
+        """Return the cached pixmap for the file as it is now, or None if it still has to be loaded."""
+        key = _cache_key(image_path)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+
+    def request(self, image_path: str):
+        """Return the pixmap if cached; otherwise queue a load and emit `ready` when done."""
+        key = _cache_key(image_path)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        elif key not in self._in_flight and key not in self._failed:
+            self._in_flight.add(key)
+            task = ThumbnailTask(key, self.size)
+            task.signals.loaded.connect(self._on_loaded)
+            self.pool.start(task)
+        return pixmap
+
+    def failed(self, image_path: str):
+        """True when the file as it is now could not be decoded."""
+        return _cache_key(image_path) in self._failed
+
+    def forget(self, image_path: str):
+        """Drop everything cached for a path, e.g. when a new screenshot is written under it."""
+        for key in [k for k in self._pixmaps if k[0] == image_path]:
+            self._bytes -= self._cost(self._pixmaps.pop(key))
+        self._failed = {k for k in self._failed if k[0] != image_path}
+
+    def placeholder(self):
+        if self._placeholder is None:
+            self._placeholder = self._labelled("Loading…", "#444", "#aaa")
+        return self._placeholder
+
+    def error_placeholder(self):
+        if self._error_placeholder is None:
+            self._error_placeholder = self._labelled("Could not load image", "#533", "#e99")
+        return self._error_placeholder
+
+    def _labelled(self, text, background, foreground):
+        pixmap = QPixmap(self.size)
+        pixmap.fill(QColor(background))
+        painter = QPainter(pixmap)
+        painter.setPen(QColor(foreground))
+        painter.drawText(pixmap.rect(), Qt.AlignCenter, text)
+        painter.end()
+        return pixmap
+
+    def _on_loaded(self, key, image: QImage):
+        self._in_flight.discard(key)
+        image_path = key[0]
+        if image.isNull():
+            self._failed.add(key)
+            self.ready.emit(image_path)
+            return
+        pixmap = QPixmap.fromImage(image)
+        previous = self._pixmaps.pop(key, None)
+        if previous is not None:
+            self._bytes -= self._cost(previous)
+        self._pixmaps[key] = pixmap
+        self._bytes += self._cost(pixmap)
+        while self._bytes > self.max_bytes and len(self._pixmaps) > 1:
+            _, evicted = self._pixmaps.popitem(last=False)
+            self._bytes -= self._cost(evicted)
+        self.ready.emit(image_path)
+
+    @staticmethod
+    def _cost(pixmap: QPixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
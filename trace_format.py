@@ -0,0 +1,454 @@
+"""
+trace_format.py
+Compact, seekable container for long interaction traces (standard library only).
+
+Layout:
+
+    MAGIC | block 0 | block 1 | ... | footer | trailer
+
+- Each block holds up to `block_size` events, stored column by column as
+  JSON and compressed with zlib.
+- URLs, targets, actions and selectors are interned: columns hold integer
+  ids into one string table, and each distinct selector list is stored once
+  in a fingerprint table. Both tables are written once, in the footer.
+  A value that does not fit its column (a non-string URL, an empty or
+  malformed selector list) goes in the "extra" column unchanged, so reading
+  a trace back returns entries equal to the ones written.
+- The footer (zlib JSON) has those tables and the index of blocks
+  (offset, length, first event, event count). The fixed-size trailer at the
+  end of the file points to the footer, so a reader seeks straight to it.
+
+Reading step N decompresses one block; iteration streams block by block.
+Entries that share a selector list share one decoded list; treat them as
+read-only.
+
+    python trace_format.py to-trace interaction_logs.jsonl session.trace
+    python trace_format.py to-json session.trace interaction_logs.jsonl
+    python trace_format.py bench --events 1000000
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+MAGIC = b"PYTRACE1"
+VERSION = 1
+TRAILER = struct.Struct("<QI8s")  # footer offset, footer length, MAGIC
+BLOCK_SIZE = 4096  # events per block
+
+# Entry keys with their own column; any other keys go in the "extra" column
+INTERNED_FIELDS = ("action", "target", "url", "navigates_to")
+RAW_FIELDS = ("timestamp", "mono", "value")
+KNOWN_FIELDS = INTERNED_FIELDS + RAW_FIELDS + ("selectors",)
+_FIELD_BITS = {name: 1 << i for i, name in enumerate(KNOWN_FIELDS)}
+ALL_FIELDS = (1 << len(KNOWN_FIELDS)) - 1
+
+
+def _fits_column(name, value):
+    """Whether `value` survives its field's column unchanged; otherwise it is stored as an extra."""
+    if value is None:
+        return True
+    if name in INTERNED_FIELDS:
+        return isinstance(value, str)
+    if name == "selectors":
+        # Non-empty [[strategy, selector], ...] of strings; [] would come back as None
+        return isinstance(value, list) and bool(value) and all(
+            isinstance(pair, list) and len(pair) == 2 and all(p is None or isinstance(p, str) for p in pair)
+            for pair in value
+        )
+    return True
+
+
+def is_trace_file(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class TraceWriter:
+    """Streams entries into a trace file; the index is written on close()."""
+
+    def __init__(self, path, block_size=BLOCK_SIZE, level=6):
+        self.path = path
+        self.block_size = block_size
+        self.level = level
+        self.count = 0
+
+        self._strings = [None]  # id 0 is None
+        self._ids = {}
+        self._fingerprints = [None]  # id 0 is "no selectors"
+        self._fingerprint_ids = {}
+        self._blocks = []
+        self._pending = []
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+
+    def _intern(self, value):
+        if value is None:
+            return 0
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = self._ids[value] = len(self._strings)
+            self._strings.append(value)
+        return string_id
+
+    def _intern_selectors(self, selectors):
+        if not selectors:
+            return 0
+        key = tuple(self._intern(part) for pair in selectors for part in pair)
+        fingerprint_id = self._fingerprint_ids.get(key)
+        if fingerprint_id is None:
+            fingerprint_id = self._fingerprint_ids[key] = len(self._fingerprints)
+            self._fingerprints.append(key)
+        return fingerprint_id
+
+    def append(self, entry: dict):
+        self._pending.append(entry)
+        if len(self._pending) >= self.block_size:
+            self._write_block()
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def _write_block(self):
+        entries, self._pending = self._pending, []
+        if not entries:
+            return
+        intern = self._intern
+        columns = {name: [] for name in KNOWN_FIELDS}
+        interned = [(name, columns[name]) for name in INTERNED_FIELDS]
+        raw = [(name, columns[name]) for name in RAW_FIELDS]
+        selectors = columns["selectors"]
+        present, extra = [], []
+        for entry in entries:
+            mask = 0
+            for name, bit in _FIELD_BITS.items():
+                if name in entry and _fits_column(name, entry[name]):
+                    mask |= bit
+            present.append(mask)
+            for name, column in interned:
+                column.append(intern(entry[name]) if mask & _FIELD_BITS[name] else 0)
+            for name, column in raw:
+                column.append(entry.get(name))
+            selectors.append(self._intern_selectors(entry["selectors"]) if mask & _FIELD_BITS["selectors"] else 0)
+            if len(entry) > bin(mask).count("1"):
+                extra.append({k: v for k, v in entry.items() if not mask & _FIELD_BITS.get(k, 0)})
+            else:
+                extra.append(None)
+        columns["present"] = present
+        if any(extra):
+            columns["extra"] = extra
+
+        payload = zlib.compress(json.dumps(columns, separators=(",", ":")).encode("utf-8"), self.level)
+        self._blocks.append([self._file.tell(), len(payload), self.count, len(entries)])
+        self._file.write(payload)
+        self.count += len(entries)
+
+    def close(self):
+        if self._file is None:
+            return
+        self._write_block()
+        footer = {
+            "version": VERSION,
+            "count": self.count,
+            "strings": self._strings,
+            "fingerprints": self._fingerprints,
+            "blocks": self._blocks,
+        }
+        payload = zlib.compress(json.dumps(footer, separators=(",", ":")).encode("utf-8"), self.level)
+        offset = self._file.tell()
+        self._file.write(payload)
+        self._file.write(TRAILER.pack(offset, len(payload), MAGIC))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TraceReader:
+    """
+    Random access (reader[n], reader.iter_from(n)) and streaming iteration over
+    a trace file. Only the footer and the block being read are held in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a trace file")
+        self._file.seek(-TRAILER.size, os.SEEK_END)
+        offset, length, magic = TRAILER.unpack(self._file.read(TRAILER.size))
+        if magic != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is truncated (no trace footer)")
+        self._file.seek(offset)
+        footer = json.loads(zlib.decompress(self._file.read(length)))
+        if footer.get("version") != VERSION:
+            self._file.close()
+            raise ValueError(f"Unsupported trace version: {footer.get('version')}")
+
+        self.count = footer["count"]
+        self._strings = strings = footer["strings"]
+        self._fingerprints = [
+            [[strings[ids[i]], strings[ids[i + 1]]] for i in range(0, len(ids), 2)] if ids else None
+            for ids in footer["fingerprints"]
+        ]
+        self._blocks = footer["blocks"]
+        self._starts = [block[2] for block in self._blocks]
+        self._cached_block = (None, None)  # (block number, decoded columns)
+        self._absent = {}  # presence mask -> keys to remove
+
+    def __len__(self):
+        return self.count
+
+    def _decode_block(self, number):
+        """(presence masks, one value list per KNOWN_FIELDS entry, extras) for a block."""
+        if self._cached_block[0] == number:
+            return self._cached_block[1]
+        offset, length, _, count = self._blocks[number]
+        self._file.seek(offset)
+        columns = json.loads(zlib.decompress(self._file.read(length)))
+
+        strings, fingerprints = self._strings, self._fingerprints
+        values = []
+        for name in KNOWN_FIELDS:
+            column = columns[name]
+            if name in INTERNED_FIELDS:
+                column = [strings[i] for i in column]
+            elif name == "selectors":
+                column = [fingerprints[i] for i in column]
+            values.append(column)
+        block = (columns["present"], values, columns.get("extra") or [None] * count)
+
+        self._cached_block = (number, block)
+        return block
+
+    def _absent_keys(self, mask):
+        keys = self._absent.get(mask)
+        if keys is None:
+            keys = self._absent[mask] = tuple(n for n in KNOWN_FIELDS if not mask & _FIELD_BITS[n])
+        return keys
+
+    def _entries(self, block, start=0):
+        present, values, extra = block
+        rows = zip(present, zip(*values), extra)
+        if start:
+            rows = itertools.islice(rows, start, None)
+        for mask, row, others in rows:
+            entry = dict(zip(KNOWN_FIELDS, row))
+            if mask != ALL_FIELDS:
+                for key in self._absent_keys(mask):
+                    del entry[key]
+            if others:
+                entry.update(others)
+            yield entry
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("trace index out of range")
+        number = bisect.bisect_right(self._starts, index) - 1
+        present, values, extra = self._decode_block(number)
+        i = index - self._starts[number]
+        return next(self._entries(([present[i]], [[column[i]] for column in values], [extra[i]])))
+
+    def iter_from(self, index=0):
+        """Yield entries starting at step `index`."""
+        if index >= self.count:
+            return
+        number = max(bisect.bisect_right(self._starts, index) - 1, 0)
+        skip = index - self._starts[number]
+        for n in range(number, len(self._blocks)):
+            yield from self._entries(self._decode_block(n), skip)
+            skip = 0
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_trace(path):
+    with TraceReader(path) as reader:
+        yield from reader
+
+
+###############################################################################
+# Converters
+###############################################################################
+def json_to_trace(src, dst, block_size=BLOCK_SIZE):
+    """Convert a JSON-array or JSON Lines log to a trace file; returns the event count."""
+    from interaction_log import iter_interaction_logs
+
+    with TraceWriter(dst, block_size) as writer:
+        writer.extend(iter_interaction_logs(src))
+    return writer.count
+
+
+def trace_to_json(src, dst, array=False):
+    """Convert a trace file to JSON Lines (or a JSON array); returns the event count."""
+    count = 0
+    with TraceReader(src) as reader, open(dst, "w", encoding="utf-8") as f:
+        if array:
+            f.write("[\n")
+        for entry in reader:
+            line = json.dumps(entry, ensure_ascii=False)
+            if array:
+                f.write((",\n" if count else "") + line)
+            else:
+                f.write(line + "\n")
+            count += 1
+        if array:
+            f.write("\n]\n")
+    return count
+
+
+###############################################################################
+# Benchmark
+###############################################################################
+def synthetic_events(count, seed=0):
+    """Events shaped like home.py/app.py captures, over a few hundred URLs and selectors."""
+    rng = random.Random(seed)
+    urls = [f"https://shop.example.com/category/{i}/products?page={i % 7}" for i in range(200)]
+    selectors = [
+        [["id", f"#field-{i}"], ["css-path", f"form#checkout > div > input[name=\"field-{i}\"]"],
+         ["nth-of-type", f"body > div:nth-of-type(2) > form:nth-of-type(1) > input:nth-of-type({i})"]]
+        for i in range(500)
+    ]
+    actions = ["click", "input", "input", "input", "press", "navigate"]
+    mono = 1000.0
+    for i in range(count):
+        mono += rng.random() * 0.5
+        action = rng.choice(actions)
+        fingerprint = rng.choice(selectors)
+        entry = {
+            "timestamp": f"2024-01-01T00:{(i // 60000) % 60:02d}:{(i // 1000) % 60:02d}.{i % 1000:03d}000",
+            "mono": round(mono, 6),
+            "action": action,
+            "target": None if action == "navigate" else fingerprint[0][1],
+            "url": rng.choice(urls),
+            "value": "".join(rng.choice("abcdefgh ") for _ in range(rng.randint(1, 12))) if action == "input" else None,
+        }
+        if action != "navigate":
+            entry["selectors"] = fingerprint
+        yield entry
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def benchmark(count, directory):
+    legacy = os.path.join(directory, "trace.json")
+    jsonl = os.path.join(directory, "trace.jsonl")
+    trace = os.path.join(directory, "trace.trace")
+
+    with open(legacy, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i, entry in enumerate(synthetic_events(count)):
+            f.write((",\n" if i else "") + json.dumps(entry, indent=4))
+        f.write("\n]\n")
+    with open(jsonl, "w", encoding="utf-8") as f:
+        for entry in synthetic_events(count):
+            f.write(json.dumps(entry) + "\n")
+    _, write_time = _timed(lambda: json_to_trace(jsonl, trace))
+
+    def load_legacy():
+        with open(legacy, "r", encoding="utf-8") as f:
+            return len(json.load(f))
+
+    def load_jsonl():
+        with open(jsonl, "r", encoding="utf-8") as f:
+            return sum(1 for line in f if json.loads(line))
+
+    def stream_trace():
+        return sum(1 for _ in iter_trace(trace))
+
+    def random_access():
+        rng = random.Random(1)
+        with TraceReader(trace) as reader:
+            for _ in range(1000):
+                reader[rng.randrange(len(reader))]
+
+    _, legacy_time = _timed(load_legacy)
+    _, jsonl_time = _timed(load_jsonl)
+    _, trace_time = _timed(stream_trace)
+    _, seek_time = _timed(random_access)
+
+    sizes = {path: os.path.getsize(path) for path in (legacy, jsonl, trace)}
+    print(f"{count:,} events")
+    print(f"{'format':<20}{'size':>12}{'parse':>10}")
+    print(f"{'JSON (indent=4)':<20}{sizes[legacy] / 1e6:>10.1f}MB{legacy_time:>9.2f}s")
+    print(f"{'JSON Lines':<20}{sizes[jsonl] / 1e6:>10.1f}MB{jsonl_time:>9.2f}s")
+    print(f"{'trace':<20}{sizes[trace] / 1e6:>10.1f}MB{trace_time:>9.2f}s  (written in {write_time:.2f}s)")
+    print(f"trace is {sizes[legacy] / sizes[trace]:.1f}x smaller than indented JSON, "
+          f"{sizes[jsonl] / sizes[trace]:.1f}x smaller than JSON Lines; "
+          f"streams {legacy_time / trace_time:.1f}x faster than loading indented JSON "
+          f"and {jsonl_time / trace_time:.1f}x faster than JSON Lines")
+    print(f"random access: {seek_time / 1000 * 1e3:.2f} ms per step (1000 random steps)")
+
+
+###############################################################################
+# Command line
+###############################################################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert or benchmark compact interaction traces.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    to_trace = commands.add_parser("to-trace", help="JSON / JSON Lines log -> trace")
+    to_trace.add_argument("src")
+    to_trace.add_argument("dst")
+    to_trace.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+
+    to_json = commands.add_parser("to-json", help="trace -> JSON Lines log")
+    to_json.add_argument("src")
+    to_json.add_argument("dst")
+    to_json.add_argument("--array", action="store_true", help="Write a JSON array instead of JSON Lines")
+
+    bench = commands.add_parser("bench", help="Compare size and parse time on a synthetic trace")
+    bench.add_argument("--events", type=int, default=1_000_000)
+    bench.add_argument("--dir", help="Directory for the generated files (default: a temporary one)")
+
+    args = parser.parse_args(argv)
+    if args.command == "to-trace":
+        count = json_to_trace(args.src, args.dst, args.block_size)
+        print(f"Wrote {count} events to {args.dst} ({os.path.getsize(args.dst)} bytes)", file=sys.stderr)
+    elif args.command == "to-json":
+        count = trace_to_json(args.src, args.dst, args.array)
+        print(f"Wrote {count} events to {args.dst}", file=sys.stderr)
+    elif args.dir:
+        os.makedirs(args.dir, exist_ok=True)
+        benchmark(args.events, args.dir)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            benchmark(args.events, directory)
+
+
+if __name__ == "__main__":
+    main()
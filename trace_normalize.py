@@ -0,0 +1,298 @@
+"""
+trace_normalize.py
+Passes that shrink recorded interaction logs before they are written or replayed.
+
+Works with both log vocabularies (home.py's "Input"/"Click" and app.py's
+"input"/"click"). Can also be run standalone over an existing log:
+
+    python trace_normalize.py interaction_logs.json -o normalized.jsonl
+
+Passes:
+- Input coalescing: consecutive keystrokes on one field become one entry.
+- Navigation normalization: duplicate and redirect-hop navigations are
+  dropped, and so are navigations the page started right after a click or
+  Enter (marked "navigated" by capture_script); the trigger keeps the URL as
+  "navigates_to" so replay can wait for it, or load it if the click does not.
+"""
+
+import argparse
+import json
+import sys
+
+from interaction_log import read_interaction_logs
+from capture_script import NAVIGATION_CAUSE_MS
+from page_metrics import merge_metrics
+from replay_engine import step_time
+
+
+def action_of(entry):
+    return str(entry.get("action") or "").lower()
+
+
+def with_metrics_of(entry, earlier, later):
+    """`entry` carrying the combined "perf" of two entries folded into it (see page_metrics)."""
+    if "perf" not in earlier and "perf" not in later:
+        return entry
+    entry = dict(entry)
+    entry["perf"] = merge_metrics(earlier.get("perf"), later.get("perf"))
+    return entry
+
+
+###############################################################################
+# Input coalescing
+###############################################################################
+class InputCoalescer:
+    """
+    Collapses consecutive Input entries on the same target into one entry
+    carrying the final value.
+
+    push() returns the entries that can no longer be merged; call flush() at
+    the end of a capture to get the last pending one. With keep_intermediate,
+    the earlier values are kept on the merged entry as "intermediate_values".
+    """
+
+    def __init__(self, keep_intermediate=False):
+        self.keep_intermediate = keep_intermediate
+        self._pending = None
+        self._intermediate = []
+        self._merged = 0
+
+    def push(self, entry: dict):
+        if action_of(entry) != "input":
+            return self.flush() + [entry]
+
+        pending = self._pending
+        if (pending is not None
+                and entry.get("target") == pending.get("target")
+                and entry.get("url") == pending.get("url")):
+            if self.keep_intermediate:
+                self._intermediate.append(pending.get("value"))
+            self._pending = with_metrics_of(entry, pending, entry)
+            self._merged += 1
+            return []
+
+        ready = self.flush()
+        self._pending = entry
+        return ready
+
+    def flush(self):
+        if self._pending is None:
+            return []
+        entry = self._pending
+        if self._merged:
+            entry = dict(entry)
+            entry["coalesced"] = self._merged + 1
+            if self.keep_intermediate:
+                entry["intermediate_values"] = self._intermediate
+        self._pending = None
+        self._intermediate = []
+        self._merged = 0
+        return [entry]
+
+
+def coalesce_inputs(entries, keep_intermediate=False):
+    """Offline version of InputCoalescer over a complete list of entries."""
+    coalescer = InputCoalescer(keep_intermediate)
+    result = []
+    for entry in entries:
+        result.extend(coalescer.push(entry))
+    result.extend(coalescer.flush())
+    return result
+
+
+###############################################################################
+# Navigation normalization
+###############################################################################
+REDIRECT_WINDOW = 0.5  # seconds; a navigation replaced this quickly was a redirect hop
+CAUSE_WINDOW = NAVIGATION_CAUSE_MS / 1000  # seconds; a navigation this soon after a marked click or Enter was caused by it
+
+
+def is_navigation(entry):
+    return action_of(entry) == "navigate"
+
+
+def is_navigation_trigger(entry):
+    action = action_of(entry)
+    return action == "click" or (action in ("press", "keypress") and (entry.get("value") or "Enter") == "Enter")
+
+
+def started_navigation(entry):
+    """A click or Enter after which the page itself began navigating (see capture_script)."""
+    return bool(entry.get("navigated")) and is_navigation_trigger(entry)
+
+
+def _gap(earlier, later):
+    start, end = step_time(earlier), step_time(later)
+    if start is None or end is None:
+        return None
+    return end - start
+
+
+class NavigationNormalizer:
+    """
+    Drops navigations that replay would only repeat:
+    - the same URL as the navigation just before it,
+    - a navigation replaced by another within REDIRECT_WINDOW (a redirect hop),
+    - a navigation within CAUSE_WINDOW after a click or Enter that the page
+      reported as starting a navigation, which the replayed click or key
+      press will trigger again by itself. Triggers without that mark (older
+      logs) never absorb a navigation.
+
+    The last navigation or trigger is held back until the next entry shows
+    whether it is redundant; call flush() at the end of a capture. The page
+    reports clicks in batches, so a caused navigation may arrive before its
+    trigger; "mono" order decides.
+    """
+
+    def __init__(self, redirect_window=REDIRECT_WINDOW, cause_window=CAUSE_WINDOW):
+        self.redirect_window = redirect_window
+        self.cause_window = cause_window
+        self._pending = None
+        self.dropped_duplicates = 0
+        self.dropped_redirects = 0
+        self.dropped_caused = 0
+
+    @property
+    def loads_saved(self):
+        return self.dropped_duplicates + self.dropped_redirects + self.dropped_caused
+
+    def push(self, entry: dict):
+        pending = self._pending
+        if is_navigation(entry):
+            if pending is not None and self._absorb_navigation(pending, entry):
+                return []
+            ready = self.flush()
+            self._pending = entry
+            return ready
+
+        if is_navigation_trigger(entry):
+            if pending is not None and is_navigation(pending) and started_navigation(entry):
+                gap = _gap(entry, pending)
+                if gap is not None and 0 <= gap <= self.cause_window:
+                    # The navigation was logged before the batched click that caused it
+                    self.dropped_caused += 1
+                    self._pending = with_metrics_of(self._caused(entry, pending), entry, pending)
+                    return []
+            ready = self.flush()
+            self._pending = entry
+            return ready
+
+        return self.flush() + [entry]
+
+    def _absorb_navigation(self, pending, entry):
+        """Fold `entry` into the held entry if it is redundant; True when it was."""
+        url = entry.get("url")
+        if is_navigation(pending):
+            if url == pending.get("url"):
+                self.dropped_duplicates += 1
+                self._pending = with_metrics_of(pending, pending, entry)
+                return True
+            gap = _gap(pending, entry)
+            if gap is not None and 0 <= gap <= self.redirect_window:
+                self._pending = with_metrics_of(entry, pending, entry)
+                self.dropped_redirects += 1
+                return True
+            return False
+
+        if not started_navigation(pending):
+            return False
+        if url == pending.get("navigates_to"):
+            self.dropped_duplicates += 1
+            self._pending = with_metrics_of(pending, pending, entry)
+            return True
+        gap = _gap(pending, entry)
+        if gap is not None and 0 <= gap <= self.cause_window:
+            if "navigates_to" in pending:
+                self.dropped_redirects += 1
+            else:
+                self.dropped_caused += 1
+            self._pending = with_metrics_of(self._caused(pending, entry), pending, entry)
+            return True
+        return False
+
+    def _caused(self, trigger, navigation):
+        if "navigates_to" not in trigger:
+            trigger = dict(trigger)
+        trigger["navigates_to"] = navigation.get("url")
+        return trigger
+
+    def flush(self):
+        if self._pending is None:
+            return []
+        entry = self._pending
+        self._pending = None
+        return [entry]
+
+
+class TraceNormalizer:
+    """Input coalescing followed by navigation normalization, entry by entry."""
+
+    def __init__(self, keep_intermediate=False):
+        self.inputs = InputCoalescer(keep_intermediate)
+        self.navigations = NavigationNormalizer()
+
+    @property
+    def held(self):
+        """
+        Entries held back right now. Each one is released later as exactly
+        one entry (later entries may merge into it), and the newest entry
+        pushed is the last of them, so it will be step received + held - 1.
+        """
+        return (self.inputs._pending is not None) + (self.navigations._pending is not None)
+
+    def push(self, entry: dict):
+        return [ready for merged in self.inputs.push(entry) for ready in self.navigations.push(merged)]
+
+    def flush(self):
+        ready = [r for merged in self.inputs.flush() for r in self.navigations.push(merged)]
+        return ready + self.navigations.flush()
+
+
+def normalize_navigation(entries):
+    """Offline version of NavigationNormalizer; returns (entries, normalizer) for its counts."""
+    normalizer = NavigationNormalizer()
+    result = []
+    for entry in entries:
+        result.extend(normalizer.push(entry))
+    result.extend(normalizer.flush())
+    return result, normalizer
+
+
+def normalize_trace(entries, keep_intermediate=False):
+    """All passes over a complete list of entries, as used before replay."""
+    return normalize_navigation(coalesce_inputs(entries, keep_intermediate))[0]
+
+
+###############################################################################
+# Command line
+###############################################################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Normalize a recorded interaction log.")
+    parser.add_argument("log_file", help="JSON-array or JSON Lines interaction log")
+    parser.add_argument("-o", "--output", help="Output JSON Lines file (default: stdout)")
+    parser.add_argument("--keep-intermediate", action="store_true",
+                        help="Keep intermediate Input values on coalesced entries")
+    args = parser.parse_args(argv)
+
+    entries = read_interaction_logs(args.log_file)
+    coalesced = coalesce_inputs(entries, keep_intermediate=args.keep_intermediate)
+    result, navigations = normalize_navigation(coalesced)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for entry in result:
+            out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    finally:
+        if args.output:
+            out.close()
+
+    print(f"Input coalescing: {len(entries)} -> {len(coalesced)} steps", file=sys.stderr)
+    print(f"Navigation normalization: {len(coalesced)} -> {len(result)} steps "
+          f"({navigations.dropped_duplicates} duplicate, {navigations.dropped_redirects} redirect, "
+          f"{navigations.dropped_caused} click/Enter-caused)", file=sys.stderr)
+    print(f"Saved {len(entries) - len(result)} of {len(entries)} steps and "
+          f"{navigations.loads_saved} page loads", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()